@@ -1,10 +1,14 @@
+import time
+import uuid
 import streamlit as st
 from streamlit_option_menu import option_menu
 
 # --- MODULE IMPORTS ---
 from utils.styles import apply_custom_css, render_3d_cube
 from utils.export_utils import generate_pdf
-from utils import db
+from utils import db, jobs
+from utils.profiler import profile_run, profiling_enabled
+from utils.chat_memory import new_chat_state
 from views import main_console, analytics, vault, architecture, oracle, ai_consultant, auth, landing, payment
 
 # 1. PAGE CONFIG
@@ -12,6 +16,7 @@ st.set_page_config(page_title="ClauseAI Ultimate", layout="wide", page_icon="✨
 
 # 2. INIT DATABASE & STATE
 db.init_db()
+jobs.init_jobs_db()
 
 if 'authenticated' not in st.session_state: st.session_state['authenticated'] = False
 if 'page' not in st.session_state: st.session_state['page'] = 'landing' # landing, login, signup, app
@@ -19,6 +24,7 @@ if 'plan' not in st.session_state: st.session_state['plan'] = 'Free'
 if 'results' not in st.session_state: st.session_state['results'] = None
 if 'chat_history' not in st.session_state:
     st.session_state['chat_history'] = {"legal": [], "finance": [], "compliance": [], "operations": []}
+if 'chat_memory' not in st.session_state: st.session_state['chat_memory'] = new_chat_state()
 
 # 3. GLOBAL STYLES (Footer & Sidebar Fix)
 st.markdown("""
@@ -91,7 +97,12 @@ else:
     plan = st.session_state['plan']
     
     if selected == "Main Console":
-        main_console.show()
+        # Optional: profile reruns that do work (parsing, cleaners, exports...), not the job-status polls
+        profile_console = (profiling_enabled("console") or st.session_state.get('profile_console', False)) \
+            and main_console.rerun_does_work()
+        run_id = f"console-{st.session_state['username']}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        with profile_run(run_id, "main_console", enabled=profile_console):
+            main_console.show()
         
     elif selected == "The Oracle":
         oracle.show()
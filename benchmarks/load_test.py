@@ -0,0 +1,241 @@
+"""
+Concurrent-session load test.
+
+Simulates N users hitting one ClauseAI process the way app.py routes them:
+sign up / log in (utils/db.py) -> upload + analysis -> Oracle chat ->
+translation -> export. All LLM and vector traffic goes to mocks.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1 4 16 32 --latency 0.3
+    python -m benchmarks.load_test --queue-workers 4   # analyses via jobs.db + worker threads
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Isolate the load test from the real users.db / jobs.db before anything imports them
+_SCRATCH = tempfile.mkdtemp(prefix="clauseai_load_")
+os.environ["clauseai_users_db"] = os.path.join(_SCRATCH, "users.db")
+os.environ["clauseai_jobs_db"] = os.path.join(_SCRATCH, "jobs.db")
+os.environ["clauseai_revisions_db"] = os.path.join(_SCRATCH, "revisions.db")
+os.environ["clauseai_clause_cache_db"] = os.path.join(_SCRATCH, "clause_cache.db")
+os.environ["clauseai_contract_index_db"] = os.path.join(_SCRATCH, "contract_index.db")
+os.environ["clauseai_oracle_cache_db"] = os.path.join(_SCRATCH, "oracle_cache.db")
+os.environ["clauseai_embedding_cache_dir"] = os.path.join(_SCRATCH, "embeddings")
+# Every session uploads the same file; keep them full analyses
+os.environ.setdefault("clauseai_incremental", "0")
+if "--trace" not in sys.argv:
+    os.environ.setdefault("clauseai_tracing", "0")
+
+from benchmarks.synthetic import make_contract
+from benchmarks.mocks import MockLLM, install_mock_llm, install_null_vector_index, install_fake_embeddings
+
+ORACLE_QUESTIONS = [
+    "What is the notice period for termination?",
+    "Are there late payment penalties?",
+    "Which law governs this agreement?",
+    "Summarise the biggest risk in one sentence.",
+]
+AGENT_KEYS = ["legal", "finance", "compliance", "operations"]
+
+
+# --- 1. METRICS ---
+class Recorder:
+    def __init__(self):
+        self.samples = {}   # op -> [seconds]
+        self.errors = {}    # op -> count
+        self.oracle_sources = {}  # 'facts' / 'llm' -> answers
+        self.lock = threading.Lock()
+
+    def timed(self, op, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            with self.lock: self.errors[op] = self.errors.get(op, 0) + 1
+            raise
+        finally:
+            with self.lock: self.samples.setdefault(op, []).append(time.perf_counter() - start)
+
+def percentile(values, pct):
+    if not values: return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def summarise(values, errors):
+    n = len(values)
+    return {
+        "count": n,
+        "errors": errors,
+        "error_rate": round(errors / n, 4) if n else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1) if values else 0.0,
+    }
+
+
+# --- 2. ONE SIMULATED SESSION ---
+def analyse_direct(file_path):
+    from graph.doc_graph import run_graph
+    return run_graph(file_path)
+
+def analyse_via_queue(file_path, username):
+    """Same path as the console: submit_job, then poll get_job until terminal."""
+    from utils import jobs
+    with open(file_path, "rb") as f: data = f.read()
+    job_id = jobs.submit_job("analysis", {"config": {"tone": "Load", "agents": []}, "filename": os.path.basename(file_path)},
+                             username=username, file_name=os.path.basename(file_path), file_bytes=data)
+    while True:
+        job = jobs.get_job(job_id)
+        if job["status"] == "succeeded": return job["result"]["results"]
+        if job["status"] in ("failed", "cancelled"): raise RuntimeError(job["error"])
+        time.sleep(0.2)
+
+def run_session(rec, file_path, via_queue, lang):
+    from utils import db
+    from utils.translator import translate_report
+    from utils.export_utils import generate_pdf
+    from utils.export_docx import generate_docx
+    from utils.export_html import generate_html
+    from views.oracle import answer_question
+
+    username = f"load_{uuid.uuid4().hex[:10]}"
+    rec.timed("signup", db.add_user, username, "loadtest")
+    rec.timed("login", db.check_user, username, "loadtest")
+
+    if via_queue:
+        results = rec.timed("analysis", analyse_via_queue, file_path, username)
+    else:
+        results = rec.timed("analysis", analyse_direct, file_path)
+
+    for i, question in enumerate(ORACLE_QUESTIONS):
+        agent_key = AGENT_KEYS[i % len(AGENT_KEYS)]
+        _, source = rec.timed("oracle", answer_question, agent_key, question, results)
+        with rec.lock: rec.oracle_sources[source] = rec.oracle_sources.get(source, 0) + 1
+
+    translated = rec.timed("translation", translate_report, results, lang)
+    config = {"tone": "Load", "agents": ["Legal", "Finance", "Compliance", "Operations"]}
+    rec.timed("export_pdf", generate_pdf, results)
+    rec.timed("export_docx", generate_docx, translated, config)
+    rec.timed("export_html", generate_html, translated, config, os.path.basename(file_path))
+
+
+# --- 3. QUEUE WORKERS (optional) ---
+def start_queue_workers(count, stop):
+    from utils import jobs
+    from worker import process_job
+
+    def loop():
+        worker_id = jobs.new_worker_id()
+        while not stop.is_set():
+            jobs.worker_heartbeat(worker_id)
+            job, file_bytes = jobs.claim_next_job(worker_id)
+            if job is None:
+                stop.wait(0.2)
+                continue
+            process_job(worker_id, job, file_bytes)
+        jobs.remove_worker(worker_id)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(count)]
+    for t in threads: t.start()
+    return threads
+
+
+# --- 4. DRIVER ---
+def run_level(concurrency, sessions_per_user, file_path, via_queue, lang):
+    from utils import oracle_cache
+    rec = Recorder()
+    session_times, session_errors = [], 0
+    lock = threading.Lock()
+
+    def user():
+        nonlocal session_errors
+        for _ in range(sessions_per_user):
+            start = time.perf_counter()
+            try:
+                run_session(rec, file_path, via_queue, lang)
+            except Exception:
+                with lock: session_errors += 1
+            with lock: session_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for f in [pool.submit(user) for _ in range(concurrency)]:
+            f.result()
+    elapsed = time.perf_counter() - start
+
+    total_ops = sum(len(v) for v in rec.samples.values())
+    return {
+        "concurrency": concurrency,
+        "sessions": len(session_times),
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(len(session_times) / elapsed, 3),
+        "ops_per_s": round(total_ops / elapsed, 2),
+        "session": summarise(session_times, session_errors),
+        "operations": {op: summarise(v, rec.errors.get(op, 0)) for op, v in rec.samples.items()},
+        "oracle_sources": rec.oracle_sources,
+        "oracle_cache": oracle_cache.cache_stats(),  # cumulative across levels
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="ClauseAI concurrent-session load test")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--sessions", type=int, default=2, help="Sessions per simulated user per level")
+    parser.add_argument("--pages", type=int, default=10, help="Synthetic contract size")
+    parser.add_argument("--format", default="pdf", choices=["pdf", "docx", "txt"])
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock LLM seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of mock LLM calls that fail")
+    parser.add_argument("--queue-workers", type=int, default=0, help="Run analyses through jobs.db with this many worker threads")
+    parser.add_argument("--lang", default="Tamil")
+    parser.add_argument("--out", default=os.path.join("bench_results", "load_test.json"))
+    parser.add_argument("--trace", action="store_true", help="Keep span tracing on during the run")
+    args = parser.parse_args()
+
+    from utils import db, jobs
+    db.init_db()
+    jobs.init_jobs_db()
+
+    mock = MockLLM(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate)
+    restore_llm = install_mock_llm(mock)
+    _, restore_index = install_null_vector_index()
+    _, restore_embeddings = install_fake_embeddings()
+    file_path = make_contract(args.pages, args.format, os.path.join("bench_results", "corpus"))
+
+    stop = threading.Event()
+    if args.queue_workers:
+        start_queue_workers(args.queue_workers, stop)
+
+    report = {"file": file_path, "mock_latency_s": args.latency, "queue_workers": args.queue_workers, "levels": []}
+    try:
+        print(f"{'users':>5} {'sess/s':>8} {'ops/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+        for level in args.concurrency:
+            result = run_level(level, args.sessions, file_path, args.queue_workers > 0, args.lang)
+            report["levels"].append(result)
+            s = result["session"]
+            print(f"{level:>5} {result['sessions_per_s']:>8.2f} {result['ops_per_s']:>8.1f} "
+                  f"{s['p50_ms']:>7.0f}ms {s['p95_ms']:>7.0f}ms {s['p99_ms']:>7.0f}ms {s['error_rate']:>6.1%}")
+    finally:
+        stop.set()
+        restore_llm()
+        restore_index()
+        restore_embeddings()
+
+    report["llm"] = mock.snapshot()
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Offline stand-ins used by the benchmark and load-test harnesses:
+a mock/replay LLM with controllable latency, a no-op vector index and a
+deterministic offline embedder.
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+
+
+class MockResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class MockLLM:
+    """
+    Behaves like a LangChain chat model (`.invoke(prompt).content`).
+
+    - latency / jitter: seconds slept per call, to mimic provider round trips
+    - replay_file: optional JSON {sha256(prompt): response} recorded from real
+      runs; prompts not in the file get a canned, role-aware answer
+    - failure_rate: fraction of calls that raise, to exercise the failover path
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, replay_file=None, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.replay = {}
+        if replay_file and os.path.exists(replay_file):
+            with open(replay_file, "r", encoding="utf-8") as f:
+                self.replay = json.load(f)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_chars = 0
+        self.failures = 0
+
+    def invoke(self, prompt):
+        prompt = str(prompt)
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+            fail = self._rng.random() < self.failure_rate
+            delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0)
+
+        time.sleep(delay)
+        if fail:
+            with self._lock: self.failures += 1
+            raise RuntimeError("MockLLM injected failure")
+
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        if key in self.replay:
+            return MockResponse(self.replay[key])
+        return MockResponse(self._canned(prompt))
+
+    def _canned(self, prompt):
+        head = prompt.strip().split("\n", 1)[0][:120]
+        return (
+            "### Key Findings\n"
+            f"- Synthetic analysis for: {head}\n"
+            "- Payment due within 30 days; late interest 1.5% per month.\n"
+            "- Liability capped at 1x annual fees.\n\n"
+            "### Risks\n- Termination for convenience on 30 days' notice."
+        )
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": self.calls, "prompt_chars": self.prompt_chars, "failures": self.failures}
+
+
+class NullIndex:
+    """Accepts upserts/queries like a Pinecone Index without any network I/O."""
+
+    def __init__(self):
+        self.upserts = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, **kwargs):
+        with self._lock: self.upserts += len(vectors)
+
+    def query(self, **kwargs):
+        return {"matches": []}
+
+
+class FakeEmbeddings:
+    """
+    Offline stand-in for GoogleGenerativeAIEmbeddings: a deterministic
+    vector per text (hashed word counts), so similar texts stay similar.
+    """
+
+    model = "fake-embedding"
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _vector(self, text):
+        vector = [0.0] * self.dim
+        for word in str(text).lower().split():
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        return vector
+
+    def embed_query(self, text):
+        with self._lock: self.calls += 1
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        with self._lock: self.calls += 1
+        return [self._vector(t) for t in texts]
+
+
+def install_mock_llm(mock):
+    """
+    Routes universal_llm (and therefore config.llm, agents, translator and
+    the Oracle) through `mock`. Returns a function that restores the real chain.
+    """
+    from utils.universal_llm import universal_llm
+
+    original = universal_llm.providers
+    universal_llm.providers = [{"name": "Mock LLM", "builder": lambda: mock}]
+
+    def restore():
+        universal_llm.providers = original
+    return restore
+
+def install_null_vector_index(index=None):
+    """
+    Points the graph's storage node at a NullIndex and turns vault archiving
+    (save_analysis_state, used by worker.py) into a no-op.
+    """
+    import graph.doc_graph as doc_graph
+    import utils.pinecone_client as pinecone_client
+
+    index = index or NullIndex()
+    original_client = doc_graph.get_vector_store
+    original_save = pinecone_client.save_analysis_state
+    doc_graph.get_vector_store = lambda: index
+    pinecone_client.save_analysis_state = lambda *args, **kwargs: False
+
+    def restore():
+        doc_graph.get_vector_store = original_client
+        pinecone_client.save_analysis_state = original_save
+    return index, restore
+
+def install_fake_embeddings(embedder=None):
+    """
+    Routes the shared embedding service (Oracle contract index, archive
+    search) through `embedder`, behind the usual disk cache, so no run makes
+    live Gemini calls. Returns (embedder, restore).
+    """
+    import utils.pinecone_client as pinecone_client
+    from utils.embedding_service import EmbeddingService
+
+    embedder = embedder or FakeEmbeddings()
+    original = pinecone_client.embeddings
+    pinecone_client.embeddings = EmbeddingService(embedder)
+
+    def restore():
+        pinecone_client.embeddings = original
+    return embedder, restore
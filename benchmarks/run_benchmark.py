@@ -0,0 +1,213 @@
+"""
+End-to-end performance benchmark.
+
+Generates synthetic contracts, runs every pipeline stage against a mock LLM
+and writes per-stage wall time, peak RSS and LLM call counts to JSON.
+
+    python -m benchmarks.run_benchmark
+    python -m benchmarks.run_benchmark --sizes 1 10 --formats pdf --latency 0.2
+    python -m benchmarks.run_benchmark --compare bench_results/bench-<old>.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+import tempfile
+import subprocess
+
+# Tracing adds file I/O per span; keep it out of the numbers unless asked for
+if "--trace" not in sys.argv:
+    os.environ.setdefault("clauseai_tracing", "0")
+# Re-running the same synthetic contract must not turn into an incremental revision run
+os.environ.setdefault("clauseai_incremental", "0")
+# Keep the benchmark out of the real caches and indexes; each run also gets an empty clause cache (see bench_contract)
+_SCRATCH = tempfile.mkdtemp(prefix="clauseai_bench_")
+os.environ["clauseai_clause_cache_db"] = os.path.join(_SCRATCH, "clause_cache.db")
+os.environ["clauseai_contract_index_db"] = os.path.join(_SCRATCH, "contract_index.db")
+os.environ["clauseai_oracle_cache_db"] = os.path.join(_SCRATCH, "oracle_cache.db")
+os.environ["clauseai_embedding_cache_dir"] = os.path.join(_SCRATCH, "embeddings")
+
+from benchmarks.synthetic import make_contract
+from benchmarks.mocks import MockLLM, install_mock_llm, install_null_vector_index, install_fake_embeddings
+
+DEFAULT_SIZES = [1, 10, 100, 500]
+DEFAULT_FORMATS = ["pdf", "docx", "txt"]
+CORPUS_DIR = os.path.join("bench_results", "corpus")
+
+
+# --- 1. MEASUREMENT HELPERS ---
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, else ru_maxrss)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+class RssSampler:
+    """Samples RSS on a side thread so short spikes inside a stage are caught."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+def measure(stages, name, mock, func, *args, **kwargs):
+    before = mock.snapshot()
+    start = time.perf_counter()
+    error = None
+    with RssSampler() as rss:
+        try:
+            value = func(*args, **kwargs)
+        except Exception as e:
+            value, error = None, f"{type(e).__name__}: {e}"
+    after = mock.snapshot()
+    stages[name] = {
+        "wall_s": round(time.perf_counter() - start, 4),
+        "peak_rss_mb": round(rss.peak, 1),
+        "llm_calls": after["calls"] - before["calls"],
+        "prompt_chars": after["prompt_chars"] - before["prompt_chars"],
+    }
+    if error:
+        stages[name]["error"] = error
+        print(f"   ⚠️ {name} failed: {error}")
+    return value
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+# --- 2. ONE CONTRACT THROUGH EVERY STAGE ---
+def fresh_clause_cache(name):
+    """Empty clause cache per run, so one format's run never reuses clauses another one cached."""
+    from utils import clause_cache
+    clause_cache.CLAUSE_CACHE_DB = os.path.join(_SCRATCH, f"clause_cache-{name}.db")
+    clause_cache._schema_ready = False
+
+def bench_contract(path, mock, target_lang):
+    from utils.docsloader import load_document, chunk_contract, stream_contract_chunks
+    from planner.planner import plan_agents
+    from graph.doc_graph import run_graph
+    from utils.translator import translate_report
+    from utils.export_utils import generate_pdf
+    from utils.export_docx import generate_docx
+    from utils.export_html import generate_html
+
+    stages = {}
+    fresh_clause_cache(os.path.basename(path))
+    docs = measure(stages, "ingestion", mock, load_document, path) or []
+    chunks = measure(stages, "chunking", mock, chunk_contract, docs) or []
+    del docs
+    measure(stages, "streaming_ingest", mock, lambda: sum(1 for _ in stream_contract_chunks(path)))
+    full_text = " ".join(c.page_content for c in chunks)
+    measure(stages, "planning", mock, plan_agents, full_text)
+    results = measure(stages, "graph", mock, run_graph, path) or {}
+    measure(stages, "translation", mock, translate_report, results, target_lang)
+
+    config = {"tone": "Benchmark", "agents": ["Legal", "Finance", "Compliance", "Operations"]}
+    measure(stages, "export_pdf", mock, generate_pdf, results)
+    measure(stages, "export_docx", mock, generate_docx, results, config)
+    measure(stages, "export_html", mock, generate_html, results, config, os.path.basename(path))
+
+    return {"pages": results.get("pipeline", {}).get("pages", 0), "chunks": len(chunks), "stages": stages}
+
+
+# --- 3. COMPARISON ---
+def compare(old_path, new_report):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    old_runs = {(r["format"], r["size"]): r for r in old["runs"]}
+
+    print(f"\n📊 {old.get('commit')} -> {new_report['commit']} (wall time, seconds)")
+    for run in new_report["runs"]:
+        prev = old_runs.get((run["format"], run["size"]))
+        if not prev: continue
+        for stage, now in run["stages"].items():
+            then = prev["stages"].get(stage)
+            if not then or not then["wall_s"]: continue
+            delta = (now["wall_s"] - then["wall_s"]) / then["wall_s"] * 100
+            flag = "🔺" if delta > 10 else ("🟢" if delta < -10 else "  ")
+            print(f"{flag} {run['format']:>4} {run['size']:>4}p {stage:<12} "
+                  f"{then['wall_s']:>9.3f} -> {now['wall_s']:>9.3f} ({delta:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ClauseAI end-to-end benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Page counts to generate")
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, choices=DEFAULT_FORMATS)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock LLM seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency per call")
+    parser.add_argument("--replay", help="JSON file of recorded {prompt_sha256: response}")
+    parser.add_argument("--lang", default="Tamil", help="Target language for the translation stage")
+    parser.add_argument("--out", help="Output JSON (default bench_results/bench-<commit>.json)")
+    parser.add_argument("--compare", help="Previous benchmark JSON to diff against")
+    parser.add_argument("--trace", action="store_true", help="Keep span tracing on while benchmarking")
+    args = parser.parse_args()
+
+    mock = MockLLM(latency=args.latency, jitter=args.jitter, replay_file=args.replay)
+    restore_llm = install_mock_llm(mock)
+    null_index, restore_index = install_null_vector_index()
+    _, restore_embeddings = install_fake_embeddings()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock_latency_s": args.latency,
+        "runs": [],
+    }
+
+    try:
+        for fmt in args.formats:
+            for size in args.sizes:
+                path = make_contract(size, fmt, CORPUS_DIR)
+                print(f"⏱️ {fmt.upper()} {size} pages...")
+                run = bench_contract(path, mock, args.lang)
+                run.update({"format": fmt, "size": size, "file_bytes": os.path.getsize(path)})
+                report["runs"].append(run)
+                total = sum(s["wall_s"] for s in run["stages"].values())
+                calls = sum(s["llm_calls"] for s in run["stages"].values())
+                print(f"   ✅ {total:.2f}s total, {calls} LLM calls, {run['chunks']} chunks")
+    finally:
+        restore_llm()
+        restore_index()
+        restore_embeddings()
+
+    out = args.out or os.path.join("bench_results", f"bench-{report['commit']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {out}")
+
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
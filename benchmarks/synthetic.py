@@ -0,0 +1,124 @@
+"""
+Synthetic contract generator for benchmarks.
+
+Produces deterministic, contract-shaped documents (numbered sections,
+definitions, money, dates, repeated page headers/footers) with an exact
+page count in PDF, DOCX and TXT.
+"""
+import os
+import random
+import textwrap
+
+LINES_PER_PAGE = 46
+LINE_WIDTH = 110
+
+HEADER = "MASTER SERVICES AGREEMENT - CONFIDENTIAL"
+FOOTER = "Page {page} of {total}"
+
+SECTION_TITLES = [
+    "DEFINITIONS", "SCOPE OF SERVICES", "FEES AND PAYMENT", "TERM AND TERMINATION",
+    "CONFIDENTIALITY", "DATA PROTECTION", "SERVICE LEVELS", "INTELLECTUAL PROPERTY",
+    "INDEMNIFICATION", "LIMITATION OF LIABILITY", "FORCE MAJEURE", "GOVERNING LAW",
+    "AUDIT RIGHTS", "INSURANCE", "NOTICES", "MISCELLANEOUS",
+]
+
+CLAUSE_TEMPLATES = [
+    "The Supplier shall invoice the Customer monthly in arrears and the Customer shall pay each undisputed invoice within {days} days of receipt.",
+    "Late payments shall accrue interest at {pct}% per month until paid in full.",
+    "The total fees payable under this Agreement shall not exceed USD {amount} in any contract year.",
+    "Either party may terminate this Agreement for convenience on {days} days' prior written notice.",
+    "This Agreement commences on {date} and continues for an initial term of {years} years.",
+    "Each party shall keep the other party's Confidential Information strictly confidential and use it only for the purposes of this Agreement.",
+    "The Supplier shall process Personal Data only on documented instructions from the Customer and in accordance with the GDPR.",
+    "The Supplier shall achieve an Availability of at least {sla}% measured monthly, failing which Service Credits apply.",
+    "All Intellectual Property Rights in the Deliverables shall vest in the Customer upon payment.",
+    "The Supplier shall indemnify the Customer against all losses arising from any breach of Clause {ref}.",
+    "Neither party's aggregate liability shall exceed {mult} times the fees paid in the preceding twelve months.",
+    "Neither party shall be liable for any delay caused by events beyond its reasonable control, including acts of God, war or pandemic.",
+    "This Agreement shall be governed by the laws of {law} and the courts of {court} shall have exclusive jurisdiction.",
+    "The Customer may audit the Supplier's compliance with this Agreement once per year on {days} days' notice.",
+    "The Supplier shall maintain professional indemnity insurance of not less than EUR {amount}.",
+    "Any notice under this Agreement shall be in writing and delivered by hand or registered post.",
+]
+
+LAWS = [("England and Wales", "London"), ("the State of New York", "New York"), ("India", "Chennai"), ("Singapore", "Singapore")]
+
+
+# --- 1. TEXT GENERATION ---
+def generate_pages(n_pages, seed=7):
+    """Returns a list of n_pages page strings (each LINES_PER_PAGE lines incl. header/footer)."""
+    rng = random.Random(seed)
+    body_lines = []
+    section_no = 0
+
+    # Enough body lines to fill every page (header + blank + body + blank + footer)
+    needed = n_pages * (LINES_PER_PAGE - 4)
+    while len(body_lines) < needed:
+        section_no += 1
+        title = SECTION_TITLES[(section_no - 1) % len(SECTION_TITLES)]
+        body_lines.append(f"{section_no}. {title}")
+        for clause_no in range(1, rng.randint(3, 7)):
+            law, court = rng.choice(LAWS)
+            text = rng.choice(CLAUSE_TEMPLATES).format(
+                days=rng.choice([15, 30, 45, 60, 90]),
+                pct=rng.choice([1, 1.5, 2]),
+                amount=f"{rng.randint(1, 900) * 1000:,}",
+                date=f"{rng.randint(1, 28)} {rng.choice(['January', 'March', 'June', 'October'])} 202{rng.randint(4, 7)}",
+                years=rng.randint(1, 5),
+                sla=rng.choice([99.5, 99.9, 99.95]),
+                ref=f"{rng.randint(1, section_no)}.{rng.randint(1, 4)}",
+                mult=rng.choice([1, 1.5, 2]),
+                law=law, court=court,
+            )
+            body_lines.extend(textwrap.wrap(f"{section_no}.{clause_no} {text}", LINE_WIDTH))
+        body_lines.append("")
+
+    per_page = LINES_PER_PAGE - 4
+    pages = []
+    for p in range(n_pages):
+        chunk = body_lines[p * per_page:(p + 1) * per_page]
+        pages.append("\n".join([HEADER, ""] + chunk + ["", FOOTER.format(page=p + 1, total=n_pages)]))
+    return pages
+
+
+# --- 2. WRITERS ---
+def write_txt(pages, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\f\n".join(pages))
+
+def write_pdf(pages, path):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    for page in pages:
+        text = c.beginText(40, height - 40)
+        text.setFont("Helvetica", 8)
+        for line in page.split("\n"):
+            text.textLine(line)
+        c.drawText(text)
+        c.showPage()
+    c.save()
+
+def write_docx(pages, path):
+    from docx import Document
+
+    doc = Document()
+    for i, page in enumerate(pages):
+        for line in page.split("\n"):
+            doc.add_paragraph(line)
+        if i < len(pages) - 1:
+            doc.add_page_break()
+    doc.save(path)
+
+WRITERS = {"txt": write_txt, "pdf": write_pdf, "docx": write_docx}
+
+
+def make_contract(n_pages, fmt, folder, seed=7):
+    """Writes (or reuses) a synthetic contract and returns its path."""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"synthetic_{n_pages}p.{fmt}")
+    if not os.path.exists(path):
+        WRITERS[fmt](generate_pages(n_pages, seed), path)
+    return path
@@ -6,4 +6,17 @@ load_dotenv()
 # This 'llm' variable is now your "Failover System"
 llm = universal_llm
 PINECONE_API_KEY = os.getenv("pinecone_clause_api")
-INDEX_NAME = "clauseai-index-1"
\ No newline at end of file
+INDEX_NAME = "clauseai-index-1"
+# Vector store for archives and agent summaries: "pinecone" (hosted) or "faiss" (local, offline)
+VECTOR_BACKEND = os.getenv("clauseai_vector_backend", "pinecone").lower()
+# Usernames allowed to see admin-only tools (e.g. the profiling toggle)
+ADMIN_USERS = [u.strip() for u in os.getenv("clauseai_admins", "").split(",") if u.strip()]
+
+# Pre-flight cost/latency model (utils/pdf_inspector.preflight_scan).
+# Prices are USD per 1K tokens on the primary provider; override per deployment.
+LLM_COST_PER_1K_INPUT = float(os.getenv("clauseai_cost_per_1k_input", "0.00059"))
+LLM_COST_PER_1K_OUTPUT = float(os.getenv("clauseai_cost_per_1k_output", "0.00079"))
+LLM_OUTPUT_TOKENS_PER_CALL = 800
+LLM_CALL_OVERHEAD_S = 1.0
+LLM_INPUT_TOKENS_PER_S = 5000
+LLM_OUTPUT_TOKENS_PER_S = 250
@@ -1,17 +1,30 @@
+import os
 import operator
 import uuid
+import functools
+import time
+import threading
+import contextvars
 from typing import Annotated, TypedDict, List
 from langgraph.graph import StateGraph, END
 from config import llm
 
 # Import Agents
-from planner.planner import plan_agents
+from planner.planner import plan_agents, plan_from_domains, plan_strategy
 from multi_agents.legal import LegalAgent
 from multi_agents.finance import FinanceAgent
 from multi_agents.compliance import ComplianceAgent
 from multi_agents.operations import OperationsAgent
-from utils.docsloader import chunk_contract, load_document
-from utils.pinecone_client import get_pinecone_client
+from utils.docsloader import stream_contract_chunks
+from utils.classify import classify_contract, detect_contract_type
+from utils.helpers import estimate_tokens
+from utils import revisions
+from utils import contract_index, oracle_cache
+from utils.fact_extractor import extract_facts, facts_for_agent, select_context
+from multi_agents.map_reduce import prompt_version, cache_version
+from utils.vector_store import get_vector_store
+from utils.tracing import span
+from utils.profiler import profile_run, profiled_thread, profiling_enabled
 
 # State
 class GraphState(TypedDict):
@@ -19,6 +32,25 @@ class GraphState(TypedDict):
     plan: List[str]
     # operator.ior allows merging results from parallel agents (dict | dict)
     results: Annotated[dict, operator.ior]
+    # Span context of the run_graph span, so nodes running in LangGraph's
+    # worker threads still nest under the right trace
+    trace_parent: dict
+    # Domains classified chunk by chunk while the file was streaming in
+    domains: List[str]
+    # single_pass or map_reduce, picked by the planner from the contract size
+    strategy: str
+    # Set when this upload is a revision of an earlier version (utils/revisions.py)
+    revision: dict
+    # Deterministic fact sheet (utils/fact_extractor.py), {type: [fact, ...]}
+    facts: dict
+    # Hash of the cleaned contract text; with the user and run config, keys the stored agent vectors and the archive
+    content_hash: str
+    username: str
+    # Report settings ({tone, agents}) the run was started with
+    config: dict
+
+# Agent reports are embedded from their opening (embedding models cap input length)
+STORAGE_EMBED_CHARS = 8000
 
 # Initialize Agents
 legal_agent = LegalAgent()
@@ -26,32 +58,84 @@ finance_agent = FinanceAgent()
 compliance_agent = ComplianceAgent()
 operations_agent = OperationsAgent()
 
+# Stored reports are only reused while the agent's prompt is unchanged
+PROMPT_VERSIONS = {
+    "legal": prompt_version(legal_agent._prepare_prompt),
+    "finance": prompt_version(finance_agent._prepare_prompt),
+    "compliance": prompt_version(compliance_agent._prepare_prompt),
+    "operations": prompt_version(operations_agent._prepare_prompt),
+}
+
+# Namespaces in the shared clause cache; anything else is stale (see worker.py)
+CLAUSE_CACHE_VERSIONS = {
+    "legal": cache_version(legal_agent._prepare_prompt),
+    "finance": cache_version(finance_agent._prepare_prompt),
+    "compliance": cache_version(compliance_agent._prepare_prompt),
+    "operations": cache_version(operations_agent._prepare_prompt),
+}
+
+def agent_inputs(state, agent_key):
+    """Trimmed chunks, strategy, revision and fact block for one agent's run()."""
+    facts = state.get('facts') or {}
+    return (select_context(state['contract_chunks'], agent_key, facts), state.get('strategy'),
+            agent_revision(state, agent_key), facts_for_agent(facts, agent_key))
+
+def agent_revision(state, agent_key):
+    """The diff plus this agent's previous report, or None for a full review."""
+    revision = state.get('revision')
+    if not revision or agent_key not in revision['summaries']: return None
+    return {"diff": revision['diff'], "previous_summary": revision['summaries'][agent_key]}
+
+def traced_node(name):
+    """Wraps a node in a tracing span parented to the run's root span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(state):
+            with span(f"node.{name}", parent=state.get("trace_parent")), profiled_thread():
+                return func(state)
+        return wrapper
+    return decorator
+
 # Nodes
+@traced_node("planner")
 def planner_node(state: GraphState):
-    chunks = state['contract_chunks']
-    full_text = " ".join([chunk.page_content for chunk in chunks])
-    plan = plan_agents(full_text)
+    if state.get('domains') is not None:
+        plan = plan_from_domains(state['domains'])
+    else:
+        chunks = state['contract_chunks']
+        full_text = " ".join([chunk.page_content for chunk in chunks])
+        plan = plan_agents(full_text)
     
     # FORCE Operations if not visible in the ui (Optional logic)
     if "operations" not in plan:
         plan.append("operations")
-        
-    return {"plan": plan, "results": {}}
+
+    tokens = sum(estimate_tokens(chunk.page_content) for chunk in state['contract_chunks'])
+    strategy = plan_strategy(tokens)
+    # The console refuses oversized uploads up front; direct callers get the safest strategy
+    if strategy == "blocked": strategy = "map_reduce"
+
+    return {"plan": plan, "strategy": strategy, "results": {}}
 
 # Parallel Agent Nodes
+@traced_node("legal")
 def legal_node(state):
-    return {"results": {"legal": legal_agent.run(state['contract_chunks'])}}
+    return {"results": {"legal": legal_agent.run(*agent_inputs(state, 'legal'))}}
 
+@traced_node("finance")
 def finance_node(state):
-    return {"results": {"finance": finance_agent.run(state['contract_chunks'])}}
+    return {"results": {"finance": finance_agent.run(*agent_inputs(state, 'finance'))}}
 
+@traced_node("compliance")
 def compliance_node(state):
-    return {"results": {"compliance": compliance_agent.run(state['contract_chunks'])}}
+    return {"results": {"compliance": compliance_agent.run(*agent_inputs(state, 'compliance'))}}
 
+@traced_node("operations")
 def operations_node(state):
-    return {"results": {"operations": operations_agent.run(state['contract_chunks'])}}
+    return {"results": {"operations": operations_agent.run(*agent_inputs(state, 'operations'))}}
 
 # Synthesis Node (UPDATED TO USE UNIVERSAL LLM)
+@traced_node("reviewer")
 def reviewer_node(state: GraphState):
     results = state['results']
     combined_text = ""
@@ -68,6 +152,13 @@ def reviewer_node(state: GraphState):
         "Highlight the biggest risks and conflicts.\n\n"
         f"Expert Reports:\n{combined_text}"
     )
+    revision = state.get('revision')
+    if revision:
+        prompt += (
+            f"\n\nThis contract is a revision of '{revision['previous']['filename']}'. "
+            "End with a 'What Changed' section explaining how these clause changes shift the risk picture:\n"
+            f"{revisions.render_changes(revision['diff'], with_text=False) or 'No clause changes.'}"
+        )
     
     try:
         # --- USE THE FAILOVER SYSTEM HERE ---
@@ -88,26 +179,36 @@ def reviewer_node(state: GraphState):
     except Exception as e:
         return {"results": {"synthesis": {"status": "error", "message": str(e)}}}
 
+@traced_node("storage")
 def storage_node(state: GraphState):
-    """Upserts results to Pinecone."""
+    """Upserts each agent's report, embedded, to the configured vector store."""
+    from utils.pinecone_client import embeddings, archive_key, DEFAULT_SAVE_CONFIG
     results = state['results']
+    content_hash = state.get('content_hash')
+    username = state.get('username') or ""
+    # Keyed like the archive (user + contract + run config): a re-run with the
+    # same settings overwrites, a run with other settings keeps its own vectors
+    archive_id = archive_key(username, content_hash, state.get('config') or DEFAULT_SAVE_CONFIG) if content_hash else f"run_{uuid.uuid4()}"
+    reports = {name: str(data.get("summary", "")) for name, data in results.items()
+               if data.get("status") == "success" and data.get("summary")}
+    if not reports or embeddings is None:
+        return {"results": {"storage": {"status": "skipped"}}}
     try:
-        pc_index = get_pinecone_client()
-        vectors = []
-        for agent_name, data in results.items():
-            if data.get("status") != "success": continue
-            
-            vector_id = f"{agent_name}_{uuid.uuid4()}"
-            vectors.append({
-                "id": vector_id,
-                "values": [0.1] * 1536, 
-                "metadata": {
-                    "agent": agent_name,
-                    # Truncate to avoid metadata limits
-                    "summary": data.get("summary", "")[:30000]
-                }
-            })
-        if vectors:
+        pc_index = get_vector_store()
+        values = embeddings.embed_documents([summary[:STORAGE_EMBED_CHARS] for summary in reports.values()])
+        vectors = [{
+            "id": f"{agent_name}_{archive_id}",
+            "values": vector,
+            "metadata": {
+                "agent": agent_name,
+                "archive_id": archive_id,
+                "content_hash": content_hash or "",
+                "username": username,
+                # Truncate to avoid metadata limits
+                "summary": summary[:30000]
+            }
+        } for (agent_name, summary), vector in zip(reports.items(), values)]
+        with span("vector_store.upsert", backend=getattr(pc_index, "backend", "custom"), vectors=len(vectors)):
             pc_index.upsert(vectors=vectors)
         return {"results": {"storage": {"status": "success"}}}
     except Exception as e:
@@ -148,8 +249,129 @@ workflow.add_edge("storage", END)
 
 app = workflow.compile()
 
-def run_graph(file_path):
-    docs = load_document(file_path)
-    chunks = chunk_contract(docs)
-    final_state = app.invoke({"contract_chunks": chunks, "results": {}})
-    return final_state['results']
\ No newline at end of file
+# Rough share of the total runtime each node represents (for progress bars)
+NODE_PROGRESS = {"planner": 0.15, "legal": 0.15, "finance": 0.15, "compliance": 0.15,
+                 "operations": 0.15, "reviewer": 0.15, "storage": 0.05}
+
+def run_graph(file_path, on_progress=None, profile=None, run_id=None, username=None, revision_of="auto",
+              config=None):
+    """
+    Runs the full audit. `on_progress(fraction, stage)` is called after parsing
+    and after every node; it may raise (e.g. JobCancelled) to abort the run.
+    With `profile=True` (or clauseai_profile=graph) the run is wrapped in
+    cProfile + tracemalloc and saved under profiles/<run_id>/.
+    Uploads recognised as a revision of `username`'s earlier contract only
+    re-review the changed clauses. `revision_of` is the version id the user
+    confirmed on upload, None for a full run, or "auto" to detect one.
+    `config` is the report configuration the run is archived under.
+    """
+    if profile is None: profile = profiling_enabled("graph")
+    run_id = run_id or f"run-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    with profile_run(run_id, "run_graph", enabled=profile):
+        return _run_graph(file_path, on_progress, run_id, username, revision_of, config)
+
+def _plan_revision(clauses, username, stats, filename, revision_of):
+    """Looks up an earlier version of this contract; never fails the run."""
+    if revision_of is None: return None
+    try:
+        revision = revisions.plan_revision(clauses, username, PROMPT_VERSIONS, filename,
+                                           None if revision_of == "auto" else int(revision_of))
+    except Exception as e:
+        print(f"⚠️ Revision lookup skipped: {e}")
+        return None
+    if revision:
+        stats["revision"] = {"previous": revision["previous"], **revisions.summarize_diff(revision["diff"]),
+                             "incremental_agents": sorted(revision["summaries"])}
+    return revision
+
+def _record_version(file_path, clauses, username, results, revision):
+    # An identical re-upload adds nothing the stored version does not have
+    if revision and _no_changes(revision["diff"]): return
+    try:
+        revisions.record_version(username, os.path.basename(file_path), clauses, results, PROMPT_VERSIONS)
+    except Exception as e:
+        print(f"⚠️ Could not record contract version: {e}")
+
+def _build_oracle_index(chunks, stats):
+    """Indexes the contract for the Oracle; runs beside the agents, never fails the run."""
+    try:
+        with span("contract_index", chunks=len(chunks)):
+            stats["oracle_index"] = contract_index.build_index(chunks)
+        # Answers cached against an earlier analysis of this contract are stale
+        oracle_cache.invalidate(stats["oracle_index"]["contract_id"])
+    except Exception as e:
+        print(f"⚠️ Oracle index skipped: {e}")
+
+def _no_changes(diff):
+    return not (diff["added"] or diff["removed"] or diff["modified"])
+
+def _run_graph(file_path, on_progress, run_id, username, revision_of="auto", config=None):
+    def report(fraction, stage):
+        if on_progress: on_progress(min(fraction, 0.99), stage)
+
+    with span("run_graph", file=os.path.basename(file_path), run_id=run_id) as root:
+        report(0.0, "parsing")
+        # Pages are parsed, chunked and classified as they stream in, so the
+        # planner's input is ready the moment the last page is read.
+        stats, chunks, domains = {}, [], set()
+        with span("ingest", file=os.path.basename(file_path)) as ingest_span:
+            for chunk in stream_contract_chunks(file_path, stats):
+                chunks.append(chunk)
+                domains.update(classify_contract(chunk.page_content))
+            if ingest_span:
+                for key, value in stats.items():
+                    if not isinstance(value, dict): ingest_span.set_attribute(key, value)
+                if "boilerplate" in stats:
+                    ingest_span.set_attribute("boilerplate.tokens_saved", stats["boilerplate"]["tokens_saved"])
+        domains.discard("general")
+        stats["contract_type"] = detect_contract_type("".join(c.page_content for c in chunks[:3]))
+        stats["content_hash"] = contract_index.contract_id_for(chunks)
+        report(0.05, "planning")
+
+        clauses = revisions.clauses_from_chunks(chunks)
+        revision = _plan_revision(clauses, username, stats, os.path.basename(file_path), revision_of)
+        with span("extract_facts") as facts_span:
+            facts = extract_facts(chunks)
+            if facts_span: facts_span.set_attribute("facts", sum(len(v) for v in facts.values()))
+        stats["facts"] = facts
+        # Copy the context so the index span nests under this run's trace
+        indexer = threading.Thread(target=contextvars.copy_context().run,
+                                   args=(_build_oracle_index, chunks, stats), daemon=True)
+        indexer.start()
+
+        inputs = {"contract_chunks": chunks, "results": {}, "domains": sorted(domains),
+                  "revision": revision, "facts": facts, "content_hash": stats["content_hash"],
+                  "username": username or "", "config": config or {},
+                  "trace_parent": root.context() if root else None}
+        if on_progress is None:
+            final_state = app.invoke(inputs)
+            indexer.join()
+            _record_version(file_path, clauses, username, final_state['results'], revision)
+            return _with_pipeline_info(final_state['results'], stats, final_state.get('strategy'))
+
+        # Stream so we can report after each node and stop between nodes
+        done = 0.05
+        final_state = inputs
+        for mode, chunk in app.stream(inputs, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state = chunk
+                continue
+            for node_name in chunk:
+                done += NODE_PROGRESS.get(node_name, 0.0)
+                report(done, node_name)
+        indexer.join()
+        _record_version(file_path, clauses, username, final_state['results'], revision)
+        return _with_pipeline_info(final_state['results'], stats, final_state.get('strategy'))
+
+def _with_pipeline_info(results, stats, strategy=None):
+    """
+    Attaches run metadata under results['pipeline']. Its status is 'info', so
+    the reviewer, storage node, translator and exporters all skip it.
+    """
+    results = dict(results)
+    results["pipeline"] = {"status": "info", **stats, "strategy": strategy}
+    usages = [data["clause_cache"] for data in results.values() if isinstance(data, dict) and data.get("clause_cache")]
+    if usages:
+        results["pipeline"]["clause_cache"] = {key: sum(u[key] for u in usages)
+                                               for key in ("clauses", "cached", "review_calls", "tokens_saved")}
+    return results
\ No newline at end of file
@@ -1,4 +1,4 @@
-from config import llm  # Import the Universal Failover System
+from multi_agents.map_reduce import analyze  # Universal Failover System, single pass or map/reduce
 from typing import List, Dict, Any
 
 class ComplianceAgent:
@@ -10,34 +10,32 @@ class ComplianceAgent:
     def __init__(self):
         self.role = "Compliance Officer"
 
-    def _prepare_prompt(self, text_input: str) -> str:
-        """Constructs the compliance-specific analysis prompt."""
+    def _prepare_prompt(self, text_input: str, instructions: str = None) -> str:
+        """Constructs the compliance-specific analysis prompt; `instructions` replace the report format."""
         return (
             f"You are a {self.role}. Evaluate this contract for regulatory compliance. "
             "Focus on: Data Privacy (GDPR/CCPA), Anti-Bribery (FCPA), Reporting Deadlines, "
             "Audit Rights, and Industry-specific regulations. "
-            "Provide a structured summary with headings: Regulatory Risks, Audit Rights, Compliance Deadlines.\n\n"
+            f"{instructions or 'Provide a structured summary with headings: Regulatory Risks, Audit Rights, Compliance Deadlines.'}\n\n"
             f"Contract Text:\n{text_input}"
         )
 
-    def run(self, text_chunks: List[Any]) -> Dict[str, Any]:
+    def run(self, text_chunks: List[Any], strategy: str = None, revision: Dict[str, Any] = None, facts: str = "") -> Dict[str, Any]:
         """
         Processes document chunks to identify compliance gaps.
         """
-        text_input = "\n\n".join([chunk.page_content for chunk in text_chunks])
-        prompt = self._prepare_prompt(text_input)
-
         try:
-            # Run with Universal LLM
-            response = llm.invoke(prompt)
-            summary = response.content
+            # Run with Universal LLM (single pass or map/reduce per the planner)
+            usage = {}
+            summary = analyze(self._prepare_prompt, text_chunks, strategy, revision, usage, facts)
 
             return {
                 "agent": "Compliance",
                 "role": self.role,
                 "task": "Regulatory and Audit Analysis",
                 "summary": summary,
-                "status": "success"
+                "status": "success",
+                "clause_cache": usage
             }
 
         except Exception as e:
@@ -1,4 +1,4 @@
-from config import llm  # Import the Universal Failover System
+from multi_agents.map_reduce import analyze  # Universal Failover System, single pass or map/reduce
 from typing import List, Dict, Any
 
 class FinanceAgent:
@@ -11,39 +11,33 @@ class FinanceAgent:
         self.role = "Financial Analyst"
         # Removed hardcoded OpenAI client. 'llm' from config handles everything.
 
-    def _prepare_prompt(self, text_input: str) -> str:
-        """Constructs the financial analysis prompt."""
+    def _prepare_prompt(self, text_input: str, instructions: str = None) -> str:
+        """Constructs the financial analysis prompt; `instructions` replace the report format."""
         return (
             f"You are a {self.role}. Extract and analyze the financial terms of this contract. "
             "Identify: Payment Schedules, Late Payment Penalties, Currency Requirements, "
             "Taxes, and Financial Exit Costs. "
-            "Provide a structured summary with headings: Payment Terms, Penalties, Fiscal Risks.\n\n"
+            f"{instructions or 'Provide a structured summary with headings: Payment Terms, Penalties, Fiscal Risks.'}\n\n"
             f"Contract Text:\n{text_input}"
         )
 
-    def run(self, text_chunks: List[Any]) -> Dict[str, Any]:
+    def run(self, text_chunks: List[Any], strategy: str = None, revision: Dict[str, Any] = None, facts: str = "") -> Dict[str, Any]:
         """
         Processes document chunks to extract financial data.
         """
-        # 1. Combine chunks
-        text_input = "\n\n".join([chunk.page_content for chunk in text_chunks])
-        
-        # 2. Prepare Prompt
-        prompt = self._prepare_prompt(text_input)
-
         try:
-            # 3. RUN WITH FAILOVER (Groq -> Google -> OpenRouter -> HF -> Ollama)
-            response = llm.invoke(prompt)
-            
-            # 4. Extract Text
-            summary = response.content
+            # RUN WITH FAILOVER (Groq -> Google -> OpenRouter -> HF -> Ollama),
+            # as one prompt or map/reduce batches depending on the strategy
+            usage = {}
+            summary = analyze(self._prepare_prompt, text_chunks, strategy, revision, usage, facts)
 
             return {
                 "agent": "Finance",
                 "role": self.role,
                 "task": "Financial Risk and Term Extraction",
                 "summary": summary,
-                "status": "success"
+                "status": "success",
+                "clause_cache": usage
             }
 
         except Exception as e:
@@ -0,0 +1,218 @@
+import contextvars
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from config import llm
+from planner.planner import MAP_BATCH_TOKENS
+from utils.helpers import estimate_tokens
+from utils.revisions import render_changes, clauses_from_chunks
+from utils import clause_cache
+
+# Batches of one agent are reviewed concurrently, up to this many at a time
+MAP_CONCURRENCY = 4
+# Clause review asks for one finding per clause, so batches stay small
+# enough for the answer to fit a model's output limit
+CLAUSE_BATCH_TOKENS = 6_000
+
+# Replaces the agent's report format (prepare_prompt's `instructions`), so the
+# clauses are the only contract text and there is one output format to follow
+CLAUSE_REVIEW_INSTRUCTIONS = (
+    "Review each clause below SEPARATELY. For every clause, write its tag on its own line "
+    "(e.g. [[c12]]) followed by 1-4 short bullet points of findings, or 'No issues.' "
+    "Do not write an overall report or use any other headings."
+)
+CLAUSE_TAG = re.compile(r"\[\[(c\d+(?:\.\d+)?)\]\]")
+NO_ISSUES = re.compile(r"^\W*no (?:notable )?(?:issues|findings)\W*$", re.I)
+
+def batch_chunks(text_chunks, max_tokens=MAP_BATCH_TOKENS):
+    """Groups consecutive chunks into texts of at most `max_tokens` each."""
+    batches, current, size = [], [], 0
+    for chunk in text_chunks:
+        tokens = estimate_tokens(chunk.page_content)
+        if current and size + tokens > max_tokens:
+            batches.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(chunk.page_content)
+        size += tokens
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+def _merge_prompt(partials):
+    sections = "\n\n".join(f"--- PART {i + 1} OF {len(partials)} ---\n{text}" for i, text in enumerate(partials))
+    return (
+        "The following are partial analyses of consecutive parts of ONE contract. "
+        "Merge them into a single report that keeps the same headings as the partial reports. "
+        "Remove duplicates, keep every distinct risk and obligation, and note conflicts between parts.\n\n"
+        f"{sections}"
+    )
+
+def prompt_version(prepare_prompt):
+    """Short hash of an agent's prompt template; stored reports are only reused while it matches."""
+    return hashlib.sha256(prepare_prompt("").encode("utf-8")).hexdigest()[:12]
+
+def _clause_label(clause):
+    return f"{clause['number'] or ''} {clause['heading'] or ''}".strip()
+
+def _parse_findings(text, batch):
+    """Splits a clause-review answer on its [[cN]] tags; untagged clauses are left out."""
+    wanted = {c["id"] for c in batch}
+    parts = CLAUSE_TAG.split(text)
+    findings = {}
+    for clause_id, body in zip(parts[1::2], parts[2::2]):
+        body = body.strip(" *:\n")
+        if clause_id in wanted and body: findings[clause_id] = body
+    return findings
+
+def _batch_clauses(clauses, max_tokens=CLAUSE_BATCH_TOKENS):
+    batches, current, size = [], [], 0
+    for clause in clauses:
+        tokens = estimate_tokens(clause["text"])
+        if current and size + tokens > max_tokens:
+            batches.append(current)
+            current, size = [], 0
+        current.append(clause)
+        size += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _with_facts(facts, text):
+    return f"{facts}\n\n{text}" if facts else text
+
+def review_clauses(prepare_prompt, clauses, usage=None, facts=""):
+    """
+    Map/reduce at clause level with the shared clause cache: clauses seen
+    before (exactly or near-identically, in any contract) reuse their stored
+    finding, the rest are reviewed in batches, and the report is written
+    from the per-clause findings.
+    A clause whose finding cannot be parsed from the answer is asked again
+    once; if it still has none, its text goes to the report step unreviewed.
+    Returns None when no clause could be parsed at all, so the caller falls
+    back to the whole-contract prompt.
+    """
+    clause_prompt = lambda text: prepare_prompt(text, CLAUSE_REVIEW_INSTRUCTIONS)
+    version = cache_version(prepare_prompt)
+    model = llm.primary_model()
+
+    findings, todo, saved = {}, [], 0
+    for clause in clauses:
+        cached = clause_cache.lookup(version, model, clause["text"])
+        if cached is None:
+            todo.append(clause)
+        else:
+            findings[clause["id"]] = cached
+            saved += estimate_tokens(clause["text"])
+
+    def ask(batch):
+        text = "\n\n".join(f"[[{c['id']}]] {_clause_label(c)}\n{c['text'].strip()}" for c in batch)
+        answer = llm.invoke(clause_prompt(text)).content
+        parsed = _parse_findings(str(answer), batch)
+        # Only answers from the primary model go into the shared cache
+        if llm.last_model() == model:
+            for c in batch:
+                if c["id"] in parsed: clause_cache.store(version, model, c["text"], parsed[c["id"]])
+        return parsed
+
+    def review(batch):
+        parsed = ask(batch)
+        missing = [c for c in batch if c["id"] not in parsed]
+        if missing: parsed.update(ask(missing))
+        return parsed
+
+    batches = _batch_clauses(todo)
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, review, batch) for batch in batches]
+        for f in futures: findings.update(f.result())
+
+    unreviewed = [c for c in clauses if c["id"] not in findings]
+    if usage is not None:
+        usage.update({"clauses": len(clauses), "cached": len(clauses) - len(todo), "review_calls": len(batches),
+                      "unreviewed": len(unreviewed), "tokens_saved": saved})
+    if len(unreviewed) == len(clauses):
+        print("⚠️ Clause review answers could not be parsed; reviewing the whole contract instead")
+        return None
+
+    notes = [f"[{_clause_label(c) or c['id']}] {findings[c['id']]}" if c["id"] in findings
+             else f"[{_clause_label(c) or c['id']}] NOT YET REVIEWED, review this clause text:\n{c['text'].strip()}"
+             for c in clauses if c["id"] not in findings or not NO_ISSUES.match(findings[c["id"]])]
+    return _write_report(prepare_prompt, notes or ["No issues found in any clause."], facts)
+
+def _write_report(prepare_prompt, notes, facts=""):
+    """Reduce step: one report from the findings, via partial reports if they do not fit one prompt."""
+    # Facts go here, not into the clause prompts, so the clause cache stays contract-independent
+    header = _with_facts(facts, "CLAUSE-BY-CLAUSE FINDINGS (already reviewed; write the final report from these):\n\n")
+    groups, current, size = [], [], 0
+    for note in notes:
+        tokens = estimate_tokens(note)
+        if current and size + tokens > MAP_BATCH_TOKENS:
+            groups.append(current)
+            current, size = [], 0
+        current.append(note)
+        size += tokens
+    groups.append(current)
+
+    if len(groups) == 1:
+        return llm.invoke(prepare_prompt(header + "\n\n".join(groups[0]))).content
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as pool:
+        futures = [pool.submit(contextvars.copy_context().run,
+                               lambda g: llm.invoke(prepare_prompt(header + "\n\n".join(g))).content, group)
+                   for group in groups]
+        partials = [f.result() for f in futures]
+    return llm.invoke(_merge_prompt(partials)).content
+
+def cache_version(prepare_prompt):
+    """Clause-cache namespace of an agent: changes whenever its prompt does."""
+    return prompt_version(lambda text: prepare_prompt(text, CLAUSE_REVIEW_INSTRUCTIONS))
+
+def _revision_input(revision):
+    return (
+        "This contract is a REVISION of one you already reviewed. Update your previous report below: "
+        "keep findings for unchanged clauses, revise or drop findings affected by modified or removed "
+        "clauses, add findings for new clauses, and keep the same headings.\n\n"
+        f"CLAUSE CHANGES IN THIS REVISION:\n{render_changes(revision['diff'])}\n\n"
+        f"YOUR PREVIOUS REPORT:\n{revision['previous_summary']}"
+    )
+
+def analyze(prepare_prompt, text_chunks, strategy=None, revision=None, usage=None, facts=""):
+    """
+    Runs one agent over the contract with the planner's strategy and returns
+    the summary text. `prepare_prompt(text, instructions=None)` builds the
+    agent's prompt. With `revision` ({diff, previous_summary}) only the
+    changed clauses are sent, together with the agent's report on the
+    previous version.
+    Clause-split contracts the planner sends to map_reduce go through
+    review_clauses (with the clause cache on): they need several calls
+    anyway, and repeated clauses come from the cache. Single-pass contracts
+    stay one call. `usage` (a dict) is filled with the cache statistics.
+    `facts` is the agent's block from utils/fact_extractor.py, placed ahead
+    of the contract text.
+    """
+    if revision is not None:
+        diff = revision["diff"]
+        if not (diff["added"] or diff["removed"] or diff["modified"]):
+            return revision["previous_summary"]
+        return llm.invoke(prepare_prompt(_with_facts(facts, _revision_input(revision)))).content
+
+    use_clauses = clause_cache.CLAUSE_CACHE_ENABLED and strategy == "map_reduce"
+    clauses = clauses_from_chunks(text_chunks) if use_clauses else []
+    report = review_clauses(prepare_prompt, clauses, usage, facts) if clauses else None
+    if report is not None:
+        return report
+
+    if strategy != "map_reduce":
+        text_input = "\n\n".join([chunk.page_content for chunk in text_chunks])
+        return llm.invoke(prepare_prompt(_with_facts(facts, text_input))).content
+
+    batches = batch_chunks(text_chunks)
+    if len(batches) == 1:
+        return llm.invoke(prepare_prompt(_with_facts(facts, batches[0]))).content
+
+    def review(batch):
+        return llm.invoke(prepare_prompt(_with_facts(facts, batch))).content
+
+    # Each task runs in a copy of this context so its LLM spans nest under the agent's node span
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, review, batch) for batch in batches]
+        partials = [f.result() for f in futures]
+    return llm.invoke(_merge_prompt(partials)).content
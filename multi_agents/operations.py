@@ -1,4 +1,4 @@
-from config import llm  # Import the Universal Failover System
+from multi_agents.map_reduce import analyze  # Universal Failover System, single pass or map/reduce
 from typing import List, Dict, Any
 
 class OperationsAgent:
@@ -10,30 +10,28 @@ class OperationsAgent:
     def __init__(self):
         self.role = "Operations Manager"
 
-    def _prepare_prompt(self, text_input: str) -> str:
+    def _prepare_prompt(self, text_input: str, instructions: str = None) -> str:
         return (
             f"You are a {self.role}. Analyze this contract for operational details. "
             "Identify: Service Level Agreements (SLAs), Delivery Timelines, "
             "Performance Benchmarks, Reporting Requirements, and Support Obligations. "
-            "Provide a structured summary with headings: SLAs, Timelines, Deliverables.\n\n"
+            f"{instructions or 'Provide a structured summary with headings: SLAs, Timelines, Deliverables.'}\n\n"
             f"Contract Text:\n{text_input}"
         )
 
-    def run(self, text_chunks: List[Any]) -> Dict[str, Any]:
-        text_input = "\n\n".join([chunk.page_content for chunk in text_chunks])
-        prompt = self._prepare_prompt(text_input)
-
+    def run(self, text_chunks: List[Any], strategy: str = None, revision: Dict[str, Any] = None, facts: str = "") -> Dict[str, Any]:
         try:
-            # Run with Universal LLM
-            response = llm.invoke(prompt)
-            summary = response.content
+            # Run with Universal LLM (single pass or map/reduce per the planner)
+            usage = {}
+            summary = analyze(self._prepare_prompt, text_chunks, strategy, revision, usage, facts)
 
             return {
                 "agent": "Operations",
                 "role": self.role,
                 "task": "SLA and Timeline Analysis",
                 "summary": summary,
-                "status": "success"
+                "status": "success",
+                "clause_cache": usage
             }
 
         except Exception as e:
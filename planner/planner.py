@@ -1,5 +1,16 @@
+import os
 from utils.classify import classify_contract
 
+# --- EXECUTION STRATEGY ---
+# Estimated contract tokens decide how agents read the contract:
+# single_pass sends the whole text in one prompt per agent; map_reduce
+# reviews MAP_BATCH_TOKENS-sized batches and merges the partial reports;
+# anything above MAX_JOB_TOKENS is refused by the console before it is queued.
+SINGLE_PASS_MAX_TOKENS = int(os.getenv("clauseai_single_pass_max_tokens", "24000"))
+MAP_BATCH_TOKENS = 12_000
+WARN_JOB_TOKENS = int(os.getenv("clauseai_warn_job_tokens", "150000"))
+MAX_JOB_TOKENS = int(os.getenv("clauseai_max_job_tokens", "1000000"))
+
 def plan_agents(contract_text: str):
     """
     Planner decides agents to execute
@@ -7,7 +18,13 @@ def plan_agents(contract_text: str):
     """
 
     domains = classify_contract(contract_text)
+    return plan_from_domains(domains)
 
+def plan_from_domains(domains):
+    """
+    Same decision as plan_agents, for callers that classified the contract
+    incrementally (e.g. chunk by chunk while it was still being parsed).
+    """
     plan = []
 
     if "legal" in domains:
@@ -24,3 +41,11 @@ def plan_agents(contract_text: str):
         plan.append("legal")
 
     return plan
+
+def plan_strategy(estimated_tokens):
+    """Picks single_pass, map_reduce or blocked from the contract size."""
+    if estimated_tokens > MAX_JOB_TOKENS:
+        return "blocked"
+    if estimated_tokens > SINGLE_PASS_MAX_TOKENS:
+        return "map_reduce"
+    return "single_pass"
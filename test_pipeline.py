@@ -0,0 +1,465 @@
+"""
+Focused tests for the pipeline's pure pieces (no LLM, no network).
+
+    python -m pytest -q test_pipeline.py
+
+Every SQLite-backed module is pointed at a temporary file per test.
+"""
+import threading
+
+import pytest
+
+
+# --- 1. JOB QUEUE ---
+def _jobs(tmp_path, monkeypatch):
+    from utils import jobs
+    monkeypatch.setattr(jobs, "JOBS_DB", str(tmp_path / "jobs.db"))
+    jobs.init_jobs_db()
+    return jobs
+
+def test_claim_next_job_is_exclusive(tmp_path, monkeypatch):
+    jobs = _jobs(tmp_path, monkeypatch)
+    submitted = {jobs.submit_job("analysis", {"n": i}, file_bytes=b"x") for i in range(30)}
+    claimed, lock = [], threading.Lock()
+
+    def worker(worker_id):
+        while True:
+            job, _ = jobs.claim_next_job(worker_id)
+            if job is None: return
+            with lock: claimed.append(job["id"])
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(6)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(claimed) == len(set(claimed)) == len(submitted)
+    assert set(claimed) == submitted
+
+def test_claim_next_job_requeues_expired_lease(tmp_path, monkeypatch):
+    jobs = _jobs(tmp_path, monkeypatch)
+    job_id = jobs.submit_job("analysis", {}, max_attempts=2)
+    first, _ = jobs.claim_next_job("dead-worker", lease_seconds=-1)
+    second, _ = jobs.claim_next_job("live-worker")
+    assert first["id"] == second["id"] == job_id
+    assert second["worker_id"] == "live-worker" and second["attempts"] == 2
+
+def test_claim_next_job_filters_kinds(tmp_path, monkeypatch):
+    jobs = _jobs(tmp_path, monkeypatch)
+    jobs.submit_job("analysis", {})
+    compact_id = jobs.submit_job("compact_archives", {})
+    job, _ = jobs.claim_next_job("w", kinds=["compact_archives"])
+    assert job["id"] == compact_id
+
+
+def test_analysis_job_removes_its_upload_copy(tmp_path, monkeypatch):
+    import sys, types
+    import worker
+    seen = []
+    def run_graph(file_path, **kwargs):
+        seen.append(open(file_path, "rb").read())
+        raise RuntimeError("every model failed")
+    monkeypatch.setitem(sys.modules, "graph.doc_graph", types.SimpleNamespace(run_graph=run_graph))
+    monkeypatch.setattr(worker, "JOB_DIR", str(tmp_path / "jobs"))
+    job = {"id": "j1", "payload": {}, "file_name": "a.pdf", "username": "alice"}
+    with pytest.raises(RuntimeError):
+        worker.run_analysis_job(job, b"%PDF", lambda *args: None)
+    assert seen == [b"%PDF"] and not (tmp_path / "jobs" / "j1").exists()
+
+# --- 2. CLAUSE REVIEW (map_reduce) ---
+CLAUSES = [{"id": f"c{i}", "number": str(i), "heading": h, "text": f"{i}. {h}. The supplier shall {h.lower()}."}
+           for i, h in enumerate(["Payment", "Termination", "Liability"], start=1)]
+
+def test_parse_findings_splits_on_tags():
+    from multi_agents.map_reduce import _parse_findings
+    answer = "[[c1]]\n- Net 30 payment.\n\n**[[c2]]**: No issues.\n[[c9]] not in this batch"
+    assert _parse_findings(answer, CLAUSES) == {"c1": "- Net 30 payment.", "c2": "No issues."}
+
+def test_parse_findings_without_tags_is_empty():
+    from multi_agents.map_reduce import _parse_findings
+    assert _parse_findings("Overall the contract looks fine.", CLAUSES) == {}
+    assert _parse_findings("[c1] malformed tag\n(c2) another", CLAUSES) == {}
+
+class FakeLLM:
+    """Answers clause-review prompts from a list of canned replies, then echoes report prompts."""
+
+    def __init__(self, replies):
+        self.replies, self.prompts = list(replies), []
+
+    def invoke(self, prompt):
+        from benchmarks.mocks import MockResponse
+        self.prompts.append(prompt)
+        if "Review each clause below SEPARATELY" in prompt:
+            return MockResponse(self.replies.pop(0) if self.replies else "")
+        return MockResponse(prompt)
+
+    def primary_model(self): return "Fake|fake-1"
+    def last_model(self): return "Fake|fake-1"
+
+def _review(monkeypatch, replies):
+    from multi_agents import map_reduce
+    fake = FakeLLM(replies)
+    monkeypatch.setattr(map_reduce, "llm", fake)
+    monkeypatch.setattr(map_reduce.clause_cache, "lookup", lambda *args: None)
+    monkeypatch.setattr(map_reduce.clause_cache, "store", lambda *args: None)
+    prepare_prompt = lambda text, instructions=None: f"{instructions or 'Write a report.'}\n\nContract Text:\n{text}"
+    return map_reduce.review_clauses(prepare_prompt, CLAUSES), fake
+
+def test_clause_review_prompt_has_one_output_format():
+    from multi_agents.legal import LegalAgent
+    from multi_agents.map_reduce import CLAUSE_REVIEW_INSTRUCTIONS
+    prompt = LegalAgent()._prepare_prompt("[[c1]] 1 Payment\nThe buyer shall pay.", CLAUSE_REVIEW_INSTRUCTIONS)
+    assert CLAUSE_REVIEW_INSTRUCTIONS in prompt and "structured summary" not in prompt
+    assert prompt.endswith("Contract Text:\n[[c1]] 1 Payment\nThe buyer shall pay.")
+
+def test_analyze_reviews_clauses_only_for_map_reduce(monkeypatch):
+    from multi_agents import map_reduce
+    calls = []
+    monkeypatch.setattr(map_reduce, "clauses_from_chunks", lambda chunks: CLAUSES)
+    monkeypatch.setattr(map_reduce, "review_clauses", lambda *args: calls.append("clauses") or "clause report")
+    monkeypatch.setattr(map_reduce, "llm", FakeLLM([]))
+    chunk = type("Chunk", (), {"page_content": "1. Payment. The supplier shall pay."})()
+    prepare_prompt = lambda text, instructions=None: text
+    assert map_reduce.analyze(prepare_prompt, [chunk], "single_pass") == chunk.page_content
+    assert map_reduce.analyze(prepare_prompt, [chunk], "map_reduce") == "clause report" and calls == ["clauses"]
+
+def test_review_clauses_never_reports_unparsed_answers_as_clean(monkeypatch):
+    report, fake = _review(monkeypatch, ["No tags at all.", "Still no tags."])
+    assert report is None  # analyze() falls back to the whole-contract prompt
+    assert len(fake.prompts) == 2  # the batch was asked again once
+
+def test_review_clauses_sends_unreviewed_clauses_to_the_report(monkeypatch):
+    report, _ = _review(monkeypatch, ["[[c1]] - Net 30.\n[[c2]] No issues.", "nothing parseable"])
+    assert "No issues found in any clause." not in report
+    assert "- Net 30." in report
+    assert "NOT YET REVIEWED" in report and "The supplier shall liability." in report
+
+
+# --- 3. REVISIONS (clause diff & previous-version matching) ---
+def _clause(number, text):
+    from utils.revisions import fingerprint_clause
+    full = f"{number}. {text}"
+    return {"id": f"c{number}", "number": str(number), "heading": "", "text": full,
+            "fingerprint": fingerprint_clause(full)}
+
+def _contract(texts, start=1):
+    return [_clause(start + i, text) for i, text in enumerate(texts)]
+
+TERMS = ["the supplier shall deliver the goods", "the buyer shall pay within 30 days",
+         "either party may terminate on notice", "liability is capped at the fees paid",
+         "this agreement is governed by english law"]
+
+def test_diff_clauses_classifies_changes():
+    from utils.revisions import diff_clauses
+    old = _contract(TERMS)
+    new = _contract([TERMS[0], "the buyer shall pay within 60 days", TERMS[2], TERMS[4], "all notices must be in writing"])
+    diff = diff_clauses(old, new)
+    assert diff["unchanged"] == 3
+    assert [(o["text"], n["text"]) for o, n in diff["modified"]] == [(old[1]["text"], new[1]["text"])]
+    assert [c["text"] for c in diff["removed"]] == [old[3]["text"]]
+    assert [c["text"] for c in diff["added"]] == [new[4]["text"]]
+
+def test_diff_clauses_ignores_renumbering():
+    from utils.revisions import diff_clauses
+    diff = diff_clauses(_contract(TERMS), _contract(TERMS, start=11))
+    assert diff == {"added": [], "removed": [], "modified": [], "unchanged": len(TERMS)}
+
+def test_title_key_drops_version_words():
+    from utils.revisions import title_key
+    assert title_key("Acme MSA v2 (redline).pdf") == title_key("uploads/acme-msa_final.docx") == "acme msa"
+    assert title_key("Beta NDA.pdf") != title_key("Acme MSA.pdf")
+
+def _revisions(tmp_path, monkeypatch):
+    from utils import revisions
+    monkeypatch.setattr(revisions, "REVISIONS_DB", str(tmp_path / "revisions.db"))
+    revisions.init_revisions_db()
+    return revisions
+
+def test_find_prior_version_needs_more_overlap_across_titles(tmp_path, monkeypatch):
+    revisions = _revisions(tmp_path, monkeypatch)
+    template = _contract(TERMS)
+    revisions.record_version("alice", "Acme MSA.pdf", template, {}, {})
+    # Same template, different counterparty: 4 of 5 clauses shared is not a revision...
+    upload = _contract(TERMS[:4] + ["this agreement is governed by french law"])
+    assert revisions.find_prior_version(upload, "alice", "Beta MSA.pdf") is None
+    # ...but it is for the same title
+    prior = revisions.find_prior_version(upload, "alice", "Acme MSA v2.pdf")
+    assert prior["filename"] == "Acme MSA.pdf" and prior["shared"] == 0.8
+
+def test_find_prior_version_is_per_user_and_honours_the_pick(tmp_path, monkeypatch):
+    revisions = _revisions(tmp_path, monkeypatch)
+    first = revisions.record_version("alice", "Acme MSA.pdf", _contract(TERMS), {}, {})
+    revisions.record_version("alice", "Acme MSA v2.pdf", _contract(TERMS[:3]), {}, {})
+    upload = _contract(TERMS)
+    assert revisions.find_prior_version(upload, "bob", "Acme MSA.pdf") is None
+    assert revisions.find_prior_version(upload, "alice", "Acme MSA v3.pdf", version_id=first)["id"] == first
+    assert [v["filename"] for v in revisions.candidate_versions("alice", "acme msa final.pdf")] == \
+        ["Acme MSA v2.pdf", "Acme MSA.pdf"]
+
+
+# --- 4. FACT SHEET LOOKUPS ---
+CONTRACT = ("1. Fees. The Customer shall pay USD 120,000 per year.\n"
+            "Invoices unpaid after 30 days incur a late fee of 1.5% per month and a charge of USD 250.\n\n"
+            "2. Termination. Either party may terminate on 60 days' written notice.\n"
+            "3. Law. This Agreement is governed by the laws of England and Wales.")
+
+def _facts(text=CONTRACT):
+    from types import SimpleNamespace
+    from utils.fact_extractor import extract_facts
+    return extract_facts([SimpleNamespace(page_content=text, metadata={"page": 0})])
+
+def test_answer_from_facts_prefers_the_specific_intent():
+    from utils.fact_extractor import answer_from_facts
+    answer = answer_from_facts("What is the late fee?", _facts())
+    assert answer.startswith("**Late Payment Terms:**")
+    assert "1.5% per month" in answer and "120,000" not in answer
+    assert "📎 p.1" in answer
+
+def test_answer_from_facts_direct_lookups():
+    from utils.fact_extractor import answer_from_facts
+    facts = _facts()
+    assert "60 days" in answer_from_facts("What's the notice period?", facts)
+    assert "England and Wales" in answer_from_facts("Which law governs this?", facts)
+    assert "120,000" in answer_from_facts("How much are the fees?", facts)
+
+def test_answer_from_facts_leaves_reasoning_to_the_llm():
+    from utils.fact_extractor import answer_from_facts
+    facts = _facts()
+    assert answer_from_facts("Is the late fee fair to us?", facts) is None
+    assert answer_from_facts("Why is the notice period so long?", facts) is None
+    assert answer_from_facts("Who signs on behalf of the supplier?", facts) is None  # no known intent
+    assert answer_from_facts("What is the notice period?", {}) is None
+
+def test_snippet_stops_at_sentence_ends_before_newlines():
+    from utils.fact_extractor import _snippet
+    text = "Payment is due monthly.\nA late fee of 2% applies.\nNotices go to the address above."
+    start = text.index("2%")
+    assert _snippet(text, start, start + 2) == "A late fee of 2% applies."
+
+def test_snippet_keeps_the_match_in_long_sentences():
+    from utils.fact_extractor import _snippet, SNIPPET_CHARS
+    text = "The Supplier shall " + "perform the services diligently and " * 20 + "pay a penalty of 7% per day" + " of delay" * 20 + "."
+    start = text.index("7%")
+    snippet = _snippet(text, start, start + 2)
+    assert "7% per day" in snippet
+    assert snippet.startswith("…") and snippet.endswith("…") and len(snippet) <= SNIPPET_CHARS
+
+
+# --- 5. ARCHIVE SEARCH ---
+ARCHIVES = [
+    # id, user, filename, date, agents, type, summary, vector
+    ("a1", "alice", "Acme MSA.pdf", "2025-01-10", ["legal", "finance"], "MSA",
+     "Indemnity capped at fees paid; uncapped for data breach.", [1.0, 0.0, 0.0]),
+    ("a2", "alice", "Beta NDA.pdf", "2025-03-02", ["legal"], "NDA",
+     "Mutual confidentiality for three years.", [0.0, 1.0, 0.0]),
+    ("a3", "bob", "Gamma Supply Agreement.pdf", "2025-06-20", ["operations", "finance"], "Supply",
+     "Late delivery penalties and an indemnity for defective goods.", [0.7, 0.0, 0.7]),
+]
+
+def _archive_index(tmp_path, monkeypatch):
+    from utils import archive_index
+    monkeypatch.setattr(archive_index, "ARCHIVE_INDEX_DB", str(tmp_path / "archive_index.db"))
+    monkeypatch.setattr(archive_index, "_schema_ready", False)
+    for archive_id, user, filename, date, agents, kind, summary, vector in ARCHIVES:
+        archive_index.index_archive(archive_id, user, filename, date, len(summary), summary, agents, kind,
+                                    body=summary, vector=vector)
+    return archive_index
+
+def _ids(results):
+    return [r["id"] for r in results]
+
+def test_archive_search_ranks_keyword_matches(tmp_path, monkeypatch):
+    archive_index = _archive_index(tmp_path, monkeypatch)
+    assert set(_ids(archive_index.search("indemnity"))) == {"a1", "a3"}
+    assert _ids(archive_index.search("confidentiality")) == ["a2"]
+    assert _ids(archive_index.search("acme")) == ["a1"]  # filename is indexed
+    assert archive_index.search("warranty") == []
+
+def test_archive_search_applies_filters(tmp_path, monkeypatch):
+    archive_index = _archive_index(tmp_path, monkeypatch)
+    assert _ids(archive_index.search("indemnity", filters={"username": "bob"})) == ["a3"]
+    assert _ids(archive_index.search("indemnity", filters={"agents": ["Legal"]})) == ["a1"]
+    assert _ids(archive_index.search("indemnity", filters={"contract_types": ["Supply"]})) == ["a3"]
+    assert _ids(archive_index.search("indemnity", filters={"date_from": "2025-02-01", "date_to": "2025-12-31"})) == ["a3"]
+
+def test_archive_search_fuses_the_vector_ranking(tmp_path, monkeypatch):
+    archive_index = _archive_index(tmp_path, monkeypatch)
+    # Vector only: nearest first, every archive of that dimension returned
+    assert _ids(archive_index.search("", query_vector=[0.1, 1.0, 0.0])) == ["a2", "a1", "a3"]
+    # a3 is second for keywords but first by vector, a1 first for keywords but last by vector
+    assert _ids(archive_index.search("indemnity", query_vector=[-0.5, 0.0, 1.0])) == ["a3", "a1", "a2"]
+    # A query vector of another dimension adds nothing
+    assert set(_ids(archive_index.search("indemnity", query_vector=[1.0, 0.0]))) == {"a1", "a3"}
+
+def test_archive_search_pages_and_counts_versions(tmp_path, monkeypatch):
+    archive_index = _archive_index(tmp_path, monkeypatch)
+    archive_index.record_version("a1", "blob-1", "first")
+    archive_index.record_version("a1", "blob-1", "same payload again")
+    archive_index.record_version("a1", "blob-2", "second")
+    everything = _ids(archive_index.search("", query_vector=[1.0, 0.0, 0.0]))
+    assert len(everything) == 3
+    assert _ids(archive_index.search("", query_vector=[1.0, 0.0, 0.0], limit=2)) == everything[:2]
+    assert _ids(archive_index.search("", query_vector=[1.0, 0.0, 0.0], limit=2, offset=2)) == everything[2:]
+    cards = {r["id"]: r for r in archive_index.search("", query_vector=[1.0, 0.0, 0.0])}
+    assert cards["a1"]["versions"] == 2 and cards["a2"]["versions"] == 1
+    assert cards["a1"]["agents"] == ["legal", "finance"]
+    archive_index.remove_archive("a1")
+    assert "a1" not in _ids(archive_index.search("indemnity"))
+
+
+def test_archive_sync_adds_missing_archives_and_never_removes(tmp_path, monkeypatch):
+    from utils import pinecone_client
+    from benchmarks.mocks import FakeEmbeddings
+    archive_index = _archive_index(tmp_path, monkeypatch)
+    monkeypatch.setattr(pinecone_client, "embeddings", FakeEmbeddings())
+    remote = {"id": "a4", "metadata": {"type": "APP_STATE", "filename": "Delta Lease.pdf", "date": "2025-07-01",
+                                       "doc_len": 4, "summary": "Rent reviews every two years.", "agents": ["finance"]}}
+    monkeypatch.setattr(pinecone_client, "_scan_archives", lambda: [remote])  # the scan misses a1..a3
+    assert pinecone_client.sync_archive_index() == 1
+    assert archive_index.archive_ids() == {"a1", "a2", "a3", "a4"}
+    assert _ids(archive_index.search("rent")) == ["a4"]
+
+def test_failed_archive_save_records_no_version(tmp_path, monkeypatch):
+    from utils import pinecone_client, blob_store
+    from benchmarks.mocks import FakeEmbeddings
+    archive_index = _archive_index(tmp_path, monkeypatch)
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(pinecone_client, "embeddings", FakeEmbeddings())
+
+    class DownStore:
+        def upsert(self, vectors): raise ConnectionError("vector store unreachable")
+    monkeypatch.setattr(pinecone_client, "get_vector_store", lambda: DownStore())
+    results = {"legal": {"status": "success", "summary": "Indemnity is uncapped."}, "pipeline": {"content_hash": "h1"}}
+    assert pinecone_client.save_analysis_state("Acme MSA.pdf", results, 3, username="alice") is False
+    archive_id = pinecone_client.archive_key("alice", "h1", pinecone_client.DEFAULT_SAVE_CONFIG)
+    assert archive_index.archive_versions(archive_id) == []
+
+# --- 6. LOCAL VECTOR STORE ---
+def _faiss_ids(store):
+    return sorted(m["id"] for m in store.query([1.0, 1.0, 1.0], top_k=10)["matches"])
+
+def test_faiss_stores_sharing_a_directory_keep_each_others_vectors(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    from utils import vector_store
+    monkeypatch.setattr(vector_store, "FAISS_SAVE_DELAY_S", 60)  # flush by hand below
+    first, second = vector_store.FaissStore(str(tmp_path)), vector_store.FaissStore(str(tmp_path))
+    first.upsert([{"id": "a", "values": [1.0, 0.0, 0.0], "metadata": {"n": 1}}])
+    second.upsert([{"id": "b", "values": [0.0, 1.0, 0.0], "metadata": {"n": 2}}])
+    first.flush()
+    second.flush()
+    assert _faiss_ids(first) == _faiss_ids(second) == _faiss_ids(vector_store.FaissStore(str(tmp_path))) == ["a", "b"]
+
+    second.delete(["a"])
+    first.upsert([{"id": "c", "values": [0.0, 0.0, 1.0]}])
+    second.flush()
+    first.flush()
+    assert _faiss_ids(first) == _faiss_ids(second) == _faiss_ids(vector_store.FaissStore(str(tmp_path))) == ["b", "c"]
+
+
+# --- 7. EMBEDDING SERVICE ---
+def test_embed_query_is_cached_and_coalesced(tmp_path):
+    from benchmarks.mocks import FakeEmbeddings
+    from utils.embedding_service import EmbeddingService
+
+    class SlowEmbeddings(FakeEmbeddings):
+        calls = 0
+        def embed_query(self, text):
+            SlowEmbeddings.calls += 1
+            threading.Event().wait(0.05)
+            return super().embed_query(text)
+
+    service = EmbeddingService(SlowEmbeddings(), cache_dir=str(tmp_path))
+    vectors = []
+    threads = [threading.Thread(target=lambda: vectors.append(service.embed_query("what is the notice period?")))
+               for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert SlowEmbeddings.calls == 1 and len(vectors) == 4 and all(v == vectors[0] for v in vectors)
+
+    service.embed_query("what is the notice period?")
+    fresh = EmbeddingService(SlowEmbeddings(), cache_dir=str(tmp_path))  # another process: disk cache
+    assert fresh.embed_query("what is the notice period?") == vectors[0]
+    assert SlowEmbeddings.calls == 1
+
+
+
+# --- 8. PROFILER ---
+def _profiled_session_with_a_thread(tmp_path, monkeypatch):
+    import json
+    from utils import profiler
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+
+    def agent():
+        with profiler.profiled_thread():
+            sum(i * i for i in range(10_000))
+
+    with profiler.profile_run("run1", "graph") as folder:
+        worker = threading.Thread(target=agent)
+        worker.start()
+        worker.join()
+    with open(f"{folder}/graph_summary.json") as f:
+        return json.load(f)
+
+def test_profiled_session_covers_worker_threads(tmp_path, monkeypatch):
+    summary = _profiled_session_with_a_thread(tmp_path, monkeypatch)
+    assert summary["threads_profiled"] + summary["threads_skipped"] == 2
+
+def test_profiled_thread_survives_a_single_profiler_runtime(tmp_path, monkeypatch):
+    import cProfile
+    from utils import profiler
+
+    class SingleProfiler(cProfile.Profile):
+        """Python 3.12+ behaviour: a second active profiler is refused."""
+        active = False
+        def enable(self, *args, **kwargs):
+            if SingleProfiler.active: raise ValueError("Another profiling tool is already active")
+            SingleProfiler.active = True
+            super().enable(*args, **kwargs)
+        def disable(self):
+            super().disable()
+            SingleProfiler.active = False
+
+    monkeypatch.setattr(profiler.cProfile, "Profile", SingleProfiler)
+    summary = _profiled_session_with_a_thread(tmp_path, monkeypatch)
+    assert summary["threads_profiled"] == 1 and summary["threads_skipped"] == 1
+
+
+# --- 9. BOILERPLATE STRIPPING ---
+def _strip(pages):
+    from langchain_core.documents import Document
+    from utils.docsloader import BoilerplateStripper
+    stripper = BoilerplateStripper()
+    return [page.page_content for page in stripper.process(Document(page_content=p, metadata={}) for p in pages)]
+
+def test_page_numbers_are_stripped_once_learned():
+    bodies = ["The supplier shall deliver the goods.", "The buyer shall pay within 30 days.", "Either party may terminate."]
+    pages = [f"ACME MASTER SERVICES AGREEMENT\n{body}\n{n}" for n, body in enumerate(bodies, start=1)]
+    assert _strip(pages) == [body + "\n" for body in bodies]
+
+def test_lone_number_lines_survive_without_page_numbering():
+    one_page = "Schedule 1 - Fees\nThe total fee payable is:\n250"
+    assert _strip([one_page])[0].strip().endswith("250")
+    # A clause number at the top of otherwise unnumbered pages is content too
+    pages = ["4\nThe supplier shall deliver.\nSigned.", "The buyer shall pay.\nWithin 30 days.\n17"]
+    cleaned = _strip(pages)
+    assert cleaned[0].startswith("4\n") and cleaned[1].strip().endswith("17")
+
+
+# --- 10. CLAUSE CACHE BANDING ---
+@pytest.mark.parametrize("threshold", ["0.99", "0.92", "0.75"])
+def test_clause_bands_catch_every_pair_within_max_distance(monkeypatch, threshold):
+    import importlib
+    from utils import clause_cache
+    monkeypatch.setenv("clauseai_clause_similarity", threshold)
+    try:
+        cache = importlib.reload(clause_cache)
+        assert cache.BANDS == cache.MAX_DISTANCE + 1 <= cache.MAX_BANDS
+        width = -(-cache.SIMHASH_BITS // cache.BANDS)
+        value = 0x0123456789ABCDEF
+        # Worst case: the differing bits spread over as many bands as possible
+        flipped = value
+        for band in range(cache.MAX_DISTANCE):
+            flipped ^= 1 << (band * width)
+        assert cache._distance(value, flipped) == cache.MAX_DISTANCE
+        assert set(cache._bands(value)) & set(cache._bands(flipped))
+    finally:
+        monkeypatch.delenv("clauseai_clause_similarity")
+        importlib.reload(clause_cache)
@@ -0,0 +1,224 @@
+import os
+import re
+import time
+import sqlite3
+import numpy as np
+
+# Local search index over archived analyses: SQLite FTS5 (BM25) over the
+# filename, summaries and clause text, plus each archive's embedding for
+# vector similarity. Both rankings are computed here and merged with
+# reciprocal rank fusion, so vault searches need no vector-store round trip.
+ARCHIVE_INDEX_DB = os.getenv("clauseai_archive_index_db", os.path.join("data", "archive_index.db"))
+RRF_K = 60
+# Candidates taken from each ranking before fusion
+CANDIDATES = 200
+# Clause text indexed per archive (the rest of a huge contract is not searchable)
+MAX_CLAUSE_CHARS = 200_000
+# Column weights for bm25(): archive_id (unindexed), filename, summary, body, clauses
+BM25_WEIGHTS = (0.0, 4.0, 3.0, 1.5, 1.0)
+# Older versions of an archive beyond this are dropped from its history
+MAX_VERSIONS = 20
+
+_schema_ready = False
+
+
+# --- 1. CONNECTION & SCHEMA ---
+def _connect():
+    if not _schema_ready: init_archive_index_db()
+    conn = sqlite3.connect(ARCHIVE_INDEX_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_archive_index_db():
+    global _schema_ready
+    os.makedirs(os.path.dirname(ARCHIVE_INDEX_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(ARCHIVE_INDEX_DB, timeout=30)
+    c = conn.cursor()
+    # agents is stored as ",legal,finance," so one LIKE matches a whole name
+    c.execute('''CREATE TABLE IF NOT EXISTS archives
+                 (archive_id TEXT PRIMARY KEY, username TEXT, filename TEXT, date TEXT, doc_len INTEGER,
+                  summary TEXT, agents TEXT, contract_type TEXT, dim INTEGER, vector BLOB, created_at REAL)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_archives_date ON archives (date)''')
+    # Version history: one row per distinct payload saved under an archive id
+    c.execute('''CREATE TABLE IF NOT EXISTS archive_versions
+                 (archive_id TEXT, version INTEGER, payload_ref TEXT, summary TEXT, created_at REAL,
+                  PRIMARY KEY (archive_id, version))''')
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS archives_fts USING fts5
+                 (archive_id UNINDEXED, filename, summary, body, clauses, tokenize='porter unicode61')''')
+    conn.commit()
+    conn.close()
+    _schema_ready = True
+
+
+# --- 2. INDEXING ---
+def index_archive(archive_id, username, filename, date, doc_len, summary, agents, contract_type,
+                  body="", clauses="", vector=None):
+    """Adds or replaces one archive in the keyword and vector indexes."""
+    blob = np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+    conn = _connect()
+    conn.execute("INSERT OR REPLACE INTO archives (archive_id, username, filename, date, doc_len, summary, agents, "
+                 "contract_type, dim, vector, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 (archive_id, username, filename, date, doc_len, summary, "," + ",".join(agents) + ",",
+                  contract_type, len(vector) if vector is not None else None, blob, time.time()))
+    conn.execute("DELETE FROM archives_fts WHERE archive_id=?", (archive_id,))
+    conn.execute("INSERT INTO archives_fts (archive_id, filename, summary, body, clauses) VALUES (?, ?, ?, ?, ?)",
+                 (archive_id, filename, summary, body, clauses[:MAX_CLAUSE_CHARS]))
+    conn.commit()
+    conn.close()
+
+def remove_archive(archive_id):
+    conn = _connect()
+    conn.execute("DELETE FROM archives WHERE archive_id=?", (archive_id,))
+    conn.execute("DELETE FROM archives_fts WHERE archive_id=?", (archive_id,))
+    conn.execute("DELETE FROM archive_versions WHERE archive_id=?", (archive_id,))
+    conn.commit()
+    conn.close()
+
+def record_version(archive_id, payload_ref, summary, created_at=None):
+    """
+    Appends a version unless `payload_ref` is already the latest one (so a
+    repeated save is a no-op). Returns the archive's current version number.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        latest = conn.execute("SELECT version, payload_ref FROM archive_versions WHERE archive_id=? "
+                              "ORDER BY version DESC LIMIT 1", (archive_id,)).fetchone()
+        if latest and latest["payload_ref"] == payload_ref:
+            conn.commit()
+            return latest["version"]
+        version = (latest["version"] if latest else 0) + 1
+        conn.execute("INSERT INTO archive_versions (archive_id, version, payload_ref, summary, created_at) "
+                     "VALUES (?, ?, ?, ?, ?)", (archive_id, version, payload_ref, summary, created_at or time.time()))
+        conn.execute("DELETE FROM archive_versions WHERE archive_id=? AND version <= ?",
+                     (archive_id, version - MAX_VERSIONS))
+        conn.commit()
+        return version
+    finally:
+        conn.close()
+
+def replace_versions(archive_id, versions):
+    """
+    Rewrites an archive's history from [(payload_ref, summary, created_at)]:
+    sorted by time, one entry per payload (its first save), renumbered from 1,
+    and capped at MAX_VERSIONS. Returns the current version number.
+    """
+    first = {}
+    for ref, summary, created_at in sorted(versions, key=lambda v: v[2] or 0):
+        first.setdefault(ref, (ref, summary, created_at))
+    kept = sorted(first.values(), key=lambda v: v[2] or 0)[-MAX_VERSIONS:]
+    conn = _connect()
+    conn.execute("DELETE FROM archive_versions WHERE archive_id=?", (archive_id,))
+    conn.executemany("INSERT INTO archive_versions (archive_id, version, payload_ref, summary, created_at) "
+                     "VALUES (?, ?, ?, ?, ?)", [(archive_id, i + 1, *v) for i, v in enumerate(kept)])
+    conn.commit()
+    conn.close()
+    return len(kept)
+
+def archive_versions(archive_id):
+    """[{version, payload_ref, summary, created_at}], newest first."""
+    conn = _connect()
+    rows = conn.execute("SELECT version, payload_ref, summary, created_at FROM archive_versions "
+                        "WHERE archive_id=? ORDER BY version DESC", (archive_id,)).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+def archive_ids():
+    conn = _connect()
+    ids = {r[0] for r in conn.execute("SELECT archive_id FROM archives")}
+    conn.close()
+    return ids
+
+def archive_count():
+    conn = _connect()
+    count = conn.execute("SELECT COUNT(*) FROM archives").fetchone()[0]
+    conn.close()
+    return count
+
+def filter_options():
+    """Values for the vault's filter widgets: users and contract types seen so far."""
+    conn = _connect()
+    users = [r[0] for r in conn.execute("SELECT DISTINCT username FROM archives WHERE username IS NOT NULL ORDER BY 1")]
+    types = [r[0] for r in conn.execute("SELECT DISTINCT contract_type FROM archives WHERE contract_type IS NOT NULL ORDER BY 1")]
+    conn.close()
+    return {"users": users, "contract_types": types}
+
+
+# --- 3. SEARCH ---
+def _fts_query(text):
+    """Free text -> FTS5 OR-query of quoted terms ('indemnity cap over $1M' -> "indemnity" OR "cap" ...)."""
+    terms = re.findall(r"\w+", text.lower())
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+def _where(filters):
+    """SQL conditions on the archives table (alias a) for the vault filters."""
+    clauses, params = [], []
+    filters = filters or {}
+    if filters.get("date_from"):
+        clauses.append("a.date >= ?"); params.append(str(filters["date_from"]))
+    if filters.get("date_to"):
+        clauses.append("a.date <= ?"); params.append(str(filters["date_to"]))
+    if filters.get("username"):
+        clauses.append("a.username = ?"); params.append(filters["username"])
+    if filters.get("agents"):
+        clauses.append("(" + " OR ".join("a.agents LIKE ?" for _ in filters["agents"]) + ")")
+        params += [f"%,{agent.lower()},%" for agent in filters["agents"]]
+    if filters.get("contract_types"):
+        clauses.append(f"a.contract_type IN ({','.join('?' * len(filters['contract_types']))})")
+        params += list(filters["contract_types"])
+    return (" AND " + " AND ".join(clauses)) if clauses else "", params
+
+def _keyword_ranking(conn, query, where, params):
+    fts = _fts_query(query)
+    if not fts: return []
+    rows = conn.execute(
+        f"SELECT f.archive_id FROM archives_fts f JOIN archives a ON a.archive_id = f.archive_id "
+        f"WHERE archives_fts MATCH ?{where} ORDER BY bm25(archives_fts, {', '.join(map(str, BM25_WEIGHTS))}) "
+        f"LIMIT {CANDIDATES}", (fts, *params)).fetchall()
+    return [r["archive_id"] for r in rows]
+
+def _vector_ranking(conn, query_vector, where, params):
+    if query_vector is None: return []
+    rows = conn.execute(f"SELECT a.archive_id, a.vector FROM archives a WHERE a.dim = ?{where}",
+                        (len(query_vector), *params)).fetchall()
+    if not rows: return []
+    matrix = np.frombuffer(b"".join(r["vector"] for r in rows), dtype=np.float32).reshape(len(rows), -1)
+    query = np.asarray(query_vector, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+    order = np.argsort(-scores)[:CANDIDATES]
+    return [rows[i]["archive_id"] for i in order]
+
+def search(query, query_vector=None, filters=None, limit=9, offset=0):
+    """
+    Hybrid search: BM25 and cosine rankings (each already filtered) fused
+    with RRF. Returns result cards, best first:
+    {id, filename, date, score, doc_len, summary, agents, contract_type, username, versions}.
+    """
+    where, params = _where(filters)
+    conn = _connect()
+    rankings = [_keyword_ranking(conn, query, where, params), _vector_ranking(conn, query_vector, where, params)]
+    fused = {}
+    for ranking in rankings:
+        for rank, archive_id in enumerate(ranking):
+            fused[archive_id] = fused.get(archive_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    page = sorted(fused, key=lambda a: -fused[a])[offset:offset + limit]
+    if not page:
+        conn.close()
+        return []
+    rows = conn.execute(f"SELECT a.*, (SELECT MAX(version) FROM archive_versions v WHERE v.archive_id = a.archive_id) "
+                        f"AS versions FROM archives a WHERE a.archive_id IN ({','.join('?' * len(page))})", page).fetchall()
+    conn.close()
+    by_id = {r["archive_id"]: r for r in rows}
+    return [{
+        "id": archive_id,
+        "filename": by_id[archive_id]["filename"],
+        "date": by_id[archive_id]["date"],
+        "score": round(fused[archive_id], 5),
+        "doc_len": by_id[archive_id]["doc_len"] or 0,
+        "summary": by_id[archive_id]["summary"] or "",
+        "agents": [a for a in (by_id[archive_id]["agents"] or "").split(",") if a],
+        "contract_type": by_id[archive_id]["contract_type"],
+        "username": by_id[archive_id]["username"],
+        "versions": by_id[archive_id]["versions"] or 1,
+    } for archive_id in page if archive_id in by_id]
@@ -0,0 +1,89 @@
+import os
+import json
+import gzip
+import tempfile
+import hashlib
+
+# Content-addressed store for large JSON payloads (full analysis reports).
+# Vector metadata only carries the reference ("sha256:<hex>"); the payload
+# lives here compressed, once, however many records point at it.
+# The vector store is shared but this directory is a plain path: when workers
+# run on several machines, clauseai_blob_dir must point at storage they all
+# mount (blobs are write-once and written atomically, so a network share is fine).
+try:
+    import zstandard
+except ImportError:  # optional: gzip is used when zstandard is not installed
+    zstandard = None
+
+BLOB_DIR = os.getenv("clauseai_blob_dir", os.path.join("data", "blobs"))
+# Bump when the envelope layout changes; readers accept every version listed
+PAYLOAD_SCHEMA = 1
+SUPPORTED_SCHEMAS = {1}
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+
+class BlobNotFound(KeyError):
+    pass
+
+
+# --- 1. ENCODING ---
+def _compress(raw):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _decompress(data):
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None: raise RuntimeError("Blob is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data)
+    return data
+
+def _canonical(obj):
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def _path(digest):
+    return os.path.join(BLOB_DIR, digest[:2], digest[2:4], digest)
+
+
+# --- 2. PUT & GET ---
+def put_json(obj, kind="analysis"):
+    """
+    Stores `obj` (any JSON-serialisable value) and returns its reference.
+    The digest covers the uncompressed content, so identical payloads are
+    stored once whichever codec wrote them.
+    """
+    raw = _canonical({"schema": PAYLOAD_SCHEMA, "kind": kind, "data": obj})
+    digest = hashlib.sha256(raw).hexdigest()
+    path = _path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temp file per writer: threads of one process may store the same blob at once
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+            f.write(_compress(raw))
+        os.replace(f.name, path)
+    return f"sha256:{digest}"
+
+def get_json(ref):
+    """The payload stored under `ref`; raises BlobNotFound if it is missing."""
+    digest = ref.split(":", 1)[-1]
+    try:
+        with open(_path(digest), "rb") as f:
+            envelope = json.loads(_decompress(f.read()))
+    except FileNotFoundError:
+        raise BlobNotFound(ref) from None
+    if envelope.get("schema") not in SUPPORTED_SCHEMAS:
+        raise ValueError(f"Unsupported payload schema {envelope.get('schema')} for {ref}")
+    return envelope["data"]
+
+def exists(ref):
+    return bool(ref) and os.path.exists(_path(ref.split(":", 1)[-1]))
+
+def blob_size(ref):
+    """Compressed size in bytes (0 if missing)."""
+    path = _path(ref.split(":", 1)[-1])
+    return os.path.getsize(path) if os.path.exists(path) else 0
@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.helpers import estimate_tokens, clean_raw_output
+
+# Oracle conversation memory: the last KEEP_TURNS turns stay verbatim, older
+# turns are folded into a rolling summary on a background thread, and the
+# block sent with each question never exceeds MEMORY_TOKENS.
+KEEP_TURNS = int(os.getenv("clauseai_oracle_keep_turns", "4"))
+MEMORY_TOKENS = int(os.getenv("clauseai_oracle_memory_tokens", "800"))
+SUMMARY_TOKENS = 250
+MESSAGE_TOKENS = 150
+# Transcript kept for display; older messages survive only in the summary
+MAX_HISTORY_MESSAGES = 200
+HISTORY_PAGE_SIZE = 20
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="oracle-memory")
+
+AGENT_KEYS = ("legal", "finance", "compliance", "operations")
+
+
+# --- 1. STATE ---
+def new_memory():
+    """Per-agent memory: rolling summary, verbatim recent turns, pending fold."""
+    return {"summary": "", "recent": [], "folding": [], "pending": None}
+
+def new_chat_state():
+    return {key: new_memory() for key in AGENT_KEYS}
+
+def _clip(text, tokens):
+    text = " ".join(str(text).split())
+    return text if estimate_tokens(text) <= tokens else text[:tokens * 4].rsplit(" ", 1)[0] + " …"
+
+
+# --- 2. ROLLING SUMMARY ---
+def _summarize(summary, messages):
+    """Runs on the executor: folds `messages` into `summary` with the LLM."""
+    from utils.universal_llm import universal_llm
+    transcript = "\n".join(f"{m['role'].upper()}: {_clip(m['content'], 300)}" for m in messages)
+    prompt = f"""
+    Update the running summary of a conversation about a contract.
+    Keep facts, figures, clause references and open questions; drop pleasantries.
+    Reply with the summary only, at most {SUMMARY_TOKENS * 3 // 4} words.
+
+    CURRENT SUMMARY:
+    {summary or "(empty)"}
+
+    NEW TURNS:
+    {transcript}
+    """
+    try:
+        return _clip(clean_raw_output(universal_llm.invoke(prompt).content), SUMMARY_TOKENS)
+    except Exception:
+        # Without the LLM keep the user's questions; they carry most of the thread
+        asked = "; ".join(_clip(m["content"], 40) for m in messages if m["role"] == "user")
+        return _clip(f"{summary} Earlier questions: {asked}".strip(), SUMMARY_TOKENS)
+
+def _apply_fold(memory):
+    """Adopts a finished background summary (called from the Streamlit thread)."""
+    pending = memory["pending"]
+    if pending is None or not pending.done(): return
+    try:
+        memory["summary"] = pending.result()
+        memory["folding"] = []
+    except Exception:
+        pass
+    memory["pending"] = None
+
+def remember(memory, role, content):
+    """Records one message; turns beyond KEEP_TURNS are summarised asynchronously."""
+    _apply_fold(memory)
+    memory["recent"].append({"role": role, "content": content})
+    overflow = len(memory["recent"]) - KEEP_TURNS * 2
+    if overflow <= 0 or memory["pending"] is not None: return
+    # Fold whole turns only, so a question never loses its answer
+    overflow += overflow % 2
+    memory["folding"] = memory["recent"][:overflow]
+    memory["recent"] = memory["recent"][overflow:]
+    memory["pending"] = _executor.submit(_summarize, memory["summary"], memory["folding"])
+
+
+# --- 3. PROMPT BLOCK ---
+def render_memory(memory, budget=MEMORY_TOKENS):
+    """
+    The conversation so far for the next prompt: summary first, then the
+    newest messages that still fit the budget. Turns still being folded are
+    included verbatim so nothing drops out while the summary is pending.
+    """
+    if memory is None: return ""
+    _apply_fold(memory)
+    summary = _clip(memory["summary"], SUMMARY_TOKENS) if memory["summary"] else ""
+    used = estimate_tokens(summary)
+    lines = []
+    for m in reversed(memory["folding"] + memory["recent"]):
+        line = f"{'User' if m['role'] == 'user' else 'You'}: {_clip(m['content'], MESSAGE_TOKENS)}"
+        if used + estimate_tokens(line) > budget: break
+        lines.append(line)
+        used += estimate_tokens(line)
+    if not summary and not lines: return ""
+    block = (f"Summary of earlier turns: {summary}\n" if summary else "") + "\n".join(reversed(lines))
+    return block.strip()
+
+
+# --- 4. DISPLAY HISTORY ---
+def append_history(history, message):
+    history.append(message)
+    if len(history) > MAX_HISTORY_MESSAGES:
+        del history[:len(history) - MAX_HISTORY_MESSAGES]
+
+def history_page(history, pages):
+    """The newest `pages` pages of the transcript, plus how many are hidden."""
+    shown = history[-pages * HISTORY_PAGE_SIZE:] if pages > 0 else []
+    return shown, len(history) - len(shown)
@@ -1,3 +1,5 @@
+import re
+
 def classify_contract(text: str) -> list:
     text = text.lower()
     domains = []
@@ -14,4 +16,25 @@ def classify_contract(text: str) -> list:
     if not domains:
         domains.append("general")
 
-    return domains
\ No newline at end of file
+    return domains
+
+
+# Contract type from the title/opening text; first match wins
+CONTRACT_TYPES = [
+    ("NDA", ["non-disclosure", "nondisclosure", "confidentiality agreement", "nda"]),
+    ("Employment", ["employment agreement", "employment contract", "offer letter", "employee"]),
+    ("Lease", ["lease agreement", "tenancy", "lessor", "landlord"]),
+    ("License", ["license agreement", "licence agreement", "software license", "end user license"]),
+    ("SaaS", ["subscription agreement", "software as a service", "saas", "terms of service"]),
+    ("Purchase", ["purchase agreement", "purchase order", "sale of goods", "supply agreement"]),
+    ("Partnership", ["partnership agreement", "joint venture", "shareholders agreement"]),
+    ("Services", ["master services agreement", "services agreement", "statement of work", "consulting agreement"]),
+    ("Loan", ["loan agreement", "credit agreement", "promissory note", "borrower"]),
+]
+
+def detect_contract_type(text: str) -> str:
+    head = text[:3000].lower()
+    for contract_type, keywords in CONTRACT_TYPES:
+        if any(re.search(rf"\b{re.escape(keyword)}\b", head) for keyword in keywords):
+            return contract_type
+    return "Other"
@@ -0,0 +1,151 @@
+import sqlite3
+import hashlib
+import os
+import re
+import time
+import threading
+from utils.revisions import normalize_clause, fingerprint_clause
+
+# Clause-level agent findings, shared across contracts. A clause copied from
+# the same template as one reviewed before reuses that finding instead of
+# going back to the LLM. Used for contracts the planner sends to map_reduce
+# (see multi_agents.map_reduce.analyze).
+CLAUSE_CACHE_DB = os.getenv("clauseai_clause_cache_db", "clause_cache.db")
+CLAUSE_CACHE_ENABLED = os.getenv("clauseai_clause_cache", "1") != "0"
+
+# Near-duplicates: SimHash similarity (1 - hamming / 64) at or above this.
+# Candidates are found through LSH bands; with MAX_DISTANCE + 1 bands any
+# pair within MAX_DISTANCE bits shares at least one band exactly. Bands
+# narrower than 8 bits would match most of the table, so the threshold is
+# clamped at MIN_SIMILARITY (8 bands, up to 7 differing bits).
+SIMHASH_BITS = 64
+MAX_BANDS = 8
+MIN_SIMILARITY = 1 - (MAX_BANDS - 1) / SIMHASH_BITS
+SIMILARITY_THRESHOLD = max(float(os.getenv("clauseai_clause_similarity", "0.92")), MIN_SIMILARITY)
+MAX_DISTANCE = int(round((1 - SIMILARITY_THRESHOLD) * SIMHASH_BITS))
+BANDS = MAX_DISTANCE + 1
+
+# Words whose presence flips a clause's meaning. Together with every number
+# they must match exactly, so "30 days" never reuses the finding for "60 days".
+SALIENT_WORDS = {"not", "no", "never", "except", "unless", "without", "may", "shall", "must",
+                 "exclusive", "non-exclusive", "unlimited", "sole"}
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*%?")
+
+_stats = {"hits": 0, "misses": 0, "stored": 0}
+_stats_lock = threading.Lock()
+_schema_ready = False
+
+
+# --- 1. CONNECTION & SCHEMA ---
+def _connect():
+    # Agents can run outside worker.py (benchmarks, scripts), so make sure
+    # the tables exist once per process
+    if not _schema_ready: init_clause_cache_db()
+    conn = sqlite3.connect(CLAUSE_CACHE_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_clause_cache_db():
+    global _schema_ready
+    conn = sqlite3.connect(CLAUSE_CACHE_DB, timeout=30)
+    c = conn.cursor()
+    # prompt_version identifies the agent and its prompt; model is the primary "<provider>|<model id>"
+    c.execute('''CREATE TABLE IF NOT EXISTS clause_findings
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, prompt_version TEXT, model TEXT,
+                  exact TEXT, simhash INTEGER, salient TEXT, finding TEXT,
+                  created_at REAL, hits INTEGER DEFAULT 0)''')
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_clause_findings_exact
+                 ON clause_findings (prompt_version, model, exact)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS clause_bands (band_key TEXT, finding_id INTEGER)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_clause_bands ON clause_bands (band_key)''')
+    conn.commit()
+    conn.close()
+    _schema_ready = True
+
+
+# --- 2. FINGERPRINTS ---
+def simhash(text):
+    """64-bit SimHash over word 3-shingles of the normalised clause."""
+    words = normalize_clause(text).split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    value = sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _bands(value):
+    value &= (1 << 64) - 1
+    width = -(-SIMHASH_BITS // BANDS)
+    return [f"{band}:{(value >> (band * width)) & ((1 << width) - 1)}" for band in range(BANDS)]
+
+def _distance(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+def salient_signature(text):
+    words = normalize_clause(text).split()
+    tokens = NUMBER.findall(" ".join(words)) + [w.strip(".,;:()") for w in words if w.strip(".,;:()") in SALIENT_WORDS]
+    return hashlib.sha256(" ".join(tokens).encode("utf-8")).hexdigest()[:16]
+
+
+# --- 3. LOOKUP & STORE ---
+def lookup(prompt_version, model, text):
+    """Cached finding for `text` (exact or near-duplicate) or None."""
+    exact = fingerprint_clause(text)
+    conn = _connect()
+    row = conn.execute("SELECT id, finding FROM clause_findings WHERE prompt_version=? AND model=? AND exact=?",
+                       (prompt_version, model, exact)).fetchone()
+    if row is None:
+        value, salient = simhash(text), salient_signature(text)
+        bands = _bands(value)
+        candidates = conn.execute(
+            f"SELECT DISTINCT f.id, f.finding, f.simhash FROM clause_bands b JOIN clause_findings f ON f.id = b.finding_id "
+            f"WHERE b.band_key IN ({','.join('?' * len(bands))}) AND f.prompt_version=? AND f.model=? AND f.salient=?",
+            (*bands, prompt_version, model, salient)).fetchall()
+        close = [(c, _distance(value, c["simhash"])) for c in candidates]
+        close = [pair for pair in close if pair[1] <= MAX_DISTANCE]
+        row = min(close, key=lambda pair: pair[1])[0] if close else None
+
+    if row is not None:
+        conn.execute("UPDATE clause_findings SET hits = hits + 1 WHERE id=?", (row["id"],))
+        conn.commit()
+    conn.close()
+    with _stats_lock: _stats["hits" if row is not None else "misses"] += 1
+    return row["finding"] if row is not None else None
+
+def store(prompt_version, model, text, finding):
+    value = simhash(text)
+    conn = _connect()
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO clause_findings (prompt_version, model, exact, simhash, salient, finding, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (prompt_version, model, fingerprint_clause(text), value, salient_signature(text), finding, time.time()))
+    if cur.rowcount:
+        conn.executemany("INSERT INTO clause_bands (band_key, finding_id) VALUES (?, ?)",
+                         [(band, cur.lastrowid) for band in _bands(value)])
+    conn.commit()
+    conn.close()
+    with _stats_lock: _stats["stored"] += cur.rowcount
+
+def prune_stale(prompt_versions, model):
+    """Deletes findings written by other prompts or another primary provider or model id."""
+    versions = list(prompt_versions)
+    conn = _connect()
+    removed = conn.execute(
+        f"DELETE FROM clause_findings WHERE model IS NOT ? OR prompt_version NOT IN ({','.join('?' * len(versions))})",
+        (model, *versions)).rowcount
+    conn.execute("DELETE FROM clause_bands WHERE finding_id NOT IN (SELECT id FROM clause_findings)")
+    conn.commit()
+    conn.close()
+    return removed
+
+def cache_stats():
+    """Process-wide hit/miss counters since start-up."""
+    with _stats_lock:
+        stats = dict(_stats)
+    looked_up = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / looked_up, 3) if looked_up else 0.0
+    return stats
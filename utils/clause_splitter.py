@@ -0,0 +1,155 @@
+import re
+from langchain_core.documents import Document
+from utils.helpers import estimate_tokens
+
+# Token budget per chunk. Whole clauses are packed up to this size; only a
+# single clause longer than the budget is ever cut (at sentence boundaries).
+CLAUSE_CHUNK_TOKENS = 350
+
+# --- 1. BOUNDARY PATTERNS ---
+# "Section 4", "Clause 7.2", "Article IV"
+KEYWORD_NUMBER = re.compile(r'^\s*(?:section|clause|article)\s+(\d{1,3}(?:\.\d{1,3})*|[IVXLC]{1,6})\b[.:)]?\s*(.*)$', re.I)
+# "4.", "4)", "4.2", "4.2.1." followed by a capitalised word / bracket / quote
+BARE_NUMBER = re.compile(r'^\s*(\d{1,3}(?:\.\d{1,3})+\.?|\d{1,3}[.)])\s+(?=[A-Z(“"\'])(.*)$')
+# "Schedule 2", "Exhibit A", "Annex B", "Appendix 1"
+ATTACHMENT = re.compile(r'^\s*((?:schedule|exhibit|annex|appendix)\s+[\w.]+)\b[.:)-]?\s*(.*)$', re.I)
+# “Confidential Information” means ...
+DEFINITION = re.compile(r'^\s*[“"]([^”"]{1,80})[”"]\s+(?:means|shall mean|has the meaning|includes)\b', re.I)
+
+def _caps_heading(line):
+    """Short ALL-CAPS lines like 'GOVERNING LAW' or 'TERM AND TERMINATION'."""
+    stripped = line.strip()
+    letters = [ch for ch in stripped if ch.isalpha()]
+    return (4 <= len(stripped) <= 80 and len(letters) >= 4
+            and not any(ch.islower() for ch in letters) and not stripped.endswith(","))
+
+def detect_boundary(line):
+    """
+    Returns (number, heading) if `line` starts a new clause, else None.
+    `number` is None for unnumbered headings and definitions.
+    """
+    m = KEYWORD_NUMBER.match(line)
+    if m: return m.group(1), m.group(2).strip()[:80]
+    m = BARE_NUMBER.match(line)
+    if m: return m.group(1).rstrip(".)"), m.group(2).strip()[:80]
+    m = ATTACHMENT.match(line)
+    if m: return m.group(1), m.group(2).strip()[:80]
+    m = DEFINITION.match(line)
+    if m: return None, f"Definition: {m.group(1)}"
+    if _caps_heading(line): return None, line.strip()
+    return None
+
+
+# --- 2. SPLITTER ---
+class ClauseSplitter:
+    """
+    Contract-structure splitter.
+
+    Detects numbered sections, headings, attachments and definitions, then
+    packs whole clauses into chunks up to a token budget with no overlap.
+    Every chunk records its page range and character offsets into the
+    document (the concatenation of page texts), plus the clauses it holds.
+    Works on a stream of pages and only buffers the clause being read and
+    the chunk being packed.
+    """
+
+    def __init__(self, max_tokens=CLAUSE_CHUNK_TOKENS):
+        self.max_tokens = max_tokens
+        self.max_chars = max_tokens * 4
+
+    # A. Pages -> clauses
+    def iter_clauses(self, pages):
+        offset = 0
+        current = None
+        clause_no = 0
+
+        def finish(clause):
+            clause["text"] = "".join(clause.pop("parts"))
+            return clause
+
+        for page in pages:
+            text = page.page_content
+            page_no = page.metadata.get("page", 0)
+            pos = 0
+            for line in text.splitlines(keepends=True):
+                line_start = offset + pos
+                pos += len(line)
+                boundary = detect_boundary(line)
+
+                if boundary and current is not None:
+                    if "".join(current["parts"]).strip():
+                        yield from self._split_long(finish(current))
+                        current = None
+                    else:
+                        # Only blank lines so far: this heading names the clause
+                        current["number"], current["heading"] = boundary
+
+                if current is None:
+                    number, heading = boundary if boundary else (None, "Preamble" if clause_no == 0 else "")
+                    clause_no += 1
+                    current = {"id": f"c{clause_no}", "number": number, "heading": heading,
+                               "start": line_start, "end": line_start, "page": page_no, "page_end": page_no,
+                               "metadata": page.metadata, "parts": []}
+
+                current["parts"].append(line)
+                current["end"] = line_start + len(line)
+                current["page_end"] = page_no
+            offset += len(text)
+
+        if current is not None and "".join(current["parts"]).strip():
+            yield from self._split_long(finish(current))
+
+    def _split_long(self, clause):
+        """Cuts a clause that alone exceeds the budget at sentence/line ends."""
+        text = clause["text"]
+        if len(text) <= self.max_chars:
+            yield clause
+            return
+
+        pieces, start = [], 0
+        while start < len(text):
+            end = min(start + self.max_chars, len(text))
+            if end < len(text):
+                window = text[start:end]
+                cut = max(window.rfind(". "), window.rfind("\n"), window.rfind("; "))
+                if cut > self.max_chars // 3: end = start + cut + 1
+            pieces.append((start, end))
+            start = end
+
+        for i, (a, b) in enumerate(pieces):
+            part = dict(clause)
+            part.update({"id": f"{clause['id']}.{i + 1}", "text": text[a:b],
+                         "start": clause["start"] + a, "end": clause["start"] + b})
+            yield part
+
+    # B. Clauses -> chunks
+    def split_pages(self, pages):
+        buffer, tokens = [], 0
+        for clause in self.iter_clauses(pages):
+            size = estimate_tokens(clause["text"])
+            if buffer and tokens + size > self.max_tokens:
+                yield self._make_chunk(buffer)
+                buffer, tokens = [], 0
+            buffer.append(clause)
+            tokens += size
+        if buffer:
+            yield self._make_chunk(buffer)
+
+    def split_documents(self, documents):
+        return list(self.split_pages(documents))
+
+    def _make_chunk(self, clauses):
+        first, last = clauses[0], clauses[-1]
+        label = first["number"] or ""
+        section = f"{label} {first['heading']}".strip() or "Untitled"
+        metadata = {k: v for k, v in first["metadata"].items() if k != "extract_ms"}
+        metadata.update({
+            "page": first["page"],
+            "page_end": last["page_end"],
+            "start_char": first["start"],
+            "end_char": last["end"],
+            "section": section,
+            "clauses": [{"id": c["id"], "number": c["number"], "heading": c["heading"],
+                         "start": c["start"], "end": c["end"]} for c in clauses],
+        })
+        return Document(page_content="".join(c["text"] for c in clauses), metadata=metadata)
@@ -0,0 +1,244 @@
+import sqlite3
+import hashlib
+import math
+import os
+import re
+import time
+import threading
+from array import array
+from collections import Counter
+from utils.helpers import estimate_tokens
+from utils.revisions import clauses_from_chunks
+
+# Per-contract retrieval index for the Oracle. Built once at analysis time
+# from the contract chunks (one entry per clause when ClauseSplitter metadata
+# is available), stored locally so every question only embeds the question
+# (and repeated questions come from the embedding service's disk cache).
+CONTRACT_INDEX_DB = os.getenv("clauseai_contract_index_db", "contract_index.db")
+# Contract text an Oracle prompt may carry, on top of the agent's summary
+ORACLE_CONTEXT_TOKENS = int(os.getenv("clauseai_oracle_context_tokens", "3000"))
+# Oversized clauses are cut so one clause cannot eat the whole budget
+MAX_ENTRY_TOKENS = 1_200
+# Lexical fallback (no embedding model, or the embedding call failed)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_cache_lock = threading.Lock()
+_loaded = {}
+_query_vectors = {}
+_schema_ready = False
+
+
+# --- 1. CONNECTION & SCHEMA ---
+def _connect():
+    # The Oracle reads the index from the Streamlit process, which never
+    # runs worker.py's start-up, so make sure the tables exist
+    if not _schema_ready: init_contract_index_db()
+    conn = sqlite3.connect(CONTRACT_INDEX_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_contract_index_db():
+    global _schema_ready
+    conn = sqlite3.connect(CONTRACT_INDEX_DB, timeout=30)
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS contracts
+                 (contract_id TEXT PRIMARY KEY, model TEXT, entries INTEGER, created_at REAL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS contract_entries
+                 (contract_id TEXT, position INTEGER, page INTEGER, section TEXT, text TEXT,
+                  tokens INTEGER, vector BLOB, PRIMARY KEY (contract_id, position))''')
+    conn.commit()
+    conn.close()
+    _schema_ready = True
+
+
+# --- 2. EMBEDDINGS ---
+def _embedder():
+    """The shared (cached) Gemini embedding service, or None when it is not configured."""
+    try:
+        from utils.pinecone_client import embeddings
+    except Exception:
+        return None
+    return embeddings
+
+def _model_name(embedder):
+    return getattr(embedder, "model", None) or type(embedder).__name__
+
+def _pack(vector):
+    return array("f", vector).tobytes()
+
+def _unpack(blob):
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector
+
+def _normalize_query(question):
+    return " ".join(question.lower().split())
+
+def _query_vector(embedder, question):
+    """Query embedding, kept in memory per model; the service caches it on disk."""
+    key = (_model_name(embedder), _normalize_query(question))
+    with _cache_lock:
+        if key in _query_vectors: return _query_vectors[key]
+    vector = array("f", embedder.embed_query(key[1]))
+    with _cache_lock:
+        if len(_query_vectors) >= 1024: _query_vectors.pop(next(iter(_query_vectors)))
+        _query_vectors[key] = vector
+    return vector
+
+
+# --- 3. BUILDING THE INDEX ---
+def contract_id_for(chunks):
+    """Content hash of the cleaned contract text, so re-runs reuse the index."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.page_content.encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+def _entries(chunks):
+    """One entry per clause when the chunker recorded clauses, else per chunk."""
+    clauses = clauses_from_chunks(chunks)
+    if clauses:
+        entries = [{"page": c["page"], "section": f"{c['number'] or ''} {c['heading'] or ''}".strip(),
+                    "text": c["text"].strip()} for c in clauses]
+    else:
+        entries = [{"page": c.metadata.get("page"), "section": c.metadata.get("section") or "",
+                    "text": c.page_content.strip()} for c in chunks]
+    for entry in entries:
+        if estimate_tokens(entry["text"]) > MAX_ENTRY_TOKENS:
+            entry["text"] = entry["text"][:MAX_ENTRY_TOKENS * 4].rsplit(" ", 1)[0] + " …"
+        entry["tokens"] = estimate_tokens(entry["text"])
+    return [e for e in entries if e["text"]]
+
+def build_index(chunks):
+    """
+    Indexes one analysed contract. Returns {contract_id, entries, vectors}.
+    Entries are embedded in batches (clauses shared with earlier contracts
+    come from the embedding cache); if embedding fails the index is kept
+    without vectors and retrieval falls back to BM25.
+    """
+    contract_id = contract_id_for(chunks)
+    embedder = _embedder()
+    model = _model_name(embedder) if embedder else None
+
+    conn = _connect()
+    row = conn.execute("SELECT model, entries FROM contracts WHERE contract_id=?", (contract_id,)).fetchone()
+    if row is not None and (row["model"] == model or model is None):
+        conn.close()
+        return {"contract_id": contract_id, "entries": row["entries"], "vectors": row["model"] is not None}
+    conn.close()
+
+    entries = _entries(chunks)
+    vectors = [None] * len(entries)
+    if embedder and entries:
+        try:
+            vectors = [_pack(v) for v in embedder.embed_documents([e["text"] for e in entries])]
+        except Exception as e:
+            print(f"⚠️ Oracle index built without embeddings: {e}")
+            vectors, model = [None] * len(entries), None
+
+    conn = _connect()
+    conn.execute("DELETE FROM contract_entries WHERE contract_id=?", (contract_id,))
+    conn.executemany(
+        "INSERT INTO contract_entries (contract_id, position, page, section, text, tokens, vector) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(contract_id, i, e["page"], e["section"], e["text"], e["tokens"], vectors[i]) for i, e in enumerate(entries)])
+    conn.execute("INSERT OR REPLACE INTO contracts (contract_id, model, entries, created_at) VALUES (?, ?, ?, ?)",
+                 (contract_id, model, len(entries), time.time()))
+    conn.commit()
+    conn.close()
+    with _cache_lock: _loaded.pop(contract_id, None)
+    return {"contract_id": contract_id, "entries": len(entries), "vectors": model is not None}
+
+
+# --- 4. RETRIEVAL ---
+def _load(contract_id):
+    """Entries of one contract, kept in memory after the first question."""
+    with _cache_lock:
+        if contract_id in _loaded: return _loaded[contract_id]
+    conn = _connect()
+    meta = conn.execute("SELECT model FROM contracts WHERE contract_id=?", (contract_id,)).fetchone()
+    rows = conn.execute("SELECT * FROM contract_entries WHERE contract_id=? ORDER BY position",
+                        (contract_id,)).fetchall()
+    conn.close()
+    if meta is None: return None
+    entries = [{"position": r["position"], "page": r["page"], "section": r["section"], "text": r["text"],
+                "tokens": r["tokens"], "vector": _unpack(r["vector"]) if r["vector"] else None,
+                "terms": Counter(_terms(r["text"]))} for r in rows]
+    loaded = {"model": meta["model"], "entries": entries}
+    with _cache_lock:
+        if len(_loaded) >= 16: _loaded.pop(next(iter(_loaded)))
+        _loaded[contract_id] = loaded
+    return loaded
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def _terms(text):
+    return re.findall(r"[a-z0-9]{3,}", text.lower())
+
+def _bm25_scores(question, entries):
+    docs = [e["terms"] for e in entries]
+    avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1
+    query = set(_terms(question))
+    df = {term: sum(1 for d in docs if term in d) for term in query}
+    scores = []
+    for doc in docs:
+        length, score = sum(doc.values()), 0.0
+        for term in query:
+            if term not in doc: continue
+            idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+            tf = doc[term]
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+        scores.append(score)
+    return scores
+
+def retrieve(contract_id, question, budget=ORACLE_CONTEXT_TOKENS):
+    """
+    The contract passages most relevant to `question`, best first, packed
+    into `budget` tokens. Each is {page, section, text, tokens, score}.
+    Returns [] when the contract has no index.
+    """
+    index = _load(contract_id) if contract_id else None
+    if not index or not index["entries"]: return []
+    entries = index["entries"]
+
+    scores = None
+    embedder = _embedder()
+    if index["model"] and embedder and _model_name(embedder) == index["model"]:
+        try:
+            query = _query_vector(embedder, question)
+            scores = [_cosine(query, e["vector"]) if e["vector"] else 0.0 for e in entries]
+        except Exception as e:
+            print(f"⚠️ Query embedding failed, using keyword retrieval: {e}")
+    if scores is None:
+        scores = _bm25_scores(question, entries)
+
+    picked, used = [], 0
+    for score, entry in sorted(zip(scores, entries), key=lambda pair: -pair[0]):
+        if score <= 0: break
+        if used + entry["tokens"] > budget: continue
+        picked.append({"page": entry["page"], "section": entry["section"], "text": entry["text"],
+                       "tokens": entry["tokens"], "score": round(score, 4)})
+        used += entry["tokens"]
+    return picked
+
+def render_passages(passages):
+    """Excerpt block for the Oracle prompt, each passage with its citation."""
+    blocks = []
+    for p in passages:
+        cite = ", ".join(part for part in (f"p.{p['page'] + 1}" if isinstance(p["page"], int) else "",
+                                           p["section"][:60]) if part)
+        blocks.append(f"[{cite or 'contract'}]\n{p['text']}")
+    return "\n\n".join(blocks)
+
+def entry_text(contract_id):
+    """All indexed clause text of a contract, in document order ('' if not indexed)."""
+    if not contract_id: return ""
+    conn = _connect()
+    rows = conn.execute("SELECT text FROM contract_entries WHERE contract_id=? ORDER BY position",
+                        (contract_id,)).fetchall()
+    conn.close()
+    return "\n".join(r["text"] for r in rows)
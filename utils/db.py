@@ -1,8 +1,11 @@
+import os
 import sqlite3
 import hashlib
 
+DB_PATH = os.getenv("clauseai_users_db", "users.db")
+
 def init_db():
-    conn = sqlite3.connect('users.db')
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     # Create table if it doesn't exist
     c.execute('''CREATE TABLE IF NOT EXISTS users 
@@ -14,7 +17,7 @@ def make_hash(password):
     return hashlib.sha256(str.encode(password)).hexdigest()
 
 def add_user(username, password):
-    conn = sqlite3.connect('users.db')
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     hashed_pw = make_hash(password)
     try:
@@ -28,7 +31,7 @@ def add_user(username, password):
     return result
 
 def check_user(username, password):
-    conn = sqlite3.connect('users.db')
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     hashed_pw = make_hash(password)
     c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, hashed_pw))
@@ -37,7 +40,7 @@ def check_user(username, password):
     return data # Returns (username, password, plan) or None
 
 def update_plan(username, new_plan):
-    conn = sqlite3.connect('users.db')
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute("UPDATE users SET plan=? WHERE username=?", (new_plan, username))
     conn.commit()
@@ -1,22 +1,316 @@
 import os
+import re
+import time
+import threading
+from collections import Counter
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pypdf
+from langchain_core.documents import Document
 from langchain_community.document_loaders import PyPDFLoader,Docx2txtLoader,TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-def load_document(path):
+from utils.tracing import traced
+from utils.clause_splitter import ClauseSplitter
+from utils.helpers import estimate_tokens
+
+# TXT files have no real pages: split on form feeds, and cap each "page"
+# so a huge plain-text export is still streamed in bounded pieces.
+TXT_PAGE_MAX_CHARS = 100_000
+
+# Big PDFs are extracted on a process pool; small ones stay in-process
+# because pool start-up and pickling would cost more than they save.
+PARALLEL_PDF_MIN_PAGES = int(os.getenv("clauseai_parallel_pdf_min_pages", "40"))
+PARALLEL_PDF_MIN_BYTES = int(os.getenv("clauseai_parallel_pdf_min_bytes", str(5 * 1024 * 1024)))
+PDF_WORKERS = int(os.getenv("clauseai_pdf_workers", str(max(1, (os.cpu_count() or 2) - 1))))
+PAGES_PER_TASK = 8
+
+# "clause" packs whole contract clauses with page/char offsets (default);
+# "recursive" is the original 1000-char / 100-overlap character splitter.
+CHUNK_STRATEGY = os.getenv("clauseai_chunker", "clause")
+
+# Header/footer stripping: lines in the top/bottom BOILERPLATE_EDGE_LINES of
+# at least BOILERPLATE_MIN_SHARE of the first BOILERPLATE_LEARN_PAGES pages
+# are treated as running headers/footers. Page-number lines are learned the
+# same way: only stripped at the top or bottom edge where that share of pages
+# carries one, with changing numbers (so a lone amount or clause number stays).
+STRIP_BOILERPLATE = os.getenv("clauseai_strip_boilerplate", "1") != "0"
+BOILERPLATE_LEARN_PAGES = 8
+BOILERPLATE_EDGE_LINES = 3
+BOILERPLATE_MIN_SHARE = 0.6
+BOILERPLATE_MAX_LINE = 120
+PAGE_NUMBER_LINE = re.compile(r'^\s*(?:page\s*)?[-–]?\s*\d{1,4}\s*[-–]?\s*(?:(?:of|/)\s*\d{1,4})?\s*$', re.I)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_loader(path):
     ext=os.path.splitext(path)[1].lower()
     if ext==".pdf":
-        loader=PyPDFLoader(path)
+        return PyPDFLoader(path)
     elif ext==".docx":
-        loader=Docx2txtLoader(path)
-    elif ext==".txt":   
-        loader=TextLoader(path,encoding="utf-8")
+        return Docx2txtLoader(path)
+    elif ext==".txt":
+        return TextLoader(path,encoding="utf-8")
     else:
         raise ValueError(f"Unsupported file format: {ext}")
-    return loader.load()
 
-def chunk_contract(documents):
-    splitter = RecursiveCharacterTextSplitter(
+def _iter_txt_pages(path):
+    """Reads a .txt file line by line and yields one Document per page."""
+    page, size, page_no = [], 0, 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split("\f")
+            for i, part in enumerate(parts):
+                if i > 0 or size + len(part) > TXT_PAGE_MAX_CHARS:
+                    if page:
+                        yield Document(page_content="".join(page), metadata={"source": path, "page": page_no})
+                        page_no += 1
+                    page, size = [], 0
+                page.append(part)
+                size += len(part)
+    if page:
+        yield Document(page_content="".join(page), metadata={"source": path, "page": page_no})
+
+# --- PARALLEL PDF EXTRACTION ---
+def _get_pool():
+    """One shared pool per process, created on first big PDF."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+def _extract_page_range(path, start, end):
+    """Runs in a pool process: returns [(page_no, text, ms)] for pages start..end-1."""
+    reader = pypdf.PdfReader(path)
+    out = []
+    for page_no in range(start, end):
+        t0 = time.perf_counter()
+        text = reader.pages[page_no].extract_text()
+        out.append((page_no, text, (time.perf_counter() - t0) * 1000))
+    return out
+
+def _pdf_header(path):
+    """Page count, page labels and document-level metadata in the same shape PyPDFLoader uses."""
+    try:
+        reader = pypdf.PdfReader(path)
+        info = {k.lstrip("/").lower(): str(v) for k, v in (reader.metadata or {}).items()}
+        return len(reader.pages), list(reader.page_labels), info
+    except Exception:
+        return 0, [], {}
+
+def _iter_pdf_pages_parallel(path, total_pages, page_labels, info):
+    """
+    Splits the page range into small tasks across the pool. Futures are
+    consumed in submission order, so pages come out in order, and only a
+    small window is in flight so memory stays bounded on huge files.
+    """
+    pool = _get_pool()
+    starts = deque(range(0, total_pages, PAGES_PER_TASK))
+    in_flight = deque()
+
+    def submit_next():
+        start = starts.popleft()
+        in_flight.append(pool.submit(_extract_page_range, path, start, min(start + PAGES_PER_TASK, total_pages)))
+
+    while starts and len(in_flight) < PDF_WORKERS * 2:
+        submit_next()
+
+    while in_flight:
+        batch = in_flight.popleft().result()
+        if starts: submit_next()
+        for page_no, text, ms in batch:
+            label = page_labels[page_no] if page_no < len(page_labels) else str(page_no + 1)
+            yield Document(page_content=text, metadata={
+                **info, "source": path, "total_pages": total_pages, "page": page_no,
+                "page_label": label, "extract_ms": round(ms, 2)
+            })
+
+def _iter_pdf_pages(path):
+    total_pages, page_labels, info = _pdf_header(path)
+    big = total_pages >= PARALLEL_PDF_MIN_PAGES or (
+        os.path.getsize(path) >= PARALLEL_PDF_MIN_BYTES and total_pages > PAGES_PER_TASK)
+    if big and PDF_WORKERS > 1:
+        yield from _iter_pdf_pages_parallel(path, total_pages, page_labels, info)
+        return
+
+    # In-process: PyPDFLoader parses lazily, we just time each page
+    t0 = time.perf_counter()
+    for doc in PyPDFLoader(path).lazy_load():
+        doc.metadata["extract_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        yield doc
+        t0 = time.perf_counter()
+
+def iter_document_pages(path):
+    """
+    Generator version of load_document: yields one Document per page as it
+    is parsed, so callers never need the whole file in memory.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".txt":
+        yield from _iter_txt_pages(path)
+    elif ext == ".pdf":
+        yield from _iter_pdf_pages(path)
+    else:
+        # Docx2txt yields a single document
+        yield from _get_loader(path).lazy_load()
+
+@traced("load_document")
+def load_document(path):
+    return list(iter_document_pages(path))
+
+def _make_splitter():
+    return RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=100
     )
-    chunks = splitter.split_documents(documents)
-    return chunks
+
+def iter_chunks(documents, strategy=None):
+    """
+    Incremental chunker: yields chunks as pages arrive. Accepts a list or a
+    generator (e.g. iter_document_pages).
+    """
+    if (strategy or CHUNK_STRATEGY) == "clause":
+        yield from ClauseSplitter().split_pages(documents)
+        return
+
+    splitter = _make_splitter()
+    for doc in documents:
+        yield from splitter.split_documents([doc])
+
+@traced("chunk_contract")
+def chunk_contract(documents):
+    return list(iter_chunks(documents))
+
+# --- BOILERPLATE STRIPPING ---
+def _normalize_line(line):
+    """Digits become '#' so 'Page 3 of 10' and 'Page 4 of 10' compare equal."""
+    return re.sub(r"\d+", "#", " ".join(line.split()).lower())
+
+class BoilerplateStripper:
+    """
+    Removes running headers/footers, page-number lines and whitespace noise
+    from a stream of pages, keeping a record of what was removed.
+    It buffers only the first few pages to learn which lines repeat.
+    """
+
+    def __init__(self, learn_pages=BOILERPLATE_LEARN_PAGES):
+        self.learn_pages = learn_pages
+        self.repeated = set()
+        self.number_edges = set()  # "top" / "bottom": where the page numbers are
+        self.removed = Counter()
+        self.examples = {}
+        self.chars_before = 0
+        self.chars_after = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    @staticmethod
+    def _edge_sides(lines):
+        """{"top": indexes, "bottom": indexes} of the first/last few non-blank lines (never overlapping)."""
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        half = len(filled) // 2
+        return {"top": set(filled[:min(BOILERPLATE_EDGE_LINES, half)]),
+                "bottom": set(filled[half:][-BOILERPLATE_EDGE_LINES:])}
+
+    @classmethod
+    def _edges(cls, lines):
+        """Indexes of the first/last few non-blank lines, where headers and footers live."""
+        sides = cls._edge_sides(lines)
+        return sides["top"] | sides["bottom"]
+
+    def _learn(self, pages):
+        if len(pages) < 2: return
+        seen = Counter()
+        numbers = {"top": [], "bottom": []}
+        for page in pages:
+            lines = page.page_content.splitlines()
+            edge = {_normalize_line(lines[i]) for i in self._edges(lines)}
+            seen.update(l for l in edge if 4 <= len(l) <= BOILERPLATE_MAX_LINE)
+            for side, indexes in self._edge_sides(lines).items():
+                found = [lines[i].strip() for i in sorted(indexes) if PAGE_NUMBER_LINE.match(lines[i])]
+                if found: numbers[side].append(found[0])
+        needed = max(2, int(len(pages) * BOILERPLATE_MIN_SHARE + 0.5))
+        self.repeated = {line for line, count in seen.items() if count >= needed}
+        self.number_edges = {side for side, found in numbers.items() if len(found) >= needed and len(set(found)) > 1}
+
+    def _clean(self, page):
+        text = page.page_content
+        lines = text.splitlines()
+        sides = self._edge_sides(lines)
+        edges = sides["top"] | sides["bottom"]
+        number_lines = set().union(*(sides[side] for side in self.number_edges))
+        kept = []
+        for i, line in enumerate(lines):
+            norm = _normalize_line(line)
+            if (i in edges and norm in self.repeated) or (i in number_lines and PAGE_NUMBER_LINE.match(line)):
+                self.removed[norm] += 1
+                self.examples.setdefault(norm, line.strip())
+                continue
+            kept.append(re.sub(r"[ \t]+", " ", line).rstrip())
+        cleaned = re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip("\n") + "\n"
+
+        self.chars_before += len(text)
+        self.chars_after += len(cleaned)
+        self.tokens_before += estimate_tokens(text)
+        self.tokens_after += estimate_tokens(cleaned)
+        return Document(page_content=cleaned, metadata=page.metadata)
+
+    def process(self, pages):
+        buffer = []
+        for page in pages:
+            if buffer is not None:
+                buffer.append(page)
+                if len(buffer) < self.learn_pages: continue
+                self._learn(buffer)
+                for held in buffer: yield self._clean(held)
+                buffer = None
+                continue
+            yield self._clean(page)
+        if buffer:
+            self._learn(buffer)
+            for held in buffer: yield self._clean(held)
+
+    def report(self):
+        saved = self.tokens_before - self.tokens_after
+        return {
+            "removed_lines": [{"text": self.examples[k], "count": c} for k, c in self.removed.most_common(20)],
+            "lines_removed": sum(self.removed.values()),
+            "chars_before": self.chars_before,
+            "chars_after": self.chars_after,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": saved,
+            "pct_saved": round(100 * saved / self.tokens_before, 1) if self.tokens_before else 0.0,
+        }
+
+def stream_contract_chunks(path, stats=None):
+    """
+    Parse + clean + chunk pipeline for one file, page at a time.
+    If `stats` is a dict it is filled with page/chunk/char counts as we go,
+    plus the boilerplate report once the stream is exhausted. Chunk offsets
+    refer to the cleaned text.
+    """
+    if stats is None: stats = {}
+    stats.update({"pages": 0, "chunks": 0, "chars": 0, "extract_ms_total": 0.0,
+                  "extract_ms_max": 0.0, "slowest_page": None})
+
+    def counted_pages():
+        for page in iter_document_pages(path):
+            stats["pages"] += 1
+            stats["chars"] += len(page.page_content)
+            ms = page.metadata.get("extract_ms")
+            if ms is not None:
+                stats["extract_ms_total"] = round(stats["extract_ms_total"] + ms, 2)
+                if ms > stats["extract_ms_max"]:
+                    stats["extract_ms_max"], stats["slowest_page"] = ms, page.metadata.get("page")
+            yield page
+
+    pages = counted_pages()
+    stripper = BoilerplateStripper() if STRIP_BOILERPLATE else None
+    if stripper: pages = stripper.process(pages)
+
+    for chunk in iter_chunks(pages):
+        stats["chunks"] += 1
+        yield chunk
+    if stripper: stats["boilerplate"] = stripper.report()
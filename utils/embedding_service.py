@@ -0,0 +1,184 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+# Disk-cached, batched front for the embedding model. Vectors live in one
+# append-only float32 file per (model, dimension), read through a memory map;
+# SQLite maps (model, text hash) to a row of that file.
+EMBEDDING_CACHE_DIR = os.getenv("clauseai_embedding_cache_dir", os.path.join("data", "embeddings"))
+EMBEDDING_CACHE_ENABLED = os.getenv("clauseai_embedding_cache", "1") != "0"
+EMBED_BATCH_SIZE = int(os.getenv("clauseai_embed_batch", "64"))
+# Recent query vectors kept in memory (Oracle questions, vault searches)
+QUERY_MEMORY_SIZE = 1024
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+def _slug(model):
+    return re.sub(r"[^A-Za-z0-9]+", "-", str(model)).strip("-") or "model"
+
+
+class EmbeddingService:
+    """
+    Drop-in for a LangChain embeddings object (embed_query / embed_documents).
+    Cached texts never reach the model; the rest go out in batches of
+    EMBED_BATCH_SIZE through embed_documents. Queries share the disk cache,
+    plus an in-memory LRU; concurrent requests for the same query (a panel
+    of agents asking one question) wait for a single model call. Distinct
+    queries are not batched together: embed_documents would embed them with
+    the document task type.
+    """
+
+    def __init__(self, embedder, cache_dir=EMBEDDING_CACHE_DIR):
+        self.embedder = embedder
+        self.model = getattr(embedder, "model", None) or type(embedder).__name__
+        self.cache_dir = cache_dir
+        self.db_path = os.path.join(cache_dir, "embeddings.db")
+        self.lock = threading.Lock()
+        self.maps = {}  # dim -> (memmap, rows)
+        self.recent_queries = OrderedDict()  # text -> vector
+        self.inflight = {}  # text -> Future of a query being embedded
+        self.metrics = {"hits": 0, "misses": 0, "batches": 0, "texts_embedded": 0, "max_batch": 0}
+        self._ready = False
+
+    # --- 1. STORAGE ---
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('''CREATE TABLE IF NOT EXISTS embeddings
+                            (model TEXT, text_hash TEXT, dim INTEGER, row INTEGER,
+                             PRIMARY KEY (model, text_hash))''')
+            conn.commit()
+            conn.close()
+            self._ready = True
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _path(self, dim):
+        return os.path.join(self.cache_dir, f"{_slug(self.model)}_{dim}.f32")
+
+    def _rows(self, dim, rows):
+        """Reads cached rows, re-mapping the file when it has grown since."""
+        with self.lock:
+            mapped = self.maps.get(dim)
+            if mapped is None or max(rows) >= mapped[1]:
+                total = os.path.getsize(self._path(dim)) // (dim * 4)
+                mapped = (np.memmap(self._path(dim), dtype=np.float32, mode="r", shape=(total, dim)), total)
+                self.maps[dim] = mapped
+        return [mapped[0][row].tolist() for row in rows]
+
+    def _lookup(self, hashes):
+        conn = self._connect()
+        found = {}
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i + 500]
+            for text_hash, dim, row in conn.execute(
+                    f"SELECT text_hash, dim, row FROM embeddings WHERE model=? AND text_hash IN "
+                    f"({','.join('?' * len(batch))})", (self.model, *batch)):
+                found[text_hash] = (dim, row)
+        conn.close()
+        vectors = {}
+        for dim in {dim for dim, _ in found.values()}:
+            keys = [h for h, (d, _) in found.items() if d == dim]
+            for key, vector in zip(keys, self._rows(dim, [found[k][1] for k in keys])):
+                vectors[key] = vector
+        return vectors
+
+    def _store(self, hashes, vectors):
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE serialises appenders across threads and processes
+            conn.execute("BEGIN IMMEDIATE")
+            for dim in {len(v) for v in vectors}:
+                pairs = [(h, v) for h, v in zip(hashes, vectors) if len(v) == dim]
+                path = self._path(dim)
+                first = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+                with open(path, "ab") as f:
+                    f.write(np.asarray([v for _, v in pairs], dtype=np.float32).tobytes())
+                conn.executemany("INSERT OR IGNORE INTO embeddings (model, text_hash, dim, row) VALUES (?, ?, ?, ?)",
+                                 [(self.model, h, dim, first + i) for i, (h, _) in enumerate(pairs)])
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- 2. EMBEDDING ---
+    def _embed(self, texts, kind):
+        texts = list(texts)
+        # Queries and documents are embedded with different task types
+        hashes = [_text_hash(f"{kind}:{t}") for t in texts]
+        cached = {}
+        if EMBEDDING_CACHE_ENABLED and texts:
+            try:
+                cached = self._lookup(list(set(hashes)))
+            except Exception as e:
+                print(f"⚠️ Embedding cache read failed: {e}")
+
+        missing = list(dict.fromkeys(h for h in hashes if h not in cached))
+        first_text = {h: t for h, t in zip(reversed(hashes), reversed(texts))}
+        fresh = {}
+        for i in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[i:i + EMBED_BATCH_SIZE]
+            if kind == "query":
+                vectors = [self.embedder.embed_query(first_text[h]) for h in batch]
+            else:
+                vectors = self.embedder.embed_documents([first_text[h] for h in batch])
+            fresh.update(zip(batch, vectors))
+            with self.lock:
+                self.metrics["batches"] += 1
+                self.metrics["texts_embedded"] += len(batch)
+                self.metrics["max_batch"] = max(self.metrics["max_batch"], len(batch))
+        if fresh and EMBEDDING_CACHE_ENABLED:
+            try:
+                self._store(list(fresh), list(fresh.values()))
+            except Exception as e:
+                print(f"⚠️ Embedding cache write failed: {e}")
+
+        with self.lock:
+            self.metrics["hits"] += sum(1 for h in hashes if h in cached)
+            self.metrics["misses"] += sum(1 for h in hashes if h not in cached)
+        return [cached[h] if h in cached else fresh[h] for h in hashes]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "doc")
+
+    def embed_query(self, text):
+        with self.lock:
+            if text in self.recent_queries:
+                self.recent_queries.move_to_end(text)
+                self.metrics["hits"] += 1
+                return self.recent_queries[text]
+            future, owner = self.inflight.get(text), False
+            if future is None:
+                future, owner = Future(), True
+                self.inflight[text] = future
+        if not owner:
+            with self.lock: self.metrics["hits"] += 1
+            return future.result()
+
+        try:
+            vector = self._embed([text], "query")[0]
+        except Exception as e:
+            with self.lock: self.inflight.pop(text, None)
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.recent_queries[text] = vector
+            if len(self.recent_queries) > QUERY_MEMORY_SIZE: self.recent_queries.popitem(last=False)
+            self.inflight.pop(text, None)
+        future.set_result(vector)
+        return vector
+
+    def stats(self):
+        """Hit rate and batch sizes since start-up."""
+        with self.lock:
+            stats = dict(self.metrics)
+        looked_up = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / looked_up, 3) if looked_up else 0.0
+        stats["avg_batch"] = round(stats["texts_embedded"] / stats["batches"], 1) if stats["batches"] else 0.0
+        return stats
@@ -0,0 +1,249 @@
+import re
+from utils.helpers import estimate_tokens
+
+# Rule-based fact sheet: runs over the chunks in milliseconds, no LLM.
+# Every fact keeps a citation (page, section, clause id) and the sentence
+# it came from so agents and the Oracle can quote it.
+MAX_FACTS_PER_TYPE = 20
+# Facts of one type shown to an agent, most frequent first
+AGENT_FACTS_PER_TYPE = 8
+SNIPPET_CHARS = 220
+# Sentence ends: a full stop before whitespace (". " or ".\n"), or a blank line
+SENTENCE_BREAK = re.compile(r"\.\s|\n\s*\n")
+
+# --- 1. PATTERNS ---
+MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+DATE = (rf"(?:\d{{1,2}}(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?{MONTHS},?\s+\d{{4}}"
+        rf"|{MONTHS}\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}"
+        rf"|\d{{4}}-\d{{2}}-\d{{2}}|\d{{1,2}}[/.]\d{{1,2}}[/.]\d{{4}})")
+CURRENCY_CODES = {"USD": "USD", "US$": "USD", "$": "USD", "DOLLARS": "USD", "EUR": "EUR", "€": "EUR",
+                  "EUROS": "EUR", "GBP": "GBP", "£": "GBP", "POUNDS": "GBP", "INR": "INR", "₹": "INR",
+                  "RS.": "INR", "RUPEES": "INR", "AUD": "AUD", "CAD": "CAD", "SGD": "SGD", "JPY": "JPY", "¥": "JPY"}
+SCALE = {"k": 1e3, "thousand": 1e3, "m": 1e6, "million": 1e6, "mn": 1e6, "bn": 1e9, "billion": 1e9,
+         "lakh": 1e5, "lakhs": 1e5, "crore": 1e7, "crores": 1e7}
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                "nine": 9, "ten": 10, "fourteen": 14, "fifteen": 15, "twenty": 20, "thirty": 30,
+                "forty-five": 45, "sixty": 60, "ninety": 90}
+
+PATTERNS = {
+    "party": re.compile(
+        r"([A-Z][\w&.,'\- ]{2,80}?(?:Ltd\.?|Limited|Inc\.?|LLC|LLP|GmbH|plc|Corporation|Corp\.?|Pvt\.?|Company|Co\.)?)"
+        r",?\s*(?:\([^)]{0,80}\)\s*)?\((?:hereinafter\s+(?:referred\s+to\s+as\s+)?)?(?:the\s+)?[“\"']([A-Z][\w ]{1,30})[”\"']\)"),
+    "effective_date": re.compile(
+        rf"(?:effective\s+(?:as\s+of|from|on)|commenc\w+\s+on|dated(?:\s+as\s+of)?|[“\"]effective date[”\"]\s+means)\s+(?:the\s+)?({DATE})", re.I),
+    "termination_date": re.compile(
+        rf"(?:expir\w+|terminat\w+|end)\s+(?:on|at\s+midnight\s+on|upon)\s+(?:the\s+)?({DATE})", re.I),
+    "notice_period": re.compile(
+        r"(?:(\d{1,3}|[a-z\-]+)\s*(?:\(\d{1,3}\)\s*)?(?:business\s+|calendar\s+|working\s+)?(days?|weeks?|months?)['’]?\s+(?:prior\s+|advance\s+)?(?:written\s+)?notice"
+        r"|notice\s+of\s+(?:at\s+least\s+|not\s+less\s+than\s+)?(\d{1,3}|[a-z\-]+)\s*(?:\(\d{1,3}\)\s*)?(?:business\s+|calendar\s+|working\s+)?(days?|weeks?|months?))", re.I),
+    "money": re.compile(
+        r"(US\$|USD|EUR|GBP|INR|AUD|CAD|SGD|JPY|Rs\.|[$€£₹¥])\s?(\d[\d,]*(?:\.\d+)?)(?:\s?(million|billion|thousand|lakhs?|crores?|mn|bn|k|m)\b)?"
+        r"|(\d[\d,]*(?:\.\d+)?)(?:\s?(million|billion|thousand|lakhs?|crores?))?\s?(USD|EUR|GBP|INR|AUD|CAD|dollars|euros|pounds|rupees)\b", re.I),
+    "percentage": re.compile(r"(\d{1,3}(?:\.\d+)?)\s?(?:%|per\s?cent\b|percent\b)(\s+per\s+(?:month|annum|year|day|week))?", re.I),
+    "governing_law": re.compile(
+        r"govern(?:ed|s)\s+by(?:,?\s+and\s+construed\s+in\s+accordance\s+with,?)?\s+the\s+laws?\s+of\s+(?:the\s+)?([A-Z][\w .]{1,60}?)(?=[,.;]|\s+without|\s+and\s+(?:the|each|any|all|shall)\b|$)"),
+    "jurisdiction": re.compile(
+        r"(?:(exclusive|non-exclusive)\s+)?jurisdiction\s+of\s+the\s+courts?\s+(?:of|in|at|located\s+in)\s+(?:the\s+)?([A-Z][\w .]{1,60}?)(?=[,.;]|\s+and\s|$)"
+        r"|courts?\s+of\s+(?:the\s+)?([A-Z][\w .]{1,60}?)\s+shall\s+have\s+(exclusive|non-exclusive)?\s*jurisdiction"),
+}
+
+# Which facts each agent gets, and the words that make a chunk relevant to it
+AGENT_FACTS = {
+    "legal": ["party", "effective_date", "termination_date", "notice_period", "governing_law", "jurisdiction"],
+    "finance": ["party", "money", "percentage", "effective_date", "termination_date", "notice_period"],
+    "compliance": ["party", "governing_law", "jurisdiction", "effective_date", "percentage"],
+    "operations": ["party", "effective_date", "termination_date", "notice_period", "percentage"],
+}
+AGENT_KEYWORDS = {
+    "legal": ["law", "jurisdiction", "liabil", "indemn", "terminat", "warrant", "intellectual property",
+              "confidential", "obligation", "breach", "dispute", "assign"],
+    "finance": ["payment", "fee", "invoice", "price", "penalt", "interest", "tax", "cost", "compensation",
+                "expense", "currency", "refund"],
+    "compliance": ["complian", "regulat", "gdpr", "data protection", "personal data", "audit", "policy",
+                   "standard", "anti-bribery", "sanction", "privacy", "security"],
+    "operations": ["service level", "sla", "deliver", "timeline", "milestone", "uptime", "support", "response time",
+                   "acceptance", "schedule", "perform", "availability"],
+}
+# Below this size the whole contract is cheap enough to send as is
+TRIM_MIN_TOKENS = 4_000
+
+
+# --- 2. NORMALISERS ---
+def _amount(number, scale):
+    value = float(number.replace(",", ""))
+    return value * SCALE.get((scale or "").lower(), 1)
+
+def _normalize(kind, m):
+    if kind == "party":
+        # "This Agreement is made between Acme Ltd" -> "Acme Ltd"
+        name = re.split(r"\b(?:between|and|by|with)\s+", m.group(1))[-1].strip(" ,")
+        return f"{name} ({m.group(2).strip()})"
+    if kind in ("effective_date", "termination_date"):
+        return " ".join(m.group(1).split())
+    if kind == "notice_period":
+        count, unit = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+        count = NUMBER_WORDS.get(count.lower(), count)
+        if not str(count).isdigit(): return None
+        unit = unit.lower().rstrip("s")
+        return f"{count} {unit}{'s' if int(count) != 1 else ''}"
+    if kind == "money":
+        if m.group(2):
+            currency, value = CURRENCY_CODES.get(m.group(1).upper(), m.group(1).upper()), _amount(m.group(2), m.group(3))
+        else:
+            currency, value = CURRENCY_CODES.get(m.group(6).upper(), m.group(6).upper()), _amount(m.group(4), m.group(5))
+        return f"{currency} {value:,.2f}".replace(".00", "")
+    if kind == "percentage":
+        return f"{m.group(1)}%{(' ' + ' '.join(m.group(2).split())) if m.group(2) else ''}"
+    if kind == "governing_law":
+        return m.group(1).strip(" .")
+    if kind == "jurisdiction":
+        place = (m.group(2) or m.group(3) or "").strip(" .")
+        scope = m.group(1) or m.group(4)
+        return f"{place} ({scope.lower()})" if scope else place
+    return m.group(0)
+
+
+# --- 3. EXTRACTION ---
+def _clause_at(meta, offset):
+    """The clause (from ClauseSplitter metadata) containing a document offset."""
+    for clause in meta.get("clauses", []):
+        if clause["start"] <= offset < clause["end"]: return clause
+    return None
+
+def _collapse(text):
+    return re.sub(r"\s+", " ", text)
+
+def _snippet(text, start, end):
+    """The sentence around a match, trimmed to SNIPPET_CHARS around the matched span."""
+    left = 0
+    for m in SENTENCE_BREAK.finditer(text, 0, start):
+        left = m.end()
+    m = SENTENCE_BREAK.search(text, end)
+    right = m.start() + 1 if m else len(text)
+
+    sentence = _collapse(text[left:right])
+    lead = len(sentence) - len(sentence.lstrip())
+    sentence = sentence.strip()
+    if len(sentence) <= SNIPPET_CHARS: return sentence
+    # Window of SNIPPET_CHARS - 2 (room for the ellipses) that keeps the match
+    match_start = max(0, len(_collapse(text[left:start])) - lead)
+    match_end = min(len(sentence), match_start + len(_collapse(text[start:end])))
+    width = SNIPPET_CHARS - 2
+    lo = max(0, min(match_start - (width - (match_end - match_start)) // 2, len(sentence) - width))
+    hi = lo + width
+    return ("…" if lo > 0 else "") + sentence[lo:hi].strip() + ("…" if hi < len(sentence) else "")
+
+def extract_facts(chunks):
+    """
+    Returns the fact sheet {type: [fact, ...]}; each fact is
+    {value, snippet, page, section, clause, chunk, count}. Repeated values are
+    merged (count) and keep the citation of their first occurrence.
+    """
+    sheet = {kind: {} for kind in PATTERNS}
+    for index, chunk in enumerate(chunks):
+        text, meta = chunk.page_content, chunk.metadata
+        for kind, pattern in PATTERNS.items():
+            for m in pattern.finditer(text):
+                value = _normalize(kind, m)
+                if not value: continue
+                facts = sheet[kind]
+                if value in facts:
+                    facts[value]["count"] += 1
+                    continue
+                if len(facts) >= MAX_FACTS_PER_TYPE: continue
+                clause = _clause_at(meta, meta.get("start_char", 0) + m.start()) if "clauses" in meta else None
+                facts[value] = {
+                    "value": value,
+                    "snippet": _snippet(text, m.start(), m.end()),
+                    "page": meta.get("page"),
+                    "section": f"{clause['number'] or ''} {clause['heading'] or ''}".strip() if clause else meta.get("section"),
+                    "clause": clause["id"] if clause else None,
+                    "chunk": index,
+                    "count": 1,
+                }
+    return {kind: list(facts.values()) for kind, facts in sheet.items() if facts}
+
+def _cite(fact):
+    page = f"p.{fact['page'] + 1}" if isinstance(fact.get("page"), int) else ""
+    section = fact.get("section") or ""
+    if len(section) > 60: section = section[:59].rstrip() + "…"
+    return ", ".join(part for part in (page, section) if part)
+
+def facts_for_agent(facts, agent_key):
+    """Plain-text block of the facts relevant to one agent ('' if none)."""
+    lines = []
+    for kind in AGENT_FACTS.get(agent_key, PATTERNS):
+        for fact in sorted(facts.get(kind, []), key=lambda f: -f["count"])[:AGENT_FACTS_PER_TYPE]:
+            cite = _cite(fact)
+            lines.append(f"- {kind.replace('_', ' ').title()}: {fact['value']}" + (f" [{cite}]" if cite else ""))
+    if not lines: return ""
+    return "KEY FACTS (extracted verbatim from the contract; cite them, do not contradict them):\n" + "\n".join(lines)
+
+def select_context(chunks, agent_key, facts):
+    """
+    Trimmed context for one agent: the chunks that mention its keywords or
+    hold one of its facts, in document order. Small contracts, and agents
+    whose selection would be empty, get every chunk.
+    """
+    if sum(estimate_tokens(c.page_content) for c in chunks) <= TRIM_MIN_TOKENS:
+        return chunks
+    keywords = AGENT_KEYWORDS.get(agent_key)
+    if not keywords: return chunks
+    fact_chunks = {fact["chunk"] for kind in AGENT_FACTS.get(agent_key, []) for fact in facts.get(kind, [])}
+    selected = [chunk for i, chunk in enumerate(chunks)
+                if i in fact_chunks or any(k in chunk.page_content.lower() for k in keywords)]
+    return selected or chunks
+
+
+# --- 4. ORACLE LOOKUPS ---
+# Question intent -> (fact types, optional words the fact's sentence must contain)
+INTENTS = [
+    ("notice period", re.compile(r"\bnotice\b", re.I), ["notice_period"], None),
+    ("late payment terms", re.compile(r"\blate\s+(?:fee|payment|charge)|\binterest\b|\bpenalt", re.I),
+     ["percentage", "money"], re.compile(r"late|overdue|interest|penalt", re.I)),
+    ("service levels", re.compile(r"\buptime\b|\bsla\b|\bavailability\b|service\s+level", re.I),
+     ["percentage"], re.compile(r"uptime|availab|service level", re.I)),
+    ("governing law", re.compile(r"governing\s+law|which\s+law|what\s+law|laws?\s+of|governed", re.I), ["governing_law"], None),
+    ("jurisdiction", re.compile(r"jurisdiction|\bcourts?\b|\bvenue\b", re.I), ["jurisdiction"], None),
+    ("parties", re.compile(r"\bpart(?:y|ies)\b|who\s+(?:is|are)\s+the\s+(?:supplier|customer|client|vendor|buyer|seller)", re.I), ["party"], None),
+    ("effective date", re.compile(r"effective\s+date|start\s+date|commence|when\s+does\s+.*\b(?:start|begin)", re.I), ["effective_date"], None),
+    ("expiry date", re.compile(r"expir|end\s+date|termination\s+date|when\s+does\s+.*\bend\b", re.I), ["termination_date"], None),
+    ("amounts", re.compile(r"how\s+much|\bfees?\b|\bprice\b|\bcost\b|\bamount\b|contract\s+value|liability\s+cap", re.I), ["money"], None),
+]
+# Broad intents that yield to any more specific one ("what is the late fee?" is late payment terms)
+GENERIC_INTENTS = {"amounts"}
+# Questions asking for judgement rather than a value go to the LLM
+NEEDS_REASONING = re.compile(r"\b(?:why|explain|should|risk|compare|summar|what\s+if|fair|negotiat|recommend|mean)\w*", re.I)
+MAX_LOOKUP_WORDS = 18
+
+def answer_from_facts(question, facts):
+    """
+    Answers simple lookups ("what's the notice period?") straight from the
+    fact sheet, with a citation. Returns None when the LLM should answer.
+    """
+    if not facts or len(question.split()) > MAX_LOOKUP_WORDS or NEEDS_REASONING.search(question):
+        return None
+    matched = [intent for intent in INTENTS if intent[1].search(question)]
+    specific = [intent for intent in matched if intent[0] not in GENERIC_INTENTS]
+    matched = specific or matched
+    if len(matched) != 1: return None
+
+    label, _, kinds, context_filter = matched[0]
+    found = [f for kind in kinds for f in facts.get(kind, [])
+             if context_filter is None or context_filter.search(f["snippet"])]
+    if not found: return None
+
+    # Prefer facts whose sentence shares words with the question ("notice ... termination")
+    words = {w[:6] for w in re.findall(r"[a-z]{5,}", question.lower())}
+    def relevance(fact):
+        return len(words & {w[:6] for w in re.findall(r"[a-z]{5,}", fact["snippet"].lower())})
+    ranked = sorted(found, key=lambda f: (-relevance(f), -f["count"]))
+    best = relevance(ranked[0])
+    found = [f for f in ranked if relevance(f) == best][:3]
+    lines = [f"**{label.title()}:** " + "; ".join(f["value"] for f in found)]
+    if len(found) > 1 and label not in ("parties", "amounts"):
+        lines.append("_The contract states more than one value; check each source below._")
+    for f in found:
+        cite = _cite(f)
+        lines.append(f"> {f['snippet']}" + (f"\n>\n> 📎 {cite}" if cite else ""))
+    return "\n\n".join(lines)
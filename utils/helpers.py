@@ -1,6 +1,12 @@
 import ast
 import re
 
+# Rough, provider-agnostic token estimate (~4 characters per token for English)
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
 def clean_raw_output(raw_data):
     """
     Robust cleaner for AI outputs, handling Lists, Dicts, and Strings.
@@ -0,0 +1,248 @@
+import sqlite3
+import json
+import os
+import time
+import uuid
+import socket
+
+# Lives next to users.db. Several workers (even on other machines) can share
+# this file, so we keep SQLite's default rollback journal: WAL needs shared
+# memory and is NOT safe on network drives.
+JOBS_DB = os.getenv("clauseai_jobs_db", "jobs.db")
+
+LEASE_SECONDS = 60       # A running job must heartbeat within this window
+WORKER_STALE_SECONDS = 30
+
+# Job lifecycle: queued -> running -> succeeded | failed | cancelled
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when the user cancels the running job."""
+
+
+# --- 1. CONNECTION & SCHEMA ---
+def _connect():
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_jobs_db():
+    conn = _connect()
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS jobs
+                 (id TEXT PRIMARY KEY, kind TEXT, status TEXT, username TEXT,
+                  payload TEXT, file_name TEXT, file_blob BLOB,
+                  result TEXT, error TEXT, progress REAL, stage TEXT,
+                  attempts INTEGER, max_attempts INTEGER, cancel_requested INTEGER,
+                  worker_id TEXT, lease_expires REAL,
+                  created_at REAL, started_at REAL, finished_at REAL)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS workers
+                 (id TEXT PRIMARY KEY, host TEXT, pid INTEGER, last_seen REAL, current_job TEXT)''')
+    conn.commit()
+    conn.close()
+
+def _row_to_job(row):
+    if row is None: return None
+    job = dict(row)
+    job.pop("file_blob", None) # Never ship the upload back to the UI
+    job["payload"] = json.loads(job["payload"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+# --- 2. PRODUCER SIDE (Streamlit console) ---
+def submit_job(kind, payload, username=None, file_name=None, file_bytes=None, max_attempts=3):
+    """
+    Queues a job and returns its id. The upload travels inside the row so a
+    worker on another machine does not need access to our data/ folder.
+    """
+    job_id = str(uuid.uuid4())
+    conn = _connect()
+    conn.execute(
+        "INSERT INTO jobs (id, kind, status, username, payload, file_name, file_blob, progress, stage, "
+        "attempts, max_attempts, cancel_requested, created_at) VALUES (?, ?, 'queued', ?, ?, ?, ?, 0, 'queued', 0, ?, 0, ?)",
+        (job_id, kind, username, json.dumps(payload), file_name,
+         sqlite3.Binary(file_bytes) if file_bytes is not None else None, max_attempts, time.time())
+    )
+    conn.commit()
+    conn.close()
+    return job_id
+
+def get_job(job_id):
+    conn = _connect()
+    row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    conn.close()
+    return _row_to_job(row)
+
+def list_jobs(username=None, limit=20):
+    conn = _connect()
+    if username:
+        rows = conn.execute("SELECT * FROM jobs WHERE username=? ORDER BY created_at DESC LIMIT ?",
+                            (username, limit)).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    conn.close()
+    return [_row_to_job(r) for r in rows]
+
+def cancel_job(job_id):
+    """
+    Queued jobs are cancelled immediately. Running jobs get a flag that the
+    worker picks up on its next heartbeat.
+    """
+    conn = _connect()
+    now = time.time()
+    conn.execute("UPDATE jobs SET status='cancelled', stage='cancelled', finished_at=? WHERE id=? AND status='queued'",
+                 (now, job_id))
+    conn.execute("UPDATE jobs SET cancel_requested=1 WHERE id=? AND status='running'", (job_id,))
+    conn.commit()
+    conn.close()
+
+def retry_job(job_id):
+    """Puts a failed or cancelled job back on the queue with a fresh attempt budget."""
+    conn = _connect()
+    cur = conn.execute(
+        "UPDATE jobs SET status='queued', stage='queued', progress=0, attempts=0, error=NULL, result=NULL, "
+        "cancel_requested=0, worker_id=NULL, lease_expires=NULL, finished_at=NULL "
+        "WHERE id=? AND status IN ('failed', 'cancelled')", (job_id,)
+    )
+    conn.commit()
+    conn.close()
+    return cur.rowcount == 1
+
+
+# --- 3. CONSUMER SIDE (worker.py) ---
+def claim_next_job(worker_id, kinds=None, lease_seconds=LEASE_SECONDS):
+    """
+    Atomically moves the oldest queued job to 'running' for this worker.
+    BEGIN IMMEDIATE takes the write lock up front, so two workers sharing
+    the file can never claim the same row.
+    Jobs whose worker died (lease expired) are requeued first.
+    Returns (job, file_bytes) or (None, None).
+    """
+    conn = _connect()
+    conn.isolation_level = None
+    now = time.time()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+
+        # 1. Recover jobs abandoned by crashed workers
+        conn.execute(
+            "UPDATE jobs SET status=CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+            "stage=CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+            "error=COALESCE(error, 'Worker lost (lease expired)'), worker_id=NULL, lease_expires=NULL, "
+            "finished_at=CASE WHEN attempts >= max_attempts THEN ? ELSE NULL END "
+            "WHERE status='running' AND lease_expires < ?", (now, now)
+        )
+
+        # 2. Pick the oldest queued job
+        query = "SELECT * FROM jobs WHERE status='queued'"
+        params = []
+        if kinds:
+            query += " AND kind IN ({})".format(",".join("?" * len(kinds)))
+            params.extend(kinds)
+        query += " ORDER BY created_at LIMIT 1"
+        row = conn.execute(query, params).fetchone()
+
+        if row is None:
+            conn.execute("COMMIT")
+            return None, None
+
+        conn.execute(
+            "UPDATE jobs SET status='running', stage='starting', worker_id=?, attempts=attempts+1, "
+            "lease_expires=?, started_at=? WHERE id=?",
+            (worker_id, now + lease_seconds, now, row["id"])
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    file_bytes = bytes(row["file_blob"]) if row["file_blob"] is not None else None
+    job = get_job(row["id"])
+    return job, file_bytes
+
+def heartbeat(job_id, worker_id, progress=None, stage=None, lease_seconds=LEASE_SECONDS):
+    """
+    Extends the lease and records progress. Raises JobCancelled if the user
+    asked to stop, or if the job was taken away from this worker.
+    """
+    conn = _connect()
+    conn.execute(
+        "UPDATE jobs SET lease_expires=?, progress=COALESCE(?, progress), stage=COALESCE(?, stage) "
+        "WHERE id=? AND worker_id=? AND status='running'",
+        (time.time() + lease_seconds, progress, stage, job_id, worker_id)
+    )
+    conn.commit()
+    row = conn.execute("SELECT status, worker_id, cancel_requested FROM jobs WHERE id=?", (job_id,)).fetchone()
+    conn.close()
+
+    if row is None or row["cancel_requested"]:
+        raise JobCancelled(job_id)
+    if row["status"] != "running" or row["worker_id"] != worker_id:
+        raise JobCancelled(job_id)
+
+def complete_job(job_id, worker_id, result):
+    conn = _connect()
+    conn.execute(
+        "UPDATE jobs SET status='succeeded', stage='done', progress=1, result=?, error=NULL, "
+        "file_blob=NULL, lease_expires=NULL, finished_at=? WHERE id=? AND worker_id=?",
+        (json.dumps(result), time.time(), job_id, worker_id)
+    )
+    conn.commit()
+    conn.close()
+
+def mark_cancelled(job_id, worker_id):
+    conn = _connect()
+    conn.execute(
+        "UPDATE jobs SET status='cancelled', stage='cancelled', lease_expires=NULL, finished_at=? "
+        "WHERE id=? AND worker_id=?", (time.time(), job_id, worker_id)
+    )
+    conn.commit()
+    conn.close()
+
+def fail_job(job_id, worker_id, error):
+    """Requeues the job while it still has attempts left, otherwise marks it failed."""
+    conn = _connect()
+    conn.execute(
+        "UPDATE jobs SET status=CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+        "stage=CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+        "error=?, worker_id=NULL, lease_expires=NULL, "
+        "finished_at=CASE WHEN attempts >= max_attempts THEN ? ELSE NULL END "
+        "WHERE id=? AND worker_id=?",
+        (str(error), time.time(), job_id, worker_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+# --- 4. WORKER REGISTRY ---
+def new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+def worker_heartbeat(worker_id, current_job=None):
+    conn = _connect()
+    conn.execute(
+        "INSERT INTO workers (id, host, pid, last_seen, current_job) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET last_seen=excluded.last_seen, current_job=excluded.current_job",
+        (worker_id, socket.gethostname(), os.getpid(), time.time(), current_job)
+    )
+    conn.commit()
+    conn.close()
+
+def remove_worker(worker_id):
+    conn = _connect()
+    conn.execute("DELETE FROM workers WHERE id=?", (worker_id,))
+    conn.commit()
+    conn.close()
+
+def active_workers(window=WORKER_STALE_SECONDS):
+    conn = _connect()
+    rows = conn.execute("SELECT * FROM workers WHERE last_seen >= ? ORDER BY host, pid",
+                        (time.time() - window,)).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
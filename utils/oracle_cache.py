@@ -0,0 +1,126 @@
+import sqlite3
+import hashlib
+import os
+import re
+import time
+import threading
+from array import array
+
+# Oracle answers shared across the team: the same question about the same
+# contract, asked of the same agent and answered by the same model tier,
+# comes back from here instead of the LLM.
+ORACLE_CACHE_DB = os.getenv("clauseai_oracle_cache_db", "oracle_cache.db")
+ORACLE_CACHE_ENABLED = os.getenv("clauseai_oracle_cache", "1") != "0"
+# Paraphrase lookup through the contract index's query embeddings (off by default)
+SEMANTIC_ENABLED = os.getenv("clauseai_oracle_semantic_cache", "0") == "1"
+SEMANTIC_THRESHOLD = float(os.getenv("clauseai_oracle_semantic_threshold", "0.95"))
+
+# Questions leaning on earlier turns ("what about that clause?") depend on the
+# conversation, so they are only cached when there is no conversation yet
+FOLLOW_UP = re.compile(r"\b(it|its|that|those|they|them|above|previous|earlier|same|also|else)\b", re.I)
+FILLER = re.compile(r"\b(please|kindly|can you|could you|tell me|i want to know)\b")
+
+_stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "stored": 0}
+_stats_lock = threading.Lock()
+_schema_ready = False
+
+
+# --- 1. CONNECTION & SCHEMA ---
+def _connect():
+    if not _schema_ready: init_oracle_cache_db()
+    conn = sqlite3.connect(ORACLE_CACHE_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_oracle_cache_db():
+    global _schema_ready
+    conn = sqlite3.connect(ORACLE_CACHE_DB, timeout=30)
+    c = conn.cursor()
+    # analysis is a hash of the agent's report, so a rerun never serves stale answers
+    c.execute('''CREATE TABLE IF NOT EXISTS oracle_answers
+                 (contract_id TEXT, agent TEXT, analysis TEXT, model TEXT, question TEXT,
+                  answer TEXT, vector BLOB, created_at REAL, hits INTEGER DEFAULT 0,
+                  PRIMARY KEY (contract_id, agent, analysis, model, question))''')
+    conn.commit()
+    conn.close()
+    _schema_ready = True
+
+
+# --- 2. KEYS ---
+def normalize_question(question):
+    text = FILLER.sub(" ", question.lower())
+    return " ".join(re.sub(r"[^\w%$€£₹ ]+", " ", text).split())
+
+def analysis_hash(summary):
+    return hashlib.sha256(str(summary).encode("utf-8")).hexdigest()[:16]
+
+def cacheable(question, memory_text=""):
+    return ORACLE_CACHE_ENABLED and bool(normalize_question(question)) and not (memory_text and FOLLOW_UP.search(question))
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return dot / norm if norm else 0.0
+
+def _question_vector(question):
+    """Query embedding from the contract index's cache, or None."""
+    from utils import contract_index
+    embedder = contract_index._embedder()
+    if embedder is None: return None
+    try:
+        return contract_index._query_vector(embedder, question)
+    except Exception:
+        return None
+
+
+# --- 3. LOOKUP & STORE ---
+def lookup(contract_id, agent, summary, model, question):
+    """Cached answer for this question (exact, then paraphrase) or None."""
+    key = (contract_id, agent, analysis_hash(summary), model)
+    normalized = normalize_question(question)
+    conn = _connect()
+    row = conn.execute("SELECT rowid, answer FROM oracle_answers WHERE contract_id=? AND agent=? AND analysis=? "
+                       "AND model=? AND question=?", (*key, normalized)).fetchone()
+    kind = "hits"
+    if row is None and SEMANTIC_ENABLED:
+        vector = _question_vector(question)
+        candidates = conn.execute("SELECT rowid, answer, vector FROM oracle_answers WHERE contract_id=? AND agent=? "
+                                  "AND analysis=? AND model=? AND vector IS NOT NULL", key).fetchall() if vector else []
+        scored = [(_cosine(vector, array("f", c["vector"])), c) for c in candidates]
+        scored = [pair for pair in scored if pair[0] >= SEMANTIC_THRESHOLD]
+        row = max(scored, key=lambda pair: pair[0])[1] if scored else None
+        kind = "semantic_hits"
+
+    if row is not None:
+        conn.execute("UPDATE oracle_answers SET hits = hits + 1 WHERE rowid=?", (row["rowid"],))
+        conn.commit()
+    conn.close()
+    with _stats_lock: _stats[kind if row is not None else "misses"] += 1
+    return row["answer"] if row is not None else None
+
+def store(contract_id, agent, summary, model, question, answer):
+    vector = _question_vector(question) if SEMANTIC_ENABLED else None
+    conn = _connect()
+    conn.execute("INSERT OR REPLACE INTO oracle_answers (contract_id, agent, analysis, model, question, answer, "
+                 "vector, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                 (contract_id, agent, analysis_hash(summary), model, normalize_question(question), answer,
+                  array("f", vector).tobytes() if vector else None, time.time()))
+    conn.commit()
+    conn.close()
+    with _stats_lock: _stats["stored"] += 1
+
+def invalidate(contract_id):
+    """Drops every cached answer for a contract (called when it is re-analysed)."""
+    conn = _connect()
+    removed = conn.execute("DELETE FROM oracle_answers WHERE contract_id=?", (contract_id,)).rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+def cache_stats():
+    """Process-wide hit/miss counters since start-up."""
+    with _stats_lock:
+        stats = dict(_stats)
+    hits = stats["hits"] + stats["semantic_hits"]
+    stats["hit_rate"] = round(hits / (hits + stats["misses"]), 3) if hits + stats["misses"] else 0.0
+    return stats
@@ -1,5 +1,19 @@
+import os
+import math
 import pypdf # <--- Fulfills your requirement
 import streamlit as st
+from config import (LLM_COST_PER_1K_INPUT, LLM_COST_PER_1K_OUTPUT, LLM_OUTPUT_TOKENS_PER_CALL,
+                    LLM_CALL_OVERHEAD_S, LLM_INPUT_TOKENS_PER_S, LLM_OUTPUT_TOKENS_PER_S)
+from planner.planner import plan_strategy, MAP_BATCH_TOKENS, WARN_JOB_TOKENS, MAX_JOB_TOKENS
+from multi_agents.map_reduce import MAP_CONCURRENCY, CLAUSE_BATCH_TOKENS
+from utils.clause_cache import CLAUSE_CACHE_ENABLED
+from utils.helpers import CHARS_PER_TOKEN
+
+# Pages with fewer extracted characters than this are treated as image-only
+# (scanned) or blank; their text never reaches the agents without OCR.
+IMAGE_ONLY_MIN_CHARS = 25
+# Big PDFs are sampled evenly instead of extracting every page
+PREFLIGHT_SCAN_PAGES = 60
 
 def inspect_pdf_metadata(file_path):
     """
@@ -23,4 +37,143 @@ def inspect_pdf_metadata(file_path):
         return info
         
     except Exception as e:
-        return {"error": f"pypdf could not read file: {str(e)}"}
\ No newline at end of file
+        return {"error": f"pypdf could not read file: {str(e)}"}
+
+# --- PRE-FLIGHT SCAN ---
+STOPWORDS = {
+    "English": {"the", "and", "of", "to", "shall", "in", "this", "any", "by", "with"},
+    "French": {"le", "la", "les", "et", "des", "du", "une", "pour", "dans", "est"},
+    "Spanish": {"el", "la", "los", "las", "y", "del", "por", "para", "con", "una"},
+    "German": {"der", "die", "das", "und", "den", "mit", "für", "von", "ist", "nicht"},
+}
+
+def detect_language(text):
+    """Cheap guess from script (Tamil/Hindi) or stopword counts (Latin script)."""
+    sample = text[:20000]
+    tamil = sum(1 for ch in sample if "஀" <= ch <= "௿")
+    hindi = sum(1 for ch in sample if "ऀ" <= ch <= "ॿ")
+    letters = sum(1 for ch in sample if ch.isalpha()) or 1
+    if tamil / letters > 0.3: return "Tamil"
+    if hindi / letters > 0.3: return "Hindi"
+
+    words = sample.lower().split()
+    scores = {lang: sum(1 for w in words if w in stop) for lang, stop in STOPWORDS.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] >= 3 else "Unknown"
+
+def _has_images(page):
+    try:
+        xobjects = page.get("/Resources", {}).get_object().get("/XObject")
+        if not xobjects: return False
+        return any(x.get_object().get("/Subtype") == "/Image" for x in xobjects.get_object().values())
+    except Exception:
+        return False
+
+def _scan_pdf(file_path):
+    reader = pypdf.PdfReader(file_path)
+    if reader.is_encrypted:
+        return {"error": "PDF is encrypted. Please remove password."}
+    meta = reader.metadata
+    total = len(reader.pages)
+    step = max(1, total / PREFLIGHT_SCAN_PAGES)
+    picked = sorted({int(i * step) for i in range(min(total, PREFLIGHT_SCAN_PAGES))})
+
+    pages = []
+    for page_no in picked:
+        page = reader.pages[page_no]
+        pages.append({"page": page_no + 1, "text": page.extract_text() or "", "images": _has_images(page)})
+    return {"pages": total, "author": meta.author if meta and meta.author else "Unknown",
+            "producer": meta.producer if meta and meta.producer else "Unknown", "sampled": pages}
+
+def _scan_text_file(file_path):
+    from utils.docsloader import iter_document_pages
+    total, pages = 0, []
+    for doc in iter_document_pages(file_path):
+        total += 1
+        if len(pages) < PREFLIGHT_SCAN_PAGES:
+            pages.append({"page": total, "text": doc.page_content, "images": False})
+        else:
+            # Past the sample only the size matters
+            pages.append({"page": total, "text": None, "chars": len(doc.page_content)})
+    return {"pages": total, "author": "Unknown", "producer": "Unknown", "sampled": pages}
+
+def project_run(tokens, agents):
+    """Projected LLM calls, tokens, latency and cost of analysing `tokens` with `agents`."""
+    strategy = plan_strategy(tokens)
+    n_agents = max(1, len(agents))
+    if CLAUSE_CACHE_ENABLED:
+        # Clause review: small batches plus one report call (worst case, nothing cached yet)
+        batches = max(1, math.ceil(tokens / CLAUSE_BATCH_TOKENS))
+        merge = True
+    else:
+        batches = 1 if strategy == "single_pass" else max(1, math.ceil(tokens / MAP_BATCH_TOKENS))
+        merge = batches > 1
+
+    def call_seconds(input_tokens):
+        return (LLM_CALL_OVERHEAD_S + input_tokens / LLM_INPUT_TOKENS_PER_S
+                + LLM_OUTPUT_TOKENS_PER_CALL / LLM_OUTPUT_TOKENS_PER_S)
+
+    per_batch = tokens / batches
+    agent_seconds = math.ceil(batches / MAP_CONCURRENCY) * call_seconds(per_batch)
+    if merge: agent_seconds += call_seconds(batches * LLM_OUTPUT_TOKENS_PER_CALL)
+    reviewer_input = n_agents * LLM_OUTPUT_TOKENS_PER_CALL
+
+    calls = n_agents * (batches + (1 if merge else 0)) + 1
+    input_tokens = n_agents * (tokens + (batches * LLM_OUTPUT_TOKENS_PER_CALL if merge else 0)) + reviewer_input
+    output_tokens = calls * LLM_OUTPUT_TOKENS_PER_CALL
+    cost = input_tokens / 1000 * LLM_COST_PER_1K_INPUT + output_tokens / 1000 * LLM_COST_PER_1K_OUTPUT
+    return {
+        "strategy": strategy,
+        "llm_calls": calls,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        # Agents run in parallel, then the reviewer
+        "latency_s": round(agent_seconds + call_seconds(reviewer_input), 1),
+        "cost_usd": round(cost, 4),
+    }
+
+def preflight_scan(file_path, agents):
+    """
+    Cheap look at a contract before any LLM call: per-page text density,
+    image-only pages, language, estimated tokens and the projected calls,
+    latency and cost for `agents`. Big PDFs are sampled, not fully read.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    try:
+        scan = _scan_pdf(file_path) if ext == ".pdf" else _scan_text_file(file_path)
+    except Exception as e:
+        return {"error": f"Could not read file: {str(e)}"}
+    if "error" in scan: return scan
+
+    sampled = scan.pop("sampled")
+    density, image_only, texts, chars = [], [], [], 0
+    for page in sampled:
+        if page["text"] is None:
+            chars += page["chars"]
+            continue
+        n = len(page["text"].strip())
+        chars += n
+        density.append({"page": page["page"], "chars": n})
+        if n < IMAGE_ONLY_MIN_CHARS: image_only.append(page["page"])
+        if len(texts) < 10: texts.append(page["text"])
+
+    # Scale the sample up to the whole document
+    read_pages = len(sampled)
+    tokens = chars // CHARS_PER_TOKEN
+    if read_pages and scan["pages"] > read_pages:
+        tokens = int(tokens * scan["pages"] / read_pages)
+
+    projection = project_run(tokens, agents)
+    warnings = []
+    if image_only:
+        warnings.append(f"{len(image_only)} page(s) look image-only or blank (e.g. p.{image_only[0]}); "
+                        "their text will not reach the agents without OCR.")
+    if projection["strategy"] == "blocked":
+        warnings.append(f"~{tokens:,} tokens exceeds the {MAX_JOB_TOKENS:,} token limit per job.")
+    elif tokens > WARN_JOB_TOKENS:
+        warnings.append(f"Large contract (~{tokens:,} tokens): about {projection['llm_calls']} LLM calls "
+                        f"and ${projection['cost_usd']:.2f}.")
+
+    return {**scan, "estimated_tokens": tokens, "language": detect_language("\n".join(texts)),
+            "density": density, "image_only_pages": image_only, "sampled_pages": len(density),
+            **projection, "warnings": warnings}
@@ -1,11 +1,20 @@
 import time
-import uuid
 import json
+import hashlib
+import tempfile
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 import streamlit as st
 from pinecone import Pinecone, ServerlessSpec
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
+from utils.tracing import traced
+from utils.vector_store import get_vector_store
+from utils.embedding_service import EmbeddingService
+from utils import blob_store, archive_index
+from utils.contract_index import entry_text
 
 # 1. Load Environment Variables
 load_dotenv()
@@ -33,67 +42,158 @@ try:
             model="models/gemini-embedding-001", 
             google_api_key=gemini_key
         )
+        # Disk cache + batching in front of the model (utils/embedding_service.py)
+        embeddings = EmbeddingService(embeddings)
 except Exception as e:
     st.error(f"⚠️ Embeddings Failed: {e}")
     embeddings = None
 
+# 4. Cached Index Handle
+# One client + index handle per process. The existence check, dimension probe
+# and index creation happen once; the dimension is persisted so later
+# processes never spend an embedding call on it.
+INDEX_STATE_FILE = os.getenv("clauseai_pinecone_state", os.path.join("data", "pinecone_index.json"))
+HEALTH_TTL_S = 60
+INDEX_READY_TIMEOUT_S = 120
+
+_handle = {"client": None, "index": None, "creating": None, "health": None, "checked_at": 0.0}
+_handle_lock = threading.Lock()
+
+def _load_index_state():
+    try:
+        with open(INDEX_STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if state.get("index") == INDEX_NAME else {}
+    except (OSError, ValueError):
+        return {}
+
+def _save_index_state(**values):
+    state = {**_load_index_state(), "index": INDEX_NAME, **values}
+    os.makedirs(os.path.dirname(INDEX_STATE_FILE) or ".", exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(INDEX_STATE_FILE) or ".", suffix=".tmp",
+                                     encoding="utf-8", delete=False) as f:
+        json.dump(state, f)
+    os.replace(f.name, INDEX_STATE_FILE)
+
+@traced("pinecone.get_embedding_dimension")
 def get_embedding_dimension():
     """
-    Runs a dummy test to see exactly how many dimensions 
-    your specific API key/Model is generating.
+    Size of the vectors our embedding model produces. Measured with one
+    dummy embedding the first time, then read from INDEX_STATE_FILE.
     """
+    dimension = _load_index_state().get("dimension")
+    if dimension: return dimension
     if not embeddings: return 768
     try:
         # Embed a single word to measure the vector size
-        test_vec = embeddings.embed_query("test")
-        return len(test_vec)
+        dimension = len(embeddings.embed_query("test"))
+        _save_index_state(dimension=dimension)
+        return dimension
     except Exception as e:
-        st.warning(f"Could not determine embedding dimension: {e}")
+        print(f"⚠️ Could not determine embedding dimension: {e}")
         return 768 # Default fallback
 
+def _create_index(pc):
+    """Runs on a background thread: creates the index and waits until it is ready."""
+    try:
+        detected_dim = get_embedding_dimension()
+        print(f"⚠️ Index '{INDEX_NAME}' not found. Creating it with {detected_dim} dimensions...")
+        pc.create_index(
+            name=INDEX_NAME,
+            dimension=detected_dim, # <--- DYNAMIC DIMENSION
+            metric="cosine",
+            spec=ServerlessSpec(
+                cloud="aws",
+                region="us-east-1"
+            )
+        )
+        deadline = time.time() + INDEX_READY_TIMEOUT_S
+        while time.time() < deadline:
+            status = pc.describe_index(INDEX_NAME).status
+            if (status.get("ready") if isinstance(status, dict) else getattr(status, "ready", False)): break
+            time.sleep(2)
+        _save_index_state(dimension=detected_dim, exists=True)
+        print(f"✅ Index created successfully with {detected_dim} dimensions!")
+    except Exception as e:
+        print(f"❌ Failed to create index: {e}")
+    finally:
+        with _handle_lock: _handle["creating"] = None
+
+def _bootstrap():
+    """Client, existence check and (background) creation; called once under the lock."""
+    pc = _handle["client"] or Pinecone(api_key=PINECONE_API_KEY)
+    _handle["client"] = pc
+    if not _load_index_state().get("exists"):
+        if INDEX_NAME not in [i.name for i in pc.list_indexes()]:
+            if _handle["creating"] is None:
+                _handle["creating"] = threading.Thread(target=_create_index, args=(pc,), daemon=True)
+                _handle["creating"].start()
+            return None
+        _save_index_state(exists=True)
+    _handle["index"] = pc.Index(INDEX_NAME)
+    return _handle["index"]
+
+@traced("pinecone.get_index")
 def get_index():
     """
-    Connects to Pinecone. 
-    AUTO-CREATES the index with the CORRECT dimensions.
+    Process-wide Pinecone index handle. The first call connects (and starts
+    creating the index in the background if it does not exist yet); every
+    later call returns the cached handle without any network round trip.
+    Returns None while the index is unavailable.
     """
+    if _handle["index"] is not None: return _handle["index"]
     if not PINECONE_API_KEY:
         st.error("🚨 Error: PINECONE_API_KEY missing in config.py")
         return None
 
+    with _handle_lock:
+        if _handle["index"] is not None: return _handle["index"]
+        try:
+            index = _bootstrap()
+        except Exception as e:
+            st.error(f"❌ Pinecone Connection Failed: {str(e)}")
+            return None
+        creating = _handle["creating"] is not None
+    if index is None and creating:
+        st.info(f"⏳ Pinecone index '{INDEX_NAME}' is being created; archives will be available shortly.")
+    return index
+
+def reset_index_handle():
+    """Forgets the cached handle so the next call reconnects (e.g. after a failed health check)."""
+    with _handle_lock:
+        _handle["index"] = None
+        _handle["health"] = None
+
+@traced("pinecone.health_check")
+def pinecone_health(force=False):
+    """
+    {ok, latency_ms, vectors, dimension, error} for the cached index, checked
+    at most every HEALTH_TTL_S seconds. A failing check drops the handle.
+    """
+    if not force and _handle["health"] and time.time() - _handle["checked_at"] < HEALTH_TTL_S:
+        return _handle["health"]
+    index = get_index()
+    if index is None:
+        return {"ok": False, "latency_ms": None, "vectors": None, "dimension": None, "error": "index unavailable"}
+    t0 = time.perf_counter()
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        
-        # --- AUTO-CREATION LOGIC ---
-        existing_indexes = [i.name for i in pc.list_indexes()]
-        
-        if INDEX_NAME not in existing_indexes:
-            # 1. Detect the ACTUAL dimension your system is producing
-            detected_dim = get_embedding_dimension()
-            
-            st.warning(f"⚠️ Index '{INDEX_NAME}' not found. Creating it with {detected_dim} dimensions (Auto-Detected)...")
-            try:
-                pc.create_index(
-                    name=INDEX_NAME,
-                    dimension=detected_dim, # <--- DYNAMIC DIMENSION
-                    metric="cosine",
-                    spec=ServerlessSpec(
-                        cloud="aws",
-                        region="us-east-1"
-                    )
-                )
-                time.sleep(10) # Wait for initialization
-                st.success(f"✅ Index created successfully with {detected_dim} dimensions!")
-            except Exception as create_err:
-                st.error(f"Failed to create index: {create_err}")
-                return None
-        # ---------------------------
-
-        # Connect
-        return pc.Index(INDEX_NAME)
-            
+        stats = index.describe_index_stats()
+        stats = stats.to_dict() if hasattr(stats, "to_dict") else stats
+        health = {"ok": True, "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                  "vectors": stats.get("total_vector_count"), "dimension": stats.get("dimension"), "error": None}
+        if health["dimension"]: _save_index_state(dimension=health["dimension"], exists=True)
     except Exception as e:
-        st.error(f"❌ Pinecone Connection Failed: {str(e)}")
-        return None
+        # The index may have been deleted: look it up again on the next call
+        reset_index_handle()
+        _save_index_state(exists=False)
+        health = {"ok": False, "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                  "vectors": None, "dimension": None, "error": str(e)}
+    _handle["health"], _handle["checked_at"] = health, time.time()
+    return health
+
+def embedding_stats():
+    """Embedding cache hit rate and batch sizes for this process (None without a model)."""
+    return embeddings.stats() if embeddings else None
 
 # --- ALIAS ---
 def get_pinecone_client():
@@ -101,60 +201,241 @@ def get_pinecone_client():
 
 # ... imports remain the same ...
 
-def save_analysis_state(filename, results, doc_len, config=None): # <--- ADDED config param
+@traced("pinecone.save_analysis_state")
+def save_analysis_state(filename, results, doc_len, config=None, username=None, saved_at=None,
+                        content_hash=None): # <--- ADDED config param
     """
-    Saves the Analysis AND the Configuration (Active Agents) to Pinecone.
+    Saves the Analysis AND the Configuration (Active Agents) to the vector
+    store (Pinecone or the local FAISS backend, see utils.vector_store), and
+    to the local archive index that vault searches run against.
+    The record id is archive_key(username, contract content, config), so
+    re-running the same file with the same settings updates one record and
+    adds a version to its history instead of creating a duplicate.
     """
-    index = get_index()
-    if not index or not embeddings: return False
+    if not embeddings: return False
+    index = get_vector_store()
 
     try:
-        scan_id = str(uuid.uuid4())
-        
-        # 1. Serialize Results
-        payload = json.dumps(results)[:35000] # Slightly reduced to make room for config
+        # 1. Store Results (full payload, compressed, outside the vector metadata)
+        payload_ref = blob_store.put_json(results)
         
         # 2. Serialize Config (Tone, Active Agents)
         # If no config provided, save a default one
         if config is None:
-            config = {"tone": "Standard", "agents": ["Legal", "Finance", "Compliance", "Operations"]}
+            config = DEFAULT_SAVE_CONFIG
         config_payload = json.dumps(config)
 
-        # 3. Create Vector
-        vector = embeddings.embed_query(filename)
+        pipeline = results.get("pipeline", {})
+        content_hash = content_hash or _content_hash(pipeline) or payload_ref.split(":", 1)[-1][:24]
+        scan_id = archive_key(username, content_hash, config)
+
+        # 3. Create Vector (filename + summary, so searches match the content too)
+        summary = archive_summary(results)
+        vector = embeddings.embed_documents([f"{filename}\n{summary}"])[0]
+        agents = archive_agents(results)
         
         metadata = {
             "type": "APP_STATE", 
             "filename": filename,
             "doc_len": doc_len,
-            "date": time.strftime("%Y-%m-%d"),
-            "analysis_json": payload,
+            "date": time.strftime("%Y-%m-%d", time.localtime(saved_at)),
+            "username": username or "",
+            "agents": agents,
+            "contract_type": pipeline.get("contract_type", "Other"),
+            "payload_ref": payload_ref,
+            "payload_schema": blob_store.PAYLOAD_SCHEMA,
+            "content_hash": content_hash,
+            "saved_at": saved_at or time.time(),
+            "summary": summary,
             "config_json": config_payload # <--- SAVING THE CONFIG
         }
 
         index.upsert(vectors=[(scan_id, vector, metadata)])
+        # Only a saved record gets a version in its history
+        archive_index.record_version(scan_id, payload_ref, summary, saved_at)
+        _index_locally(scan_id, metadata, results, vector)
         return True
     except Exception as e:
-        st.error(f"Pinecone Save Failed: {e}")
+        st.error(f"Archive Save Failed: {e}")
         return False
 
-# ... search_archives function remains the same ...
+ARCHIVE_SUMMARY_CHARS = 600
 
-def search_archives(query):
-    index = get_index()
-    if not index or not embeddings: return []
+def _content_hash(pipeline):
+    """Hash of the cleaned contract text recorded by run_graph (older runs: the Oracle index id, the same hash)."""
+    return pipeline.get("content_hash") or (pipeline.get("oracle_index") or {}).get("contract_id")
+
+def archive_key(username, content_hash, config):
+    """Stable record id for one user's analysis of one contract with one run config."""
+    config = config or {}
+    run_config = {"tone": config.get("tone"), "agents": sorted(str(a).lower() for a in config.get("agents") or [])}
+    key = json.dumps([username or "", content_hash, run_config], sort_keys=True)
+    return "arc_" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+def archive_agents(results):
+    return [name for name in ("legal", "finance", "compliance", "operations")
+            if results.get(name, {}).get("status") == "success"]
+
+def archive_summary(results):
+    """Short text kept in vector metadata: the agents that ran and the synthesis opening."""
+    agents = archive_agents(results)
+    synthesis = str(results.get("synthesis", {}).get("summary", ""))
+    return f"Agents: {', '.join(agents)}. {' '.join(synthesis.split())}"[:ARCHIVE_SUMMARY_CHARS]
+
+ARCHIVE_PAGE_SIZE = 9
+# Pinecone caps top_k at 1000 when metadata is returned; scans beyond that need several passes
+ARCHIVE_SCAN_LIMIT = 1000
+# A vault search waits this long for its query embedding, then ranks by keywords only
+VAULT_EMBED_TIMEOUT_S = float(os.getenv("clauseai_vault_embed_timeout", "1.5"))
+_archive_sync_lock = threading.Lock()
+_query_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vault-embed")
+_page_vectors = OrderedDict()  # (query, filters) -> query vector used for its first page
+_page_lock = threading.Lock()
+# Config recorded for saves that pass none; archives without one load with DEFAULT_CONFIG
+DEFAULT_SAVE_CONFIG = {"tone": "Standard", "agents": ["Legal", "Finance", "Compliance", "Operations"]}
+DEFAULT_CONFIG = {"tone": "Restored", "agents": ["Legal", "Finance", "Compliance", "Operations"]}
+
+def _index_locally(archive_id, metadata, results, vector):
+    """Adds a saved archive to the local keyword + vector index; never fails the save."""
+    try:
+        body = "\n\n".join(str(data.get("summary", "")) for name, data in results.items()
+                            if isinstance(data, dict) and data.get("status") == "success")
+        clauses = entry_text(results.get("pipeline", {}).get("oracle_index", {}).get("contract_id"))
+        archive_index.index_archive(archive_id, metadata["username"] or None, metadata["filename"], metadata["date"],
+                                    metadata["doc_len"], metadata["summary"], metadata["agents"],
+                                    metadata["contract_type"], body, clauses, vector)
+    except Exception as e:
+        print(f"⚠️ Archive not added to the local search index: {e}")
+
+def _scan_archives():
+    """Metadata of up to ARCHIVE_SCAN_LIMIT archive records in the vector store."""
+    probe = embeddings.embed_query("contract analysis")
+    return get_vector_store().query(vector=probe, top_k=ARCHIVE_SCAN_LIMIT, include_metadata=True,
+                                    filter={"type": "APP_STATE"})["matches"]
+
+def sync_archive_index():
+    """
+    Adds archives this machine's index lacks (archived before the index
+    existed, or by a worker on another machine) from the vector store.
+    Never removes rows: a scan can miss records, and archives only leave
+    the index on an explicit delete or compaction. Run by idle workers,
+    after compaction and from the vault's refresh button, never on the
+    search path. Returns the number of archives added.
+    """
+    if not embeddings: return 0
+    if not _archive_sync_lock.acquire(blocking=False): return 0
+    try:
+        matches = _scan_archives()
+        known = archive_index.archive_ids()
+        missing = [m for m in matches if m["id"] not in known]
+        if missing:
+            print(f"🔄 Adding {len(missing)} archives to the local search index")
+        for match in missing:
+            metadata = dict(match["metadata"] or {})
+            try:
+                results, _ = _archive_payload(metadata)
+            except Exception:
+                results = {}  # payload not reachable from this machine: index the metadata only
+            summary = metadata.get("summary") or archive_summary(results)
+            vector = embeddings.embed_documents([f"{metadata.get('filename', 'Unknown')}\n{summary}"])[0]
+            _index_locally(match["id"], {
+                "username": metadata.get("username", ""),
+                "filename": metadata.get("filename", "Unknown"),
+                "date": metadata.get("date", ""),
+                "doc_len": int(metadata.get("doc_len", 0)),
+                "summary": summary,
+                "agents": metadata.get("agents") or archive_agents(results),
+                "contract_type": metadata.get("contract_type") or results.get("pipeline", {}).get("contract_type", "Other"),
+            }, results, vector)
+        return len(missing)
+    except Exception as e:
+        print(f"⚠️ Archive index sync failed: {e}")
+        return 0
+    finally:
+        _archive_sync_lock.release()
+
+@traced("pinecone.load_archive")
+def load_archive(archive_id, version=None):
+    """
+    (results, config) for one archived record: its latest version, or
+    `version` from its history. Only the selected record's metadata is
+    fetched, and its payload read from the blob store, here.
+    """
+    metadata = get_vector_store().fetch([archive_id]).get(archive_id)
+    if metadata is None: raise KeyError(f"Archive {archive_id} not found")
+    results, config = _archive_payload(metadata)
+    if version is not None:
+        ref = next((v["payload_ref"] for v in archive_index.archive_versions(archive_id) if v["version"] == version), None)
+        if ref is None: raise KeyError(f"Archive {archive_id} has no version {version}")
+        results, _ = _archive_payload({"payload_ref": ref})
+    return results, config
+
+def _archive_payload(metadata):
+    if metadata.get("payload_ref"):
+        try:
+            results = blob_store.get_json(metadata["payload_ref"])
+        except blob_store.BlobNotFound:
+            raise blob_store.BlobNotFound(
+                f"{metadata['payload_ref']} is not in {blob_store.BLOB_DIR}; archives saved on another machine "
+                f"need clauseai_blob_dir on storage every machine shares") from None
+    else:
+        # Records archived before the blob store carry the (truncated) JSON inline
+        results = json.loads(metadata.get("analysis_json") or "{}")
+    config_str = metadata.get("config_json")
+    config = json.loads(config_str) if config_str and config_str != "{}" else dict(DEFAULT_CONFIG)
+    return results, config
+
+def _vault_query_vector(query, filters, offset):
+    """
+    The query embedding for a vault search, or None (keywords only) when it
+    is not back within VAULT_EMBED_TIMEOUT_S; it still lands in the
+    embedding cache for the next search. Later pages reuse the first page's
+    choice so the ranking does not change under the user.
+    """
+    key = (query, json.dumps(filters, sort_keys=True, default=str))
+    with _page_lock:
+        if offset and key in _page_vectors: return _page_vectors[key]
+    vector = None
+    if embeddings:
+        try:
+            vector = _query_pool.submit(embeddings.embed_query, query).result(timeout=VAULT_EMBED_TIMEOUT_S)
+        except FutureTimeout:
+            print("⚠️ Keyword-only vault search: query embedding still pending")
+        except Exception as e:
+            print(f"⚠️ Keyword-only vault search: {e}")
+    with _page_lock:
+        _page_vectors[key] = vector
+        if len(_page_vectors) > 256: _page_vectors.popitem(last=False)
+    return vector
+
+@traced("pinecone.search_archives")
+def search_archives(query, limit=ARCHIVE_PAGE_SIZE, offset=0, filters=None):
+    """
+    Lightweight result cards (id, filename, date, score, doc_len, summary),
+    best first; `offset` pages past the first results. Payloads are not
+    returned: use load_archive(card['id']) for the one the user opens.
+    Searches run on the local hybrid index (utils.archive_index) with
+    `filters` {date_from, date_to, username, agents, contract_types} and
+    make no vector-store calls; only while that index is empty do they fall
+    back to the vector store. The index is filled by sync_archive_index.
+    """
+    if archive_index.archive_count():
+        return archive_index.search(query, _vault_query_vector(query, filters, offset), filters, limit, offset)
+
+    if not embeddings: return []
+    index = get_vector_store()
 
     try:
         query_vec = embeddings.embed_query(query)
         results = index.query(
             vector=query_vec,
-            top_k=10,
+            top_k=offset + limit,
             include_metadata=True,
             filter={"type": "APP_STATE"} 
         )
         
         archives = []
-        for match in results['matches']:
+        for match in results['matches'][offset:offset + limit]:
             md = match['metadata']
             archives.append({
                 "id": match['id'],
@@ -162,10 +443,96 @@ def search_archives(query):
                 "date": md.get('date', 'N/A'),
                 "score": match['score'],
                 "doc_len": int(md.get('doc_len', 0)),
-                "analysis_json": md.get('analysis_json', '{}')
+                "summary": md.get('summary', '')
             })
         return archives
         
     except Exception as e:
-        st.error(f"Pinecone Search Failed: {e}")
-        return []
\ No newline at end of file
+        st.error(f"Archive Search Failed: {e}")
+        return []
+
+
+# --- COMPACTION ---
+STORAGE_AGENTS = ["legal", "finance", "compliance", "operations", "synthesis"]
+
+def _saved_at(metadata):
+    if metadata.get("saved_at"): return float(metadata["saved_at"])
+    try:
+        return time.mktime(time.strptime(metadata.get("date", ""), "%Y-%m-%d"))
+    except ValueError:
+        return 0.0
+
+@traced("pinecone.compact_archives")
+def compact_archives(on_progress=None):
+    """
+    Merges duplicate archives into one record per archive_key: records from
+    before keyed archiving (uuid ids) and repeats of the same user, contract
+    and config. Older payloads become versions of the merged record. Also
+    drops repeated agent vectors stored before they were keyed by archive.
+    """
+    if not embeddings: return {}
+    index = get_vector_store()
+    stats = {"scanned": 0, "merged": 0, "removed": 0, "agent_vectors_removed": 0}
+
+    # 1. Group archives by key (records without a content hash: filename + pages)
+    matches = _scan_archives()
+    groups = {}
+    for match in matches:
+        stats["scanned"] += 1
+        metadata = dict(match["metadata"] or {})
+        try:
+            results, config = _archive_payload(metadata)
+        except Exception as e:
+            print(f"⚠️ Skipping unreadable archive {match['id']}: {e}")
+            continue
+        content_hash = metadata.get("content_hash") or _content_hash(results.get("pipeline", {})) \
+            or f"{metadata.get('filename')}:{metadata.get('doc_len')}"
+        key = archive_key(metadata.get("username"), content_hash, config)
+        groups.setdefault(key, []).append((match["id"], metadata, results, config, content_hash))
+
+    # 2. One history per group (every record's payload plus the versions already kept,
+    #    in time order, deduplicated), then the newest record is saved under the key
+    duplicates = [(key, group) for key, group in groups.items() if len(group) > 1 or group[0][0] != key]
+    for done, (key, group) in enumerate(duplicates):
+        group.sort(key=lambda record: _saved_at(record[1]))
+        versions = [(v["payload_ref"], v["summary"], v["created_at"])
+                    for record_id in {key, *(record[0] for record in group)}
+                    for v in archive_index.archive_versions(record_id)]
+        for _, metadata, results, _, _ in group:
+            ref = metadata.get("payload_ref") or blob_store.put_json(results)
+            versions.append((ref, metadata.get("summary") or archive_summary(results), _saved_at(metadata)))
+        archive_index.replace_versions(key, versions)
+        _, newest, results, config, content_hash = group[-1]
+        saved = save_analysis_state(newest.get("filename", "contract"), results, int(newest.get("doc_len", 0)), config,
+                                    newest.get("username") or None, _saved_at(newest) or None, content_hash)
+        if not saved: continue
+        stale = [record_id for record_id, *_ in group if record_id != key]
+        if stale:
+            index.delete(stale)
+            for record_id in stale: archive_index.remove_archive(record_id)
+        stats["merged"] += 1
+        stats["removed"] += len(stale)
+        if on_progress: on_progress((done + 1) / len(duplicates), "compacting")
+
+    # 3. Agent vectors: the storage node keys them by archive (one per agent and archive_key);
+    #    older rows (no archive_id) are deduplicated per (agent, user, contract), or (agent, summary)
+    try:
+        matches = [match for dim in index.dimensions()
+                   for match in index.query(vector=[0.1] * dim, top_k=ARCHIVE_SCAN_LIMIT, include_metadata=True,
+                                            filter={"agent": {"$in": STORAGE_AGENTS}})["matches"]]
+        def identity(metadata):
+            return (metadata.get("agent"), metadata.get("username", ""), metadata.get("content_hash")
+                    or hashlib.sha256(str(metadata.get("summary", "")).encode("utf-8")).hexdigest())
+        current = [m for m in matches if (m["metadata"] or {}).get("archive_id")]
+        seen, stale = {identity(m["metadata"]) for m in current}, []
+        for match in sorted((m for m in matches if not (m["metadata"] or {}).get("archive_id")), key=lambda m: m["id"]):
+            if identity(match["metadata"] or {}) in seen: stale.append(match["id"])
+            seen.add(identity(match["metadata"] or {}))
+        if stale: index.delete(stale)
+        stats["agent_vectors_removed"] = len(stale)
+    except Exception as e:
+        print(f"⚠️ Agent vectors not compacted: {e}")
+
+    # 4. Archives this machine's search index has not seen yet
+    stats["indexed"] = sync_archive_index()
+    return stats
@@ -0,0 +1,154 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# clauseai_profile = graph   -> profile every run_graph execution
+#                  = console -> profile every Main Console rerun
+#                  = all     -> both
+PROFILE_MODE = os.getenv("clauseai_profile", "").strip().lower()
+PROFILE_DIR = os.getenv("clauseai_profile_dir", "profiles")
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATORS = 25
+
+_session_lock = threading.Lock()
+_active_session = None
+
+
+def profiling_enabled(target):
+    """target is 'graph' or 'console'."""
+    return PROFILE_MODE in (target, "all") or (target == "graph" and PROFILE_MODE in ("1", "true"))
+
+
+# --- 1. SESSION ---
+class ProfileSession:
+    """
+    One profiled run. cProfile only sees the thread that enabled it, so
+    worker threads (LangGraph's parallel agents) register their own
+    profilers through profiled_thread() and everything is merged on save.
+    On Python 3.12+ only one cProfile can be active per process (it sits on
+    sys.monitoring), so there worker threads go unprofiled and are counted
+    in threads_skipped instead.
+    """
+
+    def __init__(self, run_id, label):
+        self.run_id = run_id
+        self.label = label
+        self.folder = os.path.join(PROFILE_DIR, str(run_id))
+        self.profiles = []
+        self.skipped_threads = 0
+        self.lock = threading.Lock()
+        self.started_tracemalloc = False
+        self.owner_thread = threading.get_ident()
+
+    def add(self, profile):
+        with self.lock:
+            self.profiles.append(profile)
+
+    def save(self, wall_seconds):
+        os.makedirs(self.folder, exist_ok=True)
+        base = os.path.join(self.folder, self.label)
+        summary = {"run_id": self.run_id, "label": self.label, "wall_seconds": round(wall_seconds, 3),
+                   "threads_profiled": len(self.profiles), "threads_skipped": self.skipped_threads}
+
+        # 1. MEMORY first, so the stats work below does not show up in the snapshot
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            lines = [f"Current: {current / 1e6:.1f} MB | Peak: {peak / 1e6:.1f} MB", ""]
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATORS]:
+                lines.append(str(stat))
+            with open(base + "_memory.txt", "w", encoding="utf-8") as f: f.write("\n".join(lines))
+            summary.update({"current_mb": round(current / 1e6, 2), "peak_mb": round(peak / 1e6, 2)})
+
+        # 2. CPU: raw stats (open with snakeviz / pstats) + readable top list
+        if self.profiles:
+            stats = pstats.Stats(self.profiles[0])
+            for extra in self.profiles[1:]:
+                stats.add(extra)
+            stats.dump_stats(base + ".prof")
+
+            text = io.StringIO()
+            pstats.Stats(base + ".prof", stream=text).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            with open(base + "_cpu.txt", "w", encoding="utf-8") as f: f.write(text.getvalue())
+
+        with open(base + "_summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return self.folder
+
+
+# --- 2. PUBLIC API ---
+@contextmanager
+def profile_run(run_id, label, enabled=True):
+    """
+    Wraps a block in cProfile + tracemalloc and writes
+    profiles/<run_id>/<label>.prof, _cpu.txt, _memory.txt and _summary.json.
+    Yields the output folder (or None when profiling is off / already busy).
+    """
+    global _active_session
+    with _session_lock:
+        if not enabled or _active_session is not None:
+            session = None
+        else:
+            session = _active_session = ProfileSession(run_id, label)
+
+    if session is None:
+        yield None
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+        session.started_tracemalloc = True
+
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profile.enable()
+    except ValueError as e:  # another profiler (debugger, coverage) owns the process
+        print(f"⚠️ CPU profiling unavailable: {e}")
+        profile = None
+    try:
+        yield session.folder
+    finally:
+        if profile is not None:
+            profile.disable()
+            session.add(profile)
+        try:
+            folder = session.save(time.perf_counter() - start)
+            print(f"🧪 Profile saved to {folder}")
+        except Exception as e:
+            print(f"⚠️ Could not save profile: {e}")
+        finally:
+            if session.started_tracemalloc: tracemalloc.stop()
+            with _session_lock:
+                _active_session = None
+
+@contextmanager
+def profiled_thread():
+    """Adds the current thread to the active profile session, if any."""
+    session = _active_session
+    if session is None or threading.get_ident() == session.owner_thread:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:  # Python 3.12+: the session's profiler is the only one allowed
+        with session.lock: session.skipped_threads += 1
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        session.add(profile)
@@ -0,0 +1,240 @@
+import sqlite3
+import hashlib
+import difflib
+import json
+import os
+import re
+import time
+from utils.helpers import estimate_tokens
+from planner.planner import SINGLE_PASS_MAX_TOKENS
+
+# Clause fingerprints of every analysed contract version, plus the agent
+# reports produced for it, so a later revision only re-reviews what changed.
+REVISIONS_DB = os.getenv("clauseai_revisions_db", "revisions.db")
+INCREMENTAL_ENABLED = os.getenv("clauseai_incremental", "1") != "0"
+
+# A new upload counts as a revision of an earlier version with the same title
+# (see title_key) when it shares MIN_SHARED_CLAUSES of its clauses; a different
+# title needs MIN_SHARED_OTHER_TITLE, since contracts drafted from one template
+# share most of their clauses. Above MAX_CHANGED_SHARE (or more changed text
+# than fits one prompt) a full run is simpler and about as cheap.
+MIN_SHARED_CLAUSES = 0.5
+MIN_SHARED_OTHER_TITLE = 0.9
+MAX_CHANGED_SHARE = 0.5
+MAX_CANDIDATES = 5
+
+# "Section 4.2", "Clause 7", "4.2.1." - renumbering alone is not a change
+LEADING_NUMBER = re.compile(r'^\s*(?:(?:section|clause|article)\s+\S+|\d{1,3}(?:\.\d{1,3})*\.?\)?)\s+', re.I)
+# Filename words that mark a revision rather than a different contract
+VERSION_WORDS = re.compile(r'^(?:v\d+[a-z]?|rev\d*|version|draft|final|redline[sd]?|clean|copy|signed|executed|'
+                           r'updated|amended|new|old|\d+)$')
+
+
+# --- 1. CONNECTION & SCHEMA ---
+def _connect():
+    conn = sqlite3.connect(REVISIONS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_revisions_db():
+    conn = _connect()
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS versions
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT, filename TEXT,
+                  created_at REAL, clause_count INTEGER, summaries TEXT, prompt_versions TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS version_clauses
+                 (version_id INTEGER, position INTEGER, fingerprint TEXT,
+                  number TEXT, heading TEXT, text TEXT, PRIMARY KEY (version_id, position))''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_version_clauses_fp ON version_clauses (fingerprint)''')
+    conn.commit()
+    conn.close()
+
+
+# --- 2. CLAUSES & FINGERPRINTS ---
+def normalize_clause(text):
+    """Lowercase, collapse whitespace and drop the leading clause number."""
+    return " ".join(LEADING_NUMBER.sub("", text.strip(), count=1).lower().split())
+
+def fingerprint_clause(text):
+    return hashlib.sha256(normalize_clause(text).encode("utf-8")).hexdigest()[:20]
+
+def clauses_from_chunks(chunks):
+    """
+    Rebuilds the clause list from ClauseSplitter chunks (metadata['clauses']
+    holds offsets into the document). Returns [] for other chunkers.
+    """
+    clauses = []
+    for chunk in chunks:
+        meta = chunk.metadata
+        if "clauses" not in meta: return []
+        base = meta["start_char"]
+        for c in meta["clauses"]:
+            text = chunk.page_content[c["start"] - base:c["end"] - base]
+            if not text.strip(): continue
+            clauses.append({"id": c["id"], "number": c["number"], "heading": c["heading"],
+                            "page": meta.get("page"), "text": text, "fingerprint": fingerprint_clause(text)})
+    return clauses
+
+
+# --- 3. FINDING THE PREVIOUS VERSION ---
+def title_key(filename):
+    """'Acme MSA v2 (redline).pdf' -> 'acme msa': the filename without extension and version words."""
+    stem = os.path.splitext(os.path.basename(filename or ""))[0].lower()
+    return " ".join(w for w in re.split(r"[^a-z0-9]+", stem) if w and not VERSION_WORDS.match(w))
+
+def candidate_versions(username, filename):
+    """Earlier versions of `username`'s contract with the same title, newest first (for the upload screen)."""
+    key = title_key(filename)
+    if not key: return []
+    conn = _connect()
+    rows = conn.execute("SELECT id, filename, created_at, clause_count FROM versions WHERE username IS ? "
+                        "ORDER BY id DESC LIMIT 500", (username,)).fetchall()
+    conn.close()
+    return [dict(r) for r in rows if title_key(r["filename"]) == key][:MAX_CANDIDATES]
+
+def find_prior_version(clauses, username=None, filename=None, version_id=None):
+    """
+    Returns the stored version sharing the most clause fingerprints with
+    `clauses` (same user only), or None if nothing shares enough: at least
+    MIN_SHARED_CLAUSES with the same title as `filename`, MIN_SHARED_OTHER_TITLE
+    otherwise. `version_id` (a version the user picked) is the only candidate
+    and only needs MIN_SHARED_CLAUSES.
+    """
+    fingerprints = list({c["fingerprint"] for c in clauses})
+    if not fingerprints: return None
+
+    conn = _connect()
+    shared = {}
+    for i in range(0, len(fingerprints), 500):
+        batch = fingerprints[i:i + 500]
+        rows = conn.execute(
+            f"SELECT vc.version_id, COUNT(DISTINCT vc.fingerprint) AS n FROM version_clauses vc "
+            f"JOIN versions v ON v.id = vc.version_id "
+            f"WHERE v.username IS ? AND vc.fingerprint IN ({','.join('?' * len(batch))}) "
+            f"GROUP BY vc.version_id", (username, *batch)).fetchall()
+        for row in rows:
+            shared[row["version_id"]] = shared.get(row["version_id"], 0) + row["n"]
+    if version_id is not None:
+        shared = {v: n for v, n in shared.items() if v == version_id}
+    if not shared:
+        conn.close()
+        return None
+
+    titles = {r["id"]: r["filename"] for r in conn.execute(
+        f"SELECT id, filename FROM versions WHERE id IN ({','.join('?' * len(shared))})", list(shared))}
+    def threshold(v):
+        same_title = version_id is not None or (filename and title_key(titles.get(v)) == title_key(filename))
+        return (MIN_SHARED_CLAUSES if same_title else MIN_SHARED_OTHER_TITLE) * len(fingerprints)
+    eligible = [v for v in shared if shared[v] >= threshold(v)]
+    if not eligible:
+        conn.close()
+        return None
+
+    # Most shared clauses wins; ties go to the newest version
+    version_id = max(eligible, key=lambda v: (shared[v], v))
+    row = conn.execute("SELECT * FROM versions WHERE id=?", (version_id,)).fetchone()
+    clause_rows = conn.execute("SELECT * FROM version_clauses WHERE version_id=? ORDER BY position",
+                               (version_id,)).fetchall()
+    conn.close()
+    version = dict(row)
+    version["summaries"] = json.loads(version["summaries"] or "{}")
+    version["prompt_versions"] = json.loads(version["prompt_versions"] or "{}")
+    version["clauses"] = [dict(r) for r in clause_rows]
+    version["shared"] = round(shared[version_id] / len(fingerprints), 3)
+    return version
+
+
+# --- 4. CLAUSE-LEVEL DIFF ---
+def _label(clause):
+    return f"{clause['number'] or ''} {clause['heading'] or ''}".strip() or clause["text"].strip()[:60]
+
+def diff_clauses(old, new):
+    """
+    Aligns two clause lists by fingerprint. Returns added / removed /
+    modified (old, new pairs) clauses and the count of unchanged ones.
+    """
+    matcher = difflib.SequenceMatcher(None, [c["fingerprint"] for c in old],
+                                      [c["fingerprint"] for c in new], autojunk=False)
+    diff = {"added": [], "removed": [], "modified": [], "unchanged": 0}
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            diff["unchanged"] += i2 - i1
+            continue
+        olds, news = old[i1:i2], new[j1:j2]
+        pairs = min(len(olds), len(news)) if op == "replace" else 0
+        diff["modified"] += list(zip(olds[:pairs], news[:pairs]))
+        diff["removed"] += olds[pairs:]
+        diff["added"] += news[pairs:]
+    return diff
+
+def changed_tokens(diff):
+    return (sum(estimate_tokens(new["text"]) for _, new in diff["modified"])
+            + sum(estimate_tokens(c["text"]) for c in diff["added"]))
+
+def render_changes(diff, with_text=True):
+    """Plain-text change list, used in agent prompts and the reviewer prompt."""
+    lines = []
+    for old, new in diff["modified"]:
+        lines.append(f"[MODIFIED] {_label(new)}")
+        if with_text: lines += [f"BEFORE:\n{old['text'].strip()}", f"AFTER:\n{new['text'].strip()}"]
+    for c in diff["added"]:
+        lines.append(f"[ADDED] {_label(c)}")
+        if with_text: lines.append(c["text"].strip())
+    for c in diff["removed"]:
+        lines.append(f"[REMOVED] {_label(c)}")
+        if with_text: lines.append(c["text"].strip())
+    return "\n".join(lines)
+
+def summarize_diff(diff):
+    """JSON-friendly 'what changed' summary for results['pipeline']."""
+    return {
+        "added": [_label(c) for c in diff["added"]],
+        "removed": [_label(c) for c in diff["removed"]],
+        "modified": [_label(new) for _, new in diff["modified"]],
+        "unchanged": diff["unchanged"],
+    }
+
+def plan_revision(clauses, username, prompt_versions, filename=None, version_id=None):
+    """
+    Decides whether this upload can be analysed incrementally. Returns None
+    for a full run, else {previous, diff, summaries} where `summaries` only
+    holds prior agent reports whose prompt has not changed since.
+    `version_id` is the previous version the user confirmed on upload.
+    """
+    if not INCREMENTAL_ENABLED or not clauses: return None
+    prior = find_prior_version(clauses, username, filename, version_id)
+    if prior is None: return None
+
+    diff = diff_clauses(prior["clauses"], clauses)
+    changed = len(diff["added"]) + len(diff["modified"])
+    if changed > MAX_CHANGED_SHARE * len(clauses) or changed_tokens(diff) > SINGLE_PASS_MAX_TOKENS:
+        return None
+
+    summaries = {agent: text for agent, text in prior["summaries"].items()
+                 if prior["prompt_versions"].get(agent) == prompt_versions.get(agent)}
+    return {
+        "previous": {"id": prior["id"], "filename": prior["filename"], "created_at": prior["created_at"],
+                     "shared": prior["shared"]},
+        "diff": diff,
+        "summaries": summaries,
+    }
+
+
+# --- 5. RECORDING A VERSION ---
+def record_version(username, filename, clauses, results, prompt_versions):
+    """Stores the clause fingerprints and successful agent reports of one run."""
+    if not INCREMENTAL_ENABLED or not clauses: return None
+    summaries = {agent: data["summary"] for agent, data in results.items()
+                 if agent in prompt_versions and data.get("status") == "success"}
+    conn = _connect()
+    cur = conn.execute(
+        "INSERT INTO versions (username, filename, created_at, clause_count, summaries, prompt_versions) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (username, filename, time.time(), len(clauses), json.dumps(summaries), json.dumps(prompt_versions)))
+    version_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO version_clauses (version_id, position, fingerprint, number, heading, text) VALUES (?, ?, ?, ?, ?, ?)",
+        [(version_id, i, c["fingerprint"], c["number"], c["heading"], c["text"]) for i, c in enumerate(clauses)])
+    conn.commit()
+    conn.close()
+    return version_id
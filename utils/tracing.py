@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import threading
+import functools
+import contextvars
+import secrets
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Spans are appended to a local JSONL file, one span per line, using the
+# OpenTelemetry (OTLP/JSON) field names so the file can be shipped to any
+# OTel-compatible backend later without conversion.
+TRACE_FILE = os.getenv("clauseai_trace_file", os.path.join("traces", "spans.jsonl"))
+TRACING_ENABLED = os.getenv("clauseai_tracing", "1") != "0"
+# Past this size the file is rotated to <file>.1 (one old generation is kept)
+TRACE_MAX_BYTES = int(os.getenv("clauseai_trace_max_mb", "50")) * 1024 * 1024
+TAIL_BLOCK_BYTES = 64 * 1024
+SERVICE_NAME = "clauseai"
+
+_current_span = contextvars.ContextVar("clauseai_current_span", default=None)
+_write_lock = threading.Lock()
+
+
+# --- 1. SPAN OBJECT ---
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "STATUS_CODE_OK"
+        self.status_message = ""
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = "STATUS_CODE_ERROR"
+        self.status_message = str(error)[:500]
+
+    def context(self):
+        """Portable handle for continuing this trace in another thread/process."""
+        return {"trace_id": self.trace_id, "span_id": self.span_id}
+
+    def to_otlp(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message},
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        }
+
+def _otlp_value(value):
+    if isinstance(value, bool): return {"boolValue": value}
+    if isinstance(value, int): return {"intValue": str(value)}
+    if isinstance(value, float): return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _write_span(span):
+    line = json.dumps(span.to_otlp())
+    with _write_lock:
+        folder = os.path.dirname(TRACE_FILE)
+        if folder: os.makedirs(folder, exist_ok=True)
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            size = f.tell()
+        if size > TRACE_MAX_BYTES:
+            os.replace(TRACE_FILE, TRACE_FILE + ".1")
+
+
+# --- 2. PUBLIC API ---
+@contextmanager
+def span(name, parent=None, **attributes):
+    """
+    Times a block as a nested span.
+    `parent` is a Span.context() dict, used when the caller runs in a worker
+    thread that did not inherit our context (e.g. LangGraph's parallel nodes).
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    current = _current_span.get()
+    if parent:
+        trace_id, parent_id = parent["trace_id"], parent["span_id"]
+    elif current is not None:
+        trace_id, parent_id = current.trace_id, current.span_id
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+
+    s = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end_ns = time.time_ns()
+        try:
+            _write_span(s)
+        except Exception as e:
+            print(f"⚠️ Trace write failed: {e}")
+
+def traced(name=None):
+    """Decorator form of span()."""
+    def decorator(func):
+        span_name = name or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current_context():
+    s = _current_span.get()
+    return s.context() if s is not None else None
+
+
+# --- 3. READING TRACES BACK (for the viewer) ---
+def _tail_lines(path, max_lines):
+    """The last `max_lines` lines of a file, read backwards from EOF in blocks."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos, data = f.tell(), b""
+        while pos > 0 and data.count(b"\n") <= max_lines:
+            step = min(TAIL_BLOCK_BYTES, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.split(b"\n")
+    if pos > 0: lines = lines[1:]  # the first line was cut by the block boundary
+    return [line.decode("utf-8", "replace") for line in lines if line.strip()][-max_lines:]
+
+def load_recent_traces(limit=10, max_spans=20000):
+    """
+    Returns the last `limit` traces as a list of
+    {"trace_id", "root", "start_ns", "duration_ms", "spans": [...]}, newest first.
+    Only the last `max_spans` lines are read, seeking back from the end of
+    the file, so a render costs the same however large the log has grown.
+    """
+    if not os.path.exists(TRACE_FILE): return []
+
+    tail = _tail_lines(TRACE_FILE, max_spans)
+
+    traces = OrderedDict()
+    for line in tail:
+        try:
+            raw = json.loads(line)
+        except ValueError:
+            continue
+        sp = {
+            "trace_id": raw["traceId"],
+            "span_id": raw["spanId"],
+            "parent_id": raw.get("parentSpanId") or None,
+            "name": raw["name"],
+            "start_ns": int(raw["startTimeUnixNano"]),
+            "end_ns": int(raw["endTimeUnixNano"]),
+            "error": raw.get("status", {}).get("code") == "STATUS_CODE_ERROR",
+            "status_message": raw.get("status", {}).get("message", ""),
+            "attributes": {a["key"]: list(a["value"].values())[0] for a in raw.get("attributes", [])},
+        }
+        traces.setdefault(sp["trace_id"], []).append(sp)
+
+    out = []
+    for trace_id, spans in traces.items():
+        spans.sort(key=lambda s: s["start_ns"])
+        roots = [s for s in spans if s["parent_id"] is None]
+        root = roots[0] if roots else spans[0]
+        start = min(s["start_ns"] for s in spans)
+        end = max(s["end_ns"] for s in spans)
+        out.append({
+            "trace_id": trace_id,
+            "root": root["name"],
+            "start_ns": start,
+            "duration_ms": (end - start) / 1e6,
+            "spans": spans,
+        })
+
+    out.sort(key=lambda t: t["start_ns"], reverse=True)
+    return out[:limit]
@@ -1,10 +1,12 @@
 import os
+import threading
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from langchain_huggingface import HuggingFaceEndpoint
 from langchain_community.chat_models import ChatOllama
+from utils.tracing import span
 
 load_dotenv()
 
@@ -14,8 +16,9 @@ class BulletproofLLM:
         # ---------------------------------------------------------
         self.groq = {
             "name": "Groq (Llama 3.1)",
+            "model": "llama-3.3-70b-versatile",
             "builder": lambda: ChatGroq(
-                model="llama-3.3-70b-versatile",
+                model=self.groq["model"],
                 api_key=os.getenv("groq_api_key"),
                 temperature=0.3
             )
@@ -25,8 +28,9 @@ class BulletproofLLM:
         # ---------------------------------------------------------
         self.google = {
             "name": "Google (Gemini 3 Flash)",
+            "model": "gemini-3-flash-preview",
             "builder": lambda: ChatGoogleGenerativeAI(
-                model="gemini-3-flash-preview", 
+                model=self.google["model"],
                 google_api_key=os.getenv("gemini_api_key"),
                 temperature=0.3
             )
@@ -36,8 +40,9 @@ class BulletproofLLM:
         # ---------------------------------------------------------
         self.openrouter = {
             "name": "OpenRouter (DeepSeek)",
+            "model": "tngtech/deepseek-r1t2-chimera:free",
             "builder": lambda: ChatOpenAI(
-                model="tngtech/deepseek-r1t2-chimera:free",
+                model=self.openrouter["model"],
                 api_key=os.getenv("openrouter_api_key"),
                 base_url="https://openrouter.ai/api/v1",
                 temperature=0.3
@@ -48,8 +53,9 @@ class BulletproofLLM:
         # ---------------------------------------------------------
         self.hf = {
             "name": "Hugging Face (Zephyr 7B)",
+            "model": "HuggingFaceH4/zephyr-7b-beta",
             "builder": lambda: HuggingFaceEndpoint(
-                repo_id="HuggingFaceH4/zephyr-7b-beta", 
+                repo_id=self.hf["model"],
                 huggingfacehub_api_token=os.getenv("hugging_face_api_key"),
                 temperature=0.1
             )
@@ -59,38 +65,68 @@ class BulletproofLLM:
         # ---------------------------------------------------------
         self.ollama = {
             "name": "Local Laptop (Ollama Llama3.2)",
+            "model": "llama3.2",
             "builder": lambda: ChatOllama(
-                model="llama3.2",
+                model=self.ollama["model"],
                 temperature=0.3
             )
         }
 
         # The Order of Battle: Groq -> Google -> OpenRouter -> HF -> Ollama
         self.providers = [self.groq, self.google, self.openrouter, self.hf, self.ollama]
+        # Which provider answered the last call, per thread (agents call from worker threads)
+        self._local = threading.local()
 
     def invoke(self, prompt):
         errors = []
-        for provider in self.providers:
-            try:
-                # 1. Build the model (Lazy Load)
-                llm = provider["builder"]()
-                
-                # 2. Try to run it
-                print(f"🔄 Trying {provider['name']}...")
-                response = llm.invoke(prompt)
-                
-                # 3. Success!
-                print(f"✅ Success with {provider['name']}")
-                return response
-                
-            except Exception as e:
-                # Log error but KEEP GOING to the next provider
-                print(f"⚠️ Failed {provider['name']}: {str(e)}")
-                errors.append(f"{provider['name']}: {str(e)}")
-                continue
+        with span("llm.invoke", prompt_chars=len(str(prompt))) as call_span:
+            for attempt, provider in enumerate(self.providers, start=1):
+                with span("llm.attempt", provider=provider["name"], attempt=attempt) as attempt_span:
+                    try:
+                        # 1. Build the model (Lazy Load)
+                        llm = provider["builder"]()
+                        
+                        # 2. Try to run it
+                        print(f"🔄 Trying {provider['name']}...")
+                        response = llm.invoke(prompt)
+                        
+                        # 3. Success!
+                        print(f"✅ Success with {provider['name']}")
+                        if call_span: call_span.set_attribute("provider", provider["name"])
+                        self._local.provider = provider["name"]
+                        self._local.model = self.model_key(provider)
+                        return response
+                        
+                    except Exception as e:
+                        # Log error but KEEP GOING to the next provider
+                        print(f"⚠️ Failed {provider['name']}: {str(e)}")
+                        if attempt_span: attempt_span.set_error(e)
+                        errors.append(f"{provider['name']}: {str(e)}")
+                        continue
         
         # If we get here, literally everything failed (even your laptop).
+        self._local.provider = None
+        self._local.model = None
         raise Exception(f"💀 All 5 AI Models Failed. Errors: {errors}")
 
+    def last_provider(self):
+        """Name of the provider that answered this thread's last successful call."""
+        return getattr(self._local, "provider", None)
+
+    def primary_provider(self):
+        return self.providers[0]["name"] if self.providers else None
+
+    @staticmethod
+    def model_key(provider):
+        """'<provider name>|<model id>': cached answers are keyed on both, so a model swap invalidates them."""
+        return f"{provider['name']}|{provider.get('model', '')}"
+
+    def primary_model(self):
+        return self.model_key(self.providers[0]) if self.providers else None
+
+    def last_model(self):
+        """model_key of the provider that answered this thread's last successful call."""
+        return getattr(self._local, "model", None)
+
 # Export the singleton instance
 universal_llm = BulletproofLLM()
\ No newline at end of file
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from config import VECTOR_BACKEND
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# Vector storage behind one Pinecone-shaped interface:
+#   upsert(vectors), query(vector, top_k, include_metadata, filter), fetch(ids), delete(ids)
+# "pinecone" is the hosted index; "faiss" keeps everything on this machine
+# (one index file per dimension, metadata in SQLite) and works offline.
+FAISS_DIR = os.getenv("clauseai_faiss_dir", os.path.join("data", "vector_store"))
+# Filtered queries over-fetch this many candidates per requested match
+FILTER_OVERFETCH = 20
+# Index files are rewritten at most this often; upserts in between only change
+# the in-memory index (0 = write on every upsert)
+FAISS_SAVE_DELAY_S = float(os.getenv("clauseai_faiss_save_delay", "1.0"))
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# --- 1. FILTERS (Pinecone metadata-filter subset) ---
+def _compare(value, condition):
+    if not isinstance(condition, dict):
+        return value == condition
+    ops = {
+        "$eq": lambda v, c: v == c, "$ne": lambda v, c: v != c,
+        "$in": lambda v, c: v in c, "$nin": lambda v, c: v not in c,
+        "$gt": lambda v, c: v is not None and v > c, "$gte": lambda v, c: v is not None and v >= c,
+        "$lt": lambda v, c: v is not None and v < c, "$lte": lambda v, c: v is not None and v <= c,
+    }
+    return all(ops[op](value, c) for op, c in condition.items())
+
+def matches_filter(metadata, flt):
+    if not flt: return True
+    return all(_compare(metadata.get(key), condition) for key, condition in flt.items())
+
+
+# --- 2. PINECONE BACKEND ---
+class PineconeStore:
+    """Thin pass-through to the hosted index (utils.pinecone_client.get_index)."""
+    backend = "pinecone"
+
+    def _index(self):
+        from utils.pinecone_client import get_index
+        index = get_index()
+        if index is None: raise RuntimeError("Pinecone index unavailable")
+        return index
+
+    def upsert(self, vectors):
+        return self._index().upsert(vectors=vectors)
+
+    def query(self, vector, top_k=10, include_metadata=True, filter=None):
+        return self._index().query(vector=vector, top_k=top_k, include_metadata=include_metadata, filter=filter)
+
+    def fetch(self, ids):
+        """{id: metadata} for the ids that exist."""
+        response = self._index().fetch(ids=list(ids))
+        vectors = response.get("vectors", {}) if isinstance(response, dict) else response.vectors
+        return {vid: (v.get("metadata") if isinstance(v, dict) else v.metadata) or {} for vid, v in vectors.items()}
+
+    def delete(self, ids):
+        return self._index().delete(ids=list(ids))
+
+    def dimensions(self):
+        """Vector sizes the store holds (a Pinecone index has exactly one)."""
+        from utils.pinecone_client import pinecone_health, get_embedding_dimension
+        return [pinecone_health().get("dimension") or get_embedding_dimension()]
+
+
+# --- 3. FAISS BACKEND ---
+class FaissStore:
+    """
+    Local store: an IndexIDMap2(IndexFlatIP) per vector dimension over
+    L2-normalised vectors (so scores are cosine, like the Pinecone index),
+    loaded memory-mapped. SQLite maps the string ids to FAISS ids and holds
+    the metadata.
+
+    Upserts and deletes are applied in memory and queued; FAISS_SAVE_DELAY_S
+    later the queue is flushed, so a burst of upserts costs one write
+    (pending writes are also flushed at exit). Several processes (the worker
+    fleet) may share one directory: a flush takes an exclusive file lock,
+    re-reads the index if another process rewrote it, replays this process's
+    queued changes on top and only then replaces the file, so no writer
+    overwrites another's vectors. Readers pick up a rewritten index on their
+    next query, with their own queued changes replayed onto it.
+    """
+    backend = "faiss"
+
+    def __init__(self, directory=FAISS_DIR):
+        import faiss
+        import numpy as np
+        self.faiss, self.np = faiss, np
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, "vectors.db")
+        self.lock_path = os.path.join(directory, "faiss.lock")
+        self.lock = threading.RLock()
+        self.indexes = {}  # dim -> (index, file version it was read from)
+        self.pending = {}  # dim -> [("upsert", ids, matrix) | ("delete", ids, None)] not yet on disk
+        self.flush_timer = None
+        atexit.register(self.flush)
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS vectors
+                        (faiss_id INTEGER PRIMARY KEY AUTOINCREMENT, vector_id TEXT UNIQUE,
+                         dim INTEGER, metadata TEXT, updated_at REAL)''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _path(self, dim):
+        return os.path.join(self.directory, f"faiss_{dim}.index")
+
+    def _file_version(self, dim):
+        """Identity of the index file on disk (a rewrite is a new inode), or None."""
+        try:
+            st = os.stat(self._path(dim))
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process using this directory."""
+        with open(self.lock_path, "a") as f:
+            if fcntl: fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl: fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _apply(self, index, op, ids, matrix):
+        index.remove_ids(ids)
+        if op == "upsert": index.add_with_ids(matrix, ids)
+
+    def _index(self, dim):
+        """The index for `dim`: the file's latest contents plus this process's queued changes."""
+        version = self._file_version(dim)
+        cached = self.indexes.get(dim)
+        if cached and cached[1] == version: return cached[0]
+        if version is None:
+            index = self.faiss.IndexIDMap2(self.faiss.IndexFlatIP(dim))
+        else:
+            try:
+                index = self.faiss.read_index(self._path(dim), self.faiss.IO_FLAG_MMAP)
+            except Exception:
+                index = self.faiss.read_index(self._path(dim))
+        for op, ids, matrix in self.pending.get(dim, []):
+            self._apply(index, op, ids, matrix)
+        self.indexes[dim] = (index, version)
+        return index
+
+    def _save(self, dim, index):
+        """Atomically replaces `dim`'s index file (caller holds the file lock)."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f"faiss_{dim}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            self.faiss.write_index(index, tmp)
+            os.replace(tmp, self._path(dim))
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+        self.indexes[dim] = (index, self._file_version(dim))
+
+    def _queue(self, dim, op, ids, matrix=None):
+        """Applies a change in memory and schedules its write (immediately when FAISS_SAVE_DELAY_S is 0)."""
+        self._apply(self._index(dim), op, ids, matrix)
+        self.pending.setdefault(dim, []).append((op, ids, matrix))
+        if FAISS_SAVE_DELAY_S <= 0:
+            self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = threading.Timer(FAISS_SAVE_DELAY_S, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def flush(self):
+        """Merges the queued changes into the on-disk indexes."""
+        with self.lock:
+            self.flush_timer = None
+            if not self.pending: return
+            with self._file_lock():
+                for dim in sorted(self.pending):
+                    index = self._index(dim)  # re-read under the lock if another process saved meanwhile
+                    self._save(dim, index)
+                    del self.pending[dim]
+
+    def _matrix(self, rows):
+        matrix = self.np.asarray(rows, dtype="float32")
+        self.faiss.normalize_L2(matrix)
+        return matrix
+
+    @staticmethod
+    def _unpack(vector):
+        if isinstance(vector, dict):
+            return vector["id"], vector["values"], vector.get("metadata") or {}
+        vector_id, values, *rest = vector
+        return vector_id, values, (rest[0] if rest else {}) or {}
+
+    def upsert(self, vectors):
+        by_dim = {}
+        for vector in vectors:
+            vector_id, values, metadata = self._unpack(vector)
+            by_dim.setdefault(len(values), []).append((vector_id, values, metadata))
+
+        with self.lock:
+            conn = self._connect()
+            try:
+                for dim, items in by_dim.items():
+                    ids = []
+                    for vector_id, _, metadata in items:
+                        conn.execute("INSERT INTO vectors (vector_id, dim, metadata, updated_at) VALUES (?, ?, ?, ?) "
+                                     "ON CONFLICT(vector_id) DO UPDATE SET dim=excluded.dim, "
+                                     "metadata=excluded.metadata, updated_at=excluded.updated_at",
+                                     (vector_id, dim, json.dumps(metadata), time.time()))
+                        ids.append(conn.execute("SELECT faiss_id FROM vectors WHERE vector_id=?",
+                                                (vector_id,)).fetchone()[0])
+                    self._queue(dim, "upsert", self.np.asarray(ids, dtype="int64"),
+                                self._matrix([values for _, values, _ in items]))
+                conn.commit()
+            finally:
+                conn.close()
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k=10, include_metadata=True, filter=None):
+        dim = len(vector)
+        with self.lock:
+            index = self._index(dim)
+            if index.ntotal == 0: return {"matches": []}
+            k = min(index.ntotal, top_k * FILTER_OVERFETCH if filter else top_k)
+            scores, ids = index.search(self._matrix([vector]), k)
+
+        hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1]
+        if not hits: return {"matches": []}
+        conn = self._connect()
+        rows = conn.execute(f"SELECT faiss_id, vector_id, metadata FROM vectors WHERE faiss_id IN "
+                            f"({','.join('?' * len(hits))})", [i for i, _ in hits]).fetchall()
+        conn.close()
+        by_id = {row["faiss_id"]: row for row in rows}
+
+        matches = []
+        for faiss_id, score in hits:
+            row = by_id.get(faiss_id)
+            if row is None: continue
+            metadata = json.loads(row["metadata"] or "{}")
+            if not matches_filter(metadata, filter): continue
+            match = {"id": row["vector_id"], "score": score}
+            if include_metadata: match["metadata"] = metadata
+            matches.append(match)
+            if len(matches) >= top_k: break
+        return {"matches": matches}
+
+    def dimensions(self):
+        """Vector sizes the store holds (one FAISS index each)."""
+        conn = self._connect()
+        dims = [row[0] for row in conn.execute("SELECT DISTINCT dim FROM vectors ORDER BY dim")]
+        conn.close()
+        return dims
+
+    def fetch(self, ids):
+        """{id: metadata} for the ids that exist."""
+        ids = list(ids)
+        if not ids: return {}
+        conn = self._connect()
+        rows = conn.execute(f"SELECT vector_id, metadata FROM vectors WHERE vector_id IN ({','.join('?' * len(ids))})",
+                            ids).fetchall()
+        conn.close()
+        return {row["vector_id"]: json.loads(row["metadata"] or "{}") for row in rows}
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids: return
+        with self.lock:
+            conn = self._connect()
+            rows = conn.execute(f"SELECT faiss_id, dim FROM vectors WHERE vector_id IN ({','.join('?' * len(ids))})",
+                                ids).fetchall()
+            for dim in {row["dim"] for row in rows}:
+                self._queue(dim, "delete", self.np.asarray([r["faiss_id"] for r in rows if r["dim"] == dim],
+                                                           dtype="int64"))
+            conn.execute(f"DELETE FROM vectors WHERE vector_id IN ({','.join('?' * len(ids))})", ids)
+            conn.commit()
+            conn.close()
+
+
+# --- 4. SELECTION ---
+def get_vector_store():
+    """Process-wide store for the configured backend (clauseai_vector_backend)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FaissStore() if VECTOR_BACKEND == "faiss" else PineconeStore()
+        return _store
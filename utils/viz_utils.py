@@ -49,4 +49,53 @@ def render_radar_chart(risks):
         height=300
     )
 
-    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
\ No newline at end of file
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+def render_trace_waterfall(trace):
+    """
+    Renders one pipeline trace as a horizontal waterfall (one bar per span).
+    """
+    spans = trace["spans"]
+    t0 = trace["start_ns"]
+
+    # Order spans depth-first so children sit right under their parent
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent_id"], []).append(s)
+    ids = {s["span_id"] for s in spans}
+    ordered = []
+
+    def walk(span, depth):
+        ordered.append((span, depth))
+        for child in sorted(children.get(span["span_id"], []), key=lambda c: c["start_ns"]):
+            walk(child, depth + 1)
+
+    for root in sorted([s for s in spans if s["parent_id"] not in ids], key=lambda s: s["start_ns"]):
+        walk(root, 0)
+
+    labels, starts, durations, colors, hovers = [], [], [], [], []
+    for i, (s, depth) in enumerate(ordered):
+        detail = s["attributes"].get("provider") or s["attributes"].get("file") or ""
+        label = f"{'  ' * depth}{s['name']}" + (f" · {detail}" if detail else "")
+        labels.append(f"{label} #{i}")
+        starts.append((s["start_ns"] - t0) / 1e6)
+        durations.append(max((s["end_ns"] - s["start_ns"]) / 1e6, 0.1))
+        colors.append("#ff3366" if s["error"] else ("#fce38a" if s["name"].startswith("llm") else "#00f2ff"))
+        hovers.append(f"{s['name']}<br>{durations[-1]:.1f} ms" + (f"<br>{s['status_message']}" if s["error"] else ""))
+
+    fig = go.Figure(go.Bar(
+        y=labels, x=durations, base=starts, orientation='h',
+        marker=dict(color=colors), hovertext=hovers, hoverinfo="text"
+    ))
+    fig.update_layout(
+        yaxis=dict(autorange="reversed", tickfont=dict(size=11, color='#e2e8f0'),
+                   tickvals=labels, ticktext=[l.rsplit(" #", 1)[0] for l in labels]),
+        xaxis=dict(title="ms since start", color='#94a3b8', gridcolor='rgba(255,255,255,0.1)'),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        showlegend=False,
+        margin=dict(l=10, r=10, t=10, b=30),
+        height=max(200, 28 * len(labels) + 60)
+    )
+
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
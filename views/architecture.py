@@ -1,4 +1,7 @@
+import time
 import streamlit as st
+from utils.tracing import load_recent_traces
+from utils.viz_utils import render_trace_waterfall
 
 def show():
     st.title("System Blueprint")
@@ -15,4 +18,24 @@ def show():
             <div style="background: linear-gradient(135deg, #fce38a, #f38181); padding:5px 15px; border-radius:15px; color:black; font-weight:bold;">Synthesis</div>
         </div>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+    # --- LIVE TRACES ---
+    st.markdown("### ⏱️ Pipeline Traces")
+    st.caption("Per-node timing for recent audits (parsing, planner, agents, provider fallbacks, reviewer, Pinecone).")
+
+    n_runs = st.slider("Runs to show", min_value=1, max_value=20, value=5)
+    traces = [t for t in load_recent_traces(limit=200) if t["root"] == "run_graph"][:n_runs]
+
+    if not traces:
+        st.info("No traces yet. Run an audit from the Main Console to record one.")
+        return
+
+    for trace in traces:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(trace["start_ns"] / 1e9))
+        root = next((s for s in trace["spans"] if s["name"] == "run_graph"), trace["spans"][0])
+        errors = sum(1 for s in trace["spans"] if s["error"])
+        title = f"{root['attributes'].get('file', 'contract')} • {started} • {trace['duration_ms'] / 1000:.2f}s"
+        if errors: title += f" • ⚠️ {errors} failed span(s)"
+        with st.expander(title, expanded=(trace is traces[0])):
+            render_trace_waterfall(trace)
@@ -2,11 +2,98 @@ import streamlit as st
 import os
 import time
 from streamlit_extras.metric_cards import style_metric_cards
-from utils.docsloader import load_document, chunk_contract
-from graph.doc_graph import run_graph
 from utils.helpers import clean_raw_output
-from utils.pinecone_client import save_analysis_state
 from utils.export_utils import generate_pdf
+from utils import jobs, revisions
+from utils.chat_memory import new_chat_state
+from config import ADMIN_USERS
+
+POLL_SECONDS = 2
+
+def render_job_status():
+    """
+    Shows progress for the queued analysis and loads its results once done.
+    The job id lives in the URL too, so a page refresh picks it back up.
+    """
+    job_id = st.session_state.get('active_job') or st.query_params.get("job")
+    if not job_id: return
+
+    job = jobs.get_job(job_id)
+    if job is None:
+        st.session_state.pop('active_job', None)
+        st.query_params.pop("job", None)
+        return
+    st.session_state['active_job'] = job_id
+
+    # A. Finished: move results into the session
+    if job['status'] == "succeeded":
+        if st.session_state.get('loaded_job') != job_id:
+            out = job['result']
+            st.session_state['report_config'] = job['payload'].get('config', {})
+            st.session_state['results'] = out['results']
+            st.session_state['doc_len'] = out['doc_len']
+            st.session_state['filename'] = out['filename'] # Save filename for caching
+            st.session_state['loaded_job'] = job_id
+
+            # Clear old translation cache on new run
+            if 'translation_cache' in st.session_state:
+                del st.session_state['translation_cache']
+            # The Oracle's memory belongs to the previous contract
+            st.session_state['chat_memory'] = new_chat_state()
+
+            if out.get('archived'):
+                st.toast("Analysis archived to Neural Vault!", icon="💾")
+            if job['payload'].get('profile'):
+                st.toast(f"Profile saved under profiles/{job_id}/", icon="🧪")
+        st.session_state.pop('active_job', None)
+        return
+
+    # B. Terminal failure states
+    if job['status'] in ("failed", "cancelled"):
+        with st.container(border=True):
+            if job['status'] == "failed":
+                st.error(f"⚠️ Analysis failed after {job['attempts']} attempt(s): {job['error']}")
+            else:
+                st.warning("🛑 Analysis cancelled.")
+            b1, b2 = st.columns(2)
+            if b1.button("🔁 Retry", key="job_retry", use_container_width=True):
+                jobs.retry_job(job_id)
+                st.rerun()
+            if b2.button("✖ Dismiss", key="job_dismiss", use_container_width=True):
+                st.session_state.pop('active_job', None)
+                st.query_params.pop("job", None)
+                st.rerun()
+        return
+
+    # C. Still queued / running
+    with st.container(border=True):
+        label = "⏳ Waiting for a free worker..." if job['status'] == "queued" else f"⚡ Synchronizing Quantum Agents: {job['stage']}"
+        st.progress(float(job['progress'] or 0), text=label)
+        if job['status'] == "queued" and job['error']:
+            st.caption(f"Retrying after error: {job['error']}")
+        if not jobs.active_workers():
+            st.warning("No analysis worker is online. Start one with `python worker.py`.")
+
+        if job['cancel_requested']:
+            st.caption("Cancelling...")
+        elif st.button("🛑 Cancel Analysis", key="job_cancel"):
+            jobs.cancel_job(job_id)
+
+    time.sleep(POLL_SECONDS)
+    st.rerun()
+
+# Buttons whose reruns do real work (the rest are job-status polls and widget tweaks)
+WORK_BUTTONS = ("activate_grid", "translate_report", "generate_files")
+
+def _upload_id(upload):
+    return getattr(upload, "file_id", None) or f"{upload.name}:{upload.size}"
+
+def rerun_does_work():
+    """True when this rerun processes a new upload or runs an analysis, translation or export."""
+    upload = st.session_state.get('contract_upload')
+    if upload is not None and _upload_id(upload) != st.session_state.get('last_upload_id'):
+        return True
+    return any(st.session_state.get(key) for key in WORK_BUTTONS)
 
 def show():
     # --- HEADER ---
@@ -15,6 +102,7 @@ def show():
     
     # --- 1. CONFIGURATION PANEL ---
     show_settings = st.checkbox("⚙️ Show Report Customization & Focus", value=False)
+    profile_run_flag = False
     
     if show_settings:
         st.markdown("""
@@ -42,51 +130,85 @@ def show():
                     default=["Legal", "Finance", "Compliance", "Operations"]
                 )
             # REMOVED Language selector from here. It is now dynamic below.
+
+            # ADMIN ONLY: capture cProfile/tracemalloc stats under profiles/<run id>/
+            if st.session_state.get('username') in ADMIN_USERS:
+                p1, p2 = st.columns(2)
+                with p1:
+                    profile_run_flag = st.checkbox("🧪 Profile the next analysis", value=False)
+                with p2:
+                    st.checkbox("🧪 Profile console reruns", key="profile_console")
     else:
         report_tone = "Standard Professional"
         active_agents = ["Legal", "Finance", "Compliance", "Operations"]
             
     # --- 2. FILE UPLOAD ---
-    uploaded_file = st.file_uploader("Drop Legal Contract (PDF/DOCX)", type=["pdf", "docx", "txt"])
+    uploaded_file = st.file_uploader("Drop Legal Contract (PDF/DOCX)", type=["pdf", "docx", "txt"], key="contract_upload")
     
     if uploaded_file:
+        st.session_state['last_upload_id'] = _upload_id(uploaded_file)
         os.makedirs("data", exist_ok=True)
         file_path = os.path.join("data", uploaded_file.name)
         with open(file_path, "wb") as f: f.write(uploaded_file.getbuffer())
 
-        # PYPDF CHECK
-        from utils.pdf_inspector import inspect_pdf_metadata
-        pdf_meta = inspect_pdf_metadata(file_path)
-        if "error" in pdf_meta:
-            st.error(f"⚠️ {pdf_meta['error']}")
+        # PRE-FLIGHT SCAN (cached per upload + agent selection; the console reruns often)
+        from utils.pdf_inspector import preflight_scan
+        scan_key = (uploaded_file.name, uploaded_file.size, tuple(active_agents))
+        if st.session_state.get('preflight_key') != scan_key:
+            st.session_state['preflight'] = preflight_scan(file_path, [a.lower() for a in active_agents])
+            st.session_state['preflight_key'] = scan_key
+        preflight = st.session_state['preflight']
+
+        blocked = False
+        if "error" in preflight:
+            st.error(f"⚠️ {preflight['error']}")
         else:
-            st.caption(f"✅ Verified: {pdf_meta['pages']} Pages | Author: {pdf_meta['author']}")
+            st.caption(f"✅ Verified: {preflight['pages']} Pages | Author: {preflight['author']} | "
+                       f"Language: {preflight['language']} | Strategy: {preflight['strategy'].replace('_', ' ')}")
+            f1, f2, f3, f4 = st.columns(4)
+            f1.metric("Est. Tokens", f"{preflight['estimated_tokens']:,}")
+            f2.metric("LLM Calls", preflight['llm_calls'])
+            f3.metric("Est. Time", f"{preflight['latency_s']:.0f}s")
+            f4.metric("Est. Cost", f"${preflight['cost_usd']:.3f}")
+            with st.expander(f"📄 Text density ({preflight['sampled_pages']} pages scanned)"):
+                st.bar_chart({"Characters": [p['chars'] for p in preflight['density']]})
+            for warning in preflight['warnings']:
+                st.warning(f"⚠️ {warning}")
+            blocked = preflight['strategy'] == "blocked"
+            if blocked:
+                st.error("⛔ This contract is too large to analyze in one job. Split it and upload the parts.")
+
+        # REVISION CHECK: earlier uploads with the same title; the user confirms which one (if any) to diff against
+        revision_of = None
+        candidates = revisions.candidate_versions(st.session_state.get('username'), uploaded_file.name) \
+            if revisions.INCREMENTAL_ENABLED else []
+        if candidates:
+            options = [c['id'] for c in candidates] + [None]
+            labels = {c['id']: f"'{c['filename']}' ({time.strftime('%Y-%m-%d %H:%M', time.localtime(c['created_at']))}, "
+                               f"{c['clause_count']} clauses)" for c in candidates}
+            revision_of = st.selectbox("🔀 Revision of an earlier upload? Only changed clauses are re-reviewed.", options,
+                                       format_func=lambda v: labels.get(v, "No - run a full analysis"),
+                                       key=f"revision_of_{_upload_id(uploaded_file)}")
 
         col1, col2 = st.columns([1, 4])
         with col1:
-            if st.button("▶ ACTIVATE GRID", type="primary", use_container_width=True):
-                with st.spinner(f"⚡ Synchronizing Quantum Agents ({report_tone})..."):
-                    # 1. Run Analysis
-                    results = run_graph(file_path)
-                    docs = load_document(file_path)
-                    chunks = chunk_contract(docs)
-                    
-                    # 2. Persistence
-                    config = {"tone": report_tone, "agents": active_agents}
-                    
-                    st.session_state['report_config'] = config
-                    st.session_state['results'] = results
-                    st.session_state['doc_len'] = len(docs)
-                    st.session_state['filename'] = uploaded_file.name # Save filename for caching
-                    st.session_state['full_text'] = " ".join([c.page_content for c in chunks])
-                    
-                    # Clear old translation cache on new run
-                    if 'translation_cache' in st.session_state:
-                        del st.session_state['translation_cache']
-
-                    # 3. Save to Pinecone
-                    save_analysis_state(uploaded_file.name, results, len(docs), config)
-                    st.toast("Analysis archived to Neural Vault!", icon="💾")
+            if st.button("▶ ACTIVATE GRID", key="activate_grid", type="primary", use_container_width=True, disabled=blocked):
+                # 1. Queue the analysis (a worker process runs run_graph)
+                config = {"tone": report_tone, "agents": active_agents}
+                job_id = jobs.submit_job(
+                    "analysis",
+                    {"config": config, "filename": uploaded_file.name, "profile": profile_run_flag,
+                     "revision_of": revision_of},
+                    username=st.session_state.get('username'),
+                    file_name=uploaded_file.name,
+                    file_bytes=uploaded_file.getvalue()
+                )
+                st.session_state['active_job'] = job_id
+                st.query_params["job"] = job_id # Survives a browser refresh
+                st.rerun()
+
+    # --- 2B. JOB TRACKING (Polls the queue until the worker is done) ---
+    render_job_status()
 
     # --- 3. RESULTS DISPLAY (Universal) ---
     if st.session_state.get('results'):
@@ -133,7 +255,7 @@ def show():
                 is_translated = True
             else:
                 # Show Translate Button
-                if st.button(f"⚡ Translate to {target_lang}", type="primary", use_container_width=True):
+                if st.button(f"⚡ Translate to {target_lang}", key="translate_report", type="primary", use_container_width=True):
                     with st.spinner("AI Translating..."):
                         try:
                             from utils.translator import translate_report
@@ -156,6 +278,37 @@ def show():
         m4.metric("Status", "Translated" if is_translated else "Original", delta="Ready")
         
         style_metric_cards(background_color="#0a0a1a", border_left_color="#00f2ff", border_radius_px=15)
+
+        revision = results.get("pipeline", {}).get("revision")
+        if revision:
+            with st.expander(f"🔀 What Changed since '{revision['previous']['filename']}' "
+                             f"({len(revision['modified'])} modified, {len(revision['added'])} added, "
+                             f"{len(revision['removed'])} removed, {revision['unchanged']} unchanged)"):
+                for label, items in (("✏️ Modified", revision['modified']), ("➕ Added", revision['added']),
+                                     ("➖ Removed", revision['removed'])):
+                    if items: st.markdown(f"**{label}:** " + ", ".join(items))
+                if revision['previous'].get('shared') is not None:
+                    st.caption(f"Matched previous version: '{revision['previous']['filename']}' "
+                               f"({revision['previous']['shared']:.0%} of clauses unchanged)")
+                if revision['incremental_agents']:
+                    st.caption("Re-reviewed only the changed clauses for: " + ", ".join(revision['incremental_agents']))
+
+        facts = results.get("pipeline", {}).get("facts")
+        if facts:
+            with st.expander(f"📌 Key Facts ({sum(len(v) for v in facts.values())} extracted)"):
+                st.dataframe(
+                    [{"Type": kind.replace("_", " ").title(), "Value": f["value"], "Seen": f["count"],
+                      "Page": f["page"] + 1 if isinstance(f["page"], int) else "", "Clause": f["section"] or "",
+                      "Source": f["snippet"]} for kind, items in facts.items() for f in items],
+                    use_container_width=True, hide_index=True
+                )
+
+        boilerplate = results.get("pipeline", {}).get("boilerplate")
+        if boilerplate and boilerplate["lines_removed"]:
+            with st.expander(f"🧹 Boilerplate stripped: {boilerplate['lines_removed']} lines, "
+                             f"~{boilerplate['tokens_saved']:,} tokens saved ({boilerplate['pct_saved']}%)"):
+                for line in boilerplate["removed_lines"]:
+                    st.caption(f"×{line['count']}  {line['text']}")
         st.write("")
 
         # DOWNLOAD BUTTON
@@ -169,7 +322,7 @@ def show():
                 
             with col_gen2:
                 # TRIGGER BUTTON
-                if st.button("⚙️ Generate Files", type="primary", use_container_width=True):
+                if st.button("⚙️ Generate Files", key="generate_files", type="primary", use_container_width=True):
                     st.session_state['files_generated'] = True
             
             # DOWNLOAD BUTTONS (Conditional Logic)
@@ -1,27 +1,163 @@
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.universal_llm import universal_llm
 from utils.helpers import clean_raw_output
+from utils.fact_extractor import answer_from_facts
+from utils.contract_index import retrieve, render_passages
+from utils import oracle_cache
+from utils.chat_memory import (new_chat_state, remember, render_memory, append_history,
+                               history_page)
+
+AGENT_TABS = {"legal": "⚖️", "finance": "💰", "compliance": "🛡️", "operations": "⚙️"}
+
+SOURCE_CAPTIONS = {
+    "facts": "⚡ Instant answer from the contract's fact index",
+    "cache": "♻️ Answered earlier for this contract (shared cache)",
+}
+
+def build_oracle_prompt(agent_key, context, question, excerpts="", history=""):
+    """Prompt for one Oracle turn (shared with the load-test harness)."""
+    # --- PROMPT ENGINEERED TO FIX THE "DUMP" ISSUE ---
+    return f"""
+    You are the {agent_key.upper()} Expert Agent.
+    
+    CONTEXT (Your Analysis of the Contract):
+    {context}
+    
+    CONTRACT EXCERPTS (the clauses most relevant to the question, with page/section):
+    {excerpts or "None available."}
+    
+    CONVERSATION SO FAR:
+    {history or "This is the first question."}
+    
+    USER QUESTION:
+    {question}
+    
+    INSTRUCTIONS:
+    1. If the user is greeting you (e.g., "hi", "hello"), introduce yourself briefly and mention one key risk from your analysis. DO NOT output the full summary.
+    2. If the user asks a question, answer strictly based on the context and excerpts above, and cite the page/section of any excerpt you rely on.
+    3. If neither the context nor the excerpts cover the question, say so instead of guessing.
+    4. Use the conversation so far only to resolve follow-ups ("what about that clause?").
+    5. Keep it professional and concise.
+    """
+
+def answer_question(agent_key, question, results, memory=None):
+    """
+    One Oracle turn. Returns (answer, source): lookups the fact index can
+    answer come back instantly as 'facts', everything else goes to the LLM
+    with the agent's summary plus the best-matching clauses of the contract.
+    `memory` (see utils.chat_memory) adds the conversation so far. LLM
+    answers are shared through utils.oracle_cache and come back as 'cache'.
+    """
+    pipeline = results.get("pipeline", {})
+    instant = answer_from_facts(question, pipeline.get("facts"))
+    if instant:
+        return instant, "facts"
+
+    # Prepare Context (RAG)
+    raw_summary = results.get(agent_key, {}).get('summary', '')
+    contract_id = pipeline.get("oracle_index", {}).get("contract_id")
+    history = render_memory(memory)
+    cache_key = None
+    if contract_id and oracle_cache.cacheable(question, history):
+        cache_key = (contract_id, agent_key, raw_summary, universal_llm.primary_model(), question)
+        cached = oracle_cache.lookup(*cache_key)
+        if cached:
+            return cached, "cache"
+
+    context = clean_raw_output(raw_summary)
+    passages = retrieve(contract_id, question)
+    full_prompt = build_oracle_prompt(agent_key, context, question, render_passages(passages), history)
+    answer = clean_raw_output(universal_llm.invoke(full_prompt).content)
+    # Fallback-model answers are not shared under the primary model's tier
+    if cache_key and universal_llm.last_model() == cache_key[3]:
+        oracle_cache.store(*cache_key, answer)
+    return answer, "llm"
+
+def panel_agents(results):
+    """Agents the panel asks: those with a report (all of them if none has one)."""
+    return [key for key in AGENT_TABS if results.get(key, {}).get("status") == "success"] or list(AGENT_TABS)
+
+def ask_panel(question, results, memories=None, agents=None):
+    """
+    Fans one question out to `agents` (default: panel_agents), concurrently.
+    Yields (agent_key, answer, source) as each answer arrives; a failed agent
+    yields its error message with source 'error'.
+    """
+    agents = agents or panel_agents(results)
+    memories = memories or {}
+    with ThreadPoolExecutor(max_workers=len(agents), thread_name_prefix="oracle-panel") as pool:
+        futures = {pool.submit(answer_question, key, question, results, memories.get(key)): key for key in agents}
+        for future in as_completed(futures):
+            try:
+                answer, source = future.result()
+            except Exception as e:
+                answer, source = f"Connection Error: {e}", "error"
+            yield futures[future], answer, source
+
+def merge_panel_answers(question, answers):
+    """One consolidated answer from the panel's {agent_key: answer}."""
+    if len(set(answers.values())) == 1:
+        return next(iter(answers.values()))
+    opinions = "\n\n".join(f"{key.upper()} AGENT:\n{answer}" for key, answer in answers.items())
+    prompt = f"""
+    You are the Lead Reviewer. Several expert agents answered the same question about a contract.
+    
+    QUESTION:
+    {question}
+    
+    AGENT ANSWERS:
+    {opinions}
+    
+    INSTRUCTIONS:
+    1. Give one consolidated answer, keeping the page/section citations the agents gave.
+    2. Where agents disagree or add different angles, say which agent said what.
+    3. Keep it concise; do not repeat the same point twice.
+    """
+    return clean_raw_output(universal_llm.invoke(prompt).content)
 
 def show():
     st.title("🔮 The Oracle")
     st.markdown("<p style='color: #94a3b8;'>Chat with your specific AI Agents about the contract.</p>", unsafe_allow_html=True)
+    cache = oracle_cache.cache_stats()
+    if cache["hits"] + cache["semantic_hits"] + cache["misses"]:
+        st.caption(f"♻️ Answer cache: {cache['hit_rate']:.0%} hits • {cache['hits'] + cache['semantic_hits']} hits "
+                   f"({cache['semantic_hits']} paraphrased) • {cache['misses']} misses")
 
     # 1. Safety Check
     if not st.session_state['results']:
         st.info("⚠️ Please analyze a contract in the 'Main Console' first to populate the agents.")
         return
 
-    # 2. Agent Tabs
+    # 2. Ask the Panel: one question to every agent at once
+    with st.form("panel_form", clear_on_submit=True):
+        panel_question = st.text_input("🧑‍⚖️ Ask the Panel", placeholder="One question, answered by every agent...")
+        col_a, col_b = st.columns([3, 1])
+        merge = col_a.checkbox("Merge the answers into one", value=False)
+        panel_submitted = col_b.form_submit_button("ASK ALL", use_container_width=True)
+    merged_placeholder = st.empty()
+
+    # 3. Agent Tabs
     # We create a tab for each specialist
     tabs = st.tabs(["⚖️ Legal Agent", "💰 Finance Agent", "🛡️ Compliance Agent", "⚙️ Ops Agent"])
 
-    # 3. Chat Logic Helper
+    if 'chat_memory' not in st.session_state:
+        st.session_state['chat_memory'] = new_chat_state()
+
+    # 4. Chat Logic Helper
     def render_agent_chat(agent_key, tab_obj, agent_icon):
         with tab_obj:
-            # A. Display History
+            # A. Display History (newest pages only; long chats stay fast to re-render)
+            history = st.session_state['chat_history'][agent_key]
+            pages_key = f"chat_pages_{agent_key}"
+            shown, hidden = history_page(history, st.session_state.get(pages_key, 1))
+            if hidden and st.button(f"⬆️ Show earlier messages ({hidden})", key=f"more_{agent_key}"):
+                st.session_state[pages_key] = st.session_state.get(pages_key, 1) + 1
+                st.rerun()
+
             chat_container = st.container(height=500)
             with chat_container:
-                for msg in st.session_state['chat_history'][agent_key]:
+                for msg in shown:
                     role = msg['role']
                     content = msg['content']
                     
@@ -32,59 +168,79 @@ def show():
                     else:
                         with st.chat_message("assistant", avatar=agent_icon):
                             st.write(content)
+                            if msg.get('source') in SOURCE_CAPTIONS:
+                                st.caption(SOURCE_CAPTIONS[msg['source']])
 
             # B. Chat Input
             if prompt := st.chat_input(f"Ask the {agent_key.title()} Agent...", key=f"chat_{agent_key}"):
                 
                 # 1. Add User Message to History & UI
-                st.session_state['chat_history'][agent_key].append({"role": "user", "content": prompt})
+                append_history(history, {"role": "user", "content": prompt})
                 with chat_container:
                     with st.chat_message("user", avatar="👤"):
                         st.write(prompt)
 
-                # 2. Prepare Context (RAG)
-                agent_data = st.session_state['results'].get(agent_key, {})
-                raw_summary = agent_data.get('summary', '')
-                context = clean_raw_output(raw_summary)
-                
-                # --- PROMPT ENGINEERED TO FIX THE "DUMP" ISSUE ---
-                full_prompt = f"""
-                You are the {agent_key.upper()} Expert Agent.
-                
-                CONTEXT (Your Analysis of the Contract):
-                {context}
-                
-                USER QUESTION:
-                {prompt}
-                
-                INSTRUCTIONS:
-                1. If the user is greeting you (e.g., "hi", "hello"), introduce yourself briefly and mention one key risk from your analysis. DO NOT output the full summary.
-                2. If the user asks a question, answer strictly based on the context above.
-                3. Keep it professional and concise.
-                """
-
-                # 3. Generate Answer
+                # 2. Generate Answer (fact index first, then the LLM)
                 with chat_container:
                     with st.chat_message("assistant", avatar=agent_icon):
                         response_placeholder = st.empty()
                         response_placeholder.markdown("Thinking...")
                         
                         try:
-                            # Call AI
-                            ai_response_raw = universal_llm.invoke(full_prompt).content
-                            ai_response_clean = clean_raw_output(ai_response_raw)
+                            memory = st.session_state['chat_memory'][agent_key]
+                            ai_response_clean, source = answer_question(agent_key, prompt, st.session_state['results'], memory)
                             
                             # Update UI
                             response_placeholder.markdown(ai_response_clean)
+                            if source in SOURCE_CAPTIONS:
+                                st.caption(SOURCE_CAPTIONS[source])
                             
-                            # Save to History
-                            st.session_state['chat_history'][agent_key].append({"role": "ai", "content": ai_response_clean})
+                            # Save to History & Memory (older turns are summarised in the background)
+                            append_history(history, {"role": "ai", "content": ai_response_clean, "source": source})
+                            remember(memory, "user", prompt)
+                            remember(memory, "ai", ai_response_clean)
                             
                         except Exception as e:
                             response_placeholder.error(f"Connection Error: {e}")
+        return chat_container
+
+    # 5. Render the 4 Interfaces with specific icons
+    containers = {key: render_agent_chat(key, tab, icon) for tab, (key, icon) in zip(tabs, AGENT_TABS.items())}
+
+    # 6. Panel fan-out: answers land in each tab as they arrive
+    if panel_submitted and panel_question.strip():
+        question = panel_question.strip()
+        agents = panel_agents(st.session_state['results'])
+        placeholders = {}
+        for key in agents:
+            container = containers[key]
+            append_history(st.session_state['chat_history'][key], {"role": "user", "content": question, "panel": True})
+            with container:
+                with st.chat_message("user", avatar="👤"):
+                    st.write(question)
+                with st.chat_message("assistant", avatar=AGENT_TABS[key]):
+                    placeholders[key] = st.empty()
+                    placeholders[key].markdown("Thinking...")
+
+        answers = {}
+        with st.spinner("The panel is answering..."):
+            for key, answer, source in ask_panel(question, st.session_state['results'], st.session_state['chat_memory'],
+                                                 agents):
+                if source == "error":
+                    placeholders[key].error(answer)
+                    continue
+                placeholders[key].markdown(answer + (f"\n\n_{SOURCE_CAPTIONS[source]}_" if source in SOURCE_CAPTIONS else ""))
+                answers[key] = answer
+                append_history(st.session_state['chat_history'][key],
+                               {"role": "ai", "content": answer, "source": source, "panel": True})
+                memory = st.session_state['chat_memory'][key]
+                remember(memory, "user", question)
+                remember(memory, "ai", answer)
 
-    # 4. Render the 4 Interfaces with specific icons
-    render_agent_chat("legal", tabs[0], "⚖️")
-    render_agent_chat("finance", tabs[1], "💰")
-    render_agent_chat("compliance", tabs[2], "🛡️")
-    render_agent_chat("operations", tabs[3], "⚙️")
\ No newline at end of file
+        if merge and answers:
+            with st.spinner("Merging the panel's answers..."):
+                try:
+                    merged = merge_panel_answers(question, answers)
+                    merged_placeholder.info(f"**🧑‍⚖️ Panel answer:** {question}\n\n{merged}")
+                except Exception as e:
+                    merged_placeholder.error(f"Connection Error: {e}")
\ No newline at end of file
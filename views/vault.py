@@ -1,23 +1,64 @@
 import streamlit as st
-import json
-from utils.pinecone_client import search_archives
+import html
+from utils.pinecone_client import (search_archives, sync_archive_index, pinecone_health, embedding_stats,
+                                   load_archive, ARCHIVE_PAGE_SIZE)
+from utils.archive_index import filter_options, MAX_VERSIONS
+from config import VECTOR_BACKEND
+from utils.chat_memory import new_chat_state
 
 def show():
     st.markdown("## 🏦 The Neural Vault")
     st.markdown("<p style='color:#94a3b8'>Retrieve past contract analyses from Pinecone.</p>", unsafe_allow_html=True)
+    if VECTOR_BACKEND == "pinecone":
+        health = pinecone_health()
+        if health["ok"]:
+            st.caption(f"🟢 Pinecone online • {health['vectors'] or 0} vectors • {health['latency_ms']} ms")
+        else:
+            st.caption(f"🔴 Pinecone unavailable: {health['error']}")
+    emb = embedding_stats()
+    if emb and emb["hits"] + emb["misses"]:
+        st.caption(f"🧮 Embedding cache: {emb['hit_rate']:.0%} hits • avg batch {emb['avg_batch']}")
     
     # 1. SEARCH INPUT (Press Enter to search)
-    query = st.text_input("Search Archives...", placeholder="e.g., 'Employment' or 'SLA'", key="vault_search")
+    query = st.text_input("Search Archives...", placeholder="e.g., 'indemnity cap over $1M' or 'SLA'", key="vault_search")
+
+    with st.expander("🔎 Filters"):
+        options = filter_options()
+        col1, col2 = st.columns(2)
+        use_dates = col1.checkbox("Limit by date")
+        dates = col1.date_input("Archived between", value=[], disabled=not use_dates)
+        agents = col2.multiselect("Agents run", ["legal", "finance", "compliance", "operations"])
+        contract_types = col1.multiselect("Contract type", options["contract_types"])
+        mine = col2.checkbox("Only my archives")
+        # Archives saved by workers on other machines reach this index on request
+        if col2.button("🔄 Refresh search index"):
+            with st.spinner("Syncing archives..."):
+                added = sync_archive_index()
+            st.session_state.pop('vault_results', None)
+            st.toast(f"{added} new archives indexed" if added else "Search index is up to date", icon="🔎")
+    filters = {
+        "date_from": dates[0].isoformat() if use_dates and len(dates) > 0 else None,
+        "date_to": dates[-1].isoformat() if use_dates and len(dates) > 0 else None,
+        "agents": agents,
+        "contract_types": contract_types,
+        "username": st.session_state.get('username') if mine else None,
+    }
     
-    # 2. PERFORM SEARCH
+    # 2. PERFORM SEARCH (cards only; kept across reruns until the query or filters change)
     if query:
-        with st.spinner("Scanning Vector Space..."):
-            archives = search_archives(query)
+        found = st.session_state.get('vault_results')
+        if not found or found['query'] != query or found['filters'] != filters:
+            with st.spinner("Scanning Vector Space..."):
+                cards = search_archives(query, limit=ARCHIVE_PAGE_SIZE + 1, filters=filters)
+            found = {"query": query, "filters": filters, "cards": cards[:ARCHIVE_PAGE_SIZE],
+                     "more": len(cards) > ARCHIVE_PAGE_SIZE}
+            st.session_state['vault_results'] = found
+        archives = found['cards']
             
         if not archives:
             st.warning("No archives found.")
         else:
-            st.success(f"Found {len(archives)} archived records.")
+            st.success(f"Showing {len(archives)} archived records" + (" (more available)." if found['more'] else "."))
             st.markdown("---")
             
             # 3. RENDER RESULTS
@@ -29,33 +70,33 @@ def show():
                         st.markdown(f"""
                         <div style="background: #0e1117; padding: 15px; border-radius: 10px; border: 1px solid #333; margin-bottom: 10px;">
                             <h4 style="color: #00f2ff; margin:0;">📄 {doc['filename']}</h4>
-                            <p style="font-size: 12px; color: #666;">{doc['date']} • {doc['doc_len']} Pages</p>
+                            <p style="font-size: 12px; color: #666;">{doc['date']} • {doc['doc_len']} Pages{' • ' + doc['contract_type'] if doc.get('contract_type') else ''}</p>
+                            <p style="font-size: 12px; color: #94a3b8; margin:0;">{html.escape(doc.get('summary', '')[:160])}</p>
                         </div>
                         """, unsafe_allow_html=True)
+
+                        # Re-runs of the same file and settings are versions of one archive
+                        latest = doc.get('versions', 1)
+                        version = latest
+                        if latest > 1:
+                            version = st.selectbox("Version", range(latest, max(latest - MAX_VERSIONS, 0), -1),
+                                                   format_func=lambda v, n=latest: f"v{v}" + (" (latest)" if v == n else ""),
+                                                   key=f"version_{doc['id']}")
                         
                         # THE LOAD BUTTON
                         if st.button(f"⚡ LOAD", key=doc['id'], use_container_width=True):
                             try:
-                                # A. Load Analysis Data
-                                payload = doc.get('analysis_json', '{}')
-                                st.session_state['results'] = json.loads(payload)
+                                # A. Load Analysis Data + Config (only this record's payload is fetched)
+                                # Old files without a config fall back to ALL tabs
+                                results, config = load_archive(doc['id'], None if version == latest else version)
+                                st.session_state['results'] = results
                                 st.session_state['doc_len'] = doc['doc_len']
                                 st.session_state['filename'] = doc['filename']
-                                
-                                # B. Load Config (THIS FIXES THE MISSING TABS)
-                                config_str = doc.get('config_json', None)
-                                
-                                if config_str and config_str != '{}':
-                                    st.session_state['report_config'] = json.loads(config_str)
-                                else:
-                                    # Fallback for old files: Show ALL tabs
-                                    st.session_state['report_config'] = {
-                                        "tone": "Restored",
-                                        "agents": ["Legal", "Finance", "Compliance", "Operations"]
-                                    }
+                                st.session_state['report_config'] = config
 
-                                # C. Reset Chat
+                                # B. Reset Chat
                                 st.session_state['chat_history'] = {"legal": [], "finance": [], "compliance": [], "operations": []}
+                                st.session_state['chat_memory'] = new_chat_state()
                                 
                                 st.toast(f"Restored {doc['filename']}!", icon="✅")
                                 st.rerun() # Refresh to show tabs immediately
@@ -63,6 +104,14 @@ def show():
                             except Exception as e:
                                 st.error(f"Corrupt Data: {e}")
 
+            # 4. PAGINATION
+            if found['more'] and st.button("⬇️ Load more", use_container_width=True):
+                with st.spinner("Scanning Vector Space..."):
+                    cards = search_archives(query, limit=ARCHIVE_PAGE_SIZE + 1, offset=len(archives), filters=filters)
+                found['cards'] += cards[:ARCHIVE_PAGE_SIZE]
+                found['more'] = len(cards) > ARCHIVE_PAGE_SIZE
+                st.rerun()
+
     # Help Tip
     if st.session_state.get('results'):
         st.info("💡 **System Active:** Analysis loaded. Go to 'The Oracle' to chat.")
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+ClauseAI analysis worker.
+
+Pulls jobs from the shared jobs.db queue and runs them outside Streamlit.
+
+    python worker.py                 # one worker process
+    python worker.py --processes 4   # a small fleet on this machine
+    python worker.py --compact       # merge duplicate vault archives, then exit
+
+Workers on other machines only need the same code and access to the same
+jobs.db file (set `clauseai_jobs_db` to its path).
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import traceback
+
+from dotenv import load_dotenv
+from utils import jobs, revisions, clause_cache, contract_index, oracle_cache, archive_index
+
+load_dotenv()
+
+POLL_SECONDS = 2
+HEARTBEAT_SECONDS = 15
+# How often an idle worker syncs the vault search index (utils.pinecone_client.sync_archive_index)
+ARCHIVE_SYNC_SECONDS = 300
+JOB_DIR = os.path.join("data", "jobs")
+
+
+# --- 1. JOB HANDLERS ---
+def run_analysis_job(job, file_bytes, on_progress):
+    """Executes one 'analysis' job. Mirrors what the console used to do inline."""
+    from graph.doc_graph import run_graph
+    from utils.pinecone_client import save_analysis_state
+
+    payload = job["payload"]
+    filename = job["file_name"] or payload.get("filename", "contract")
+
+    # 1. Materialise the upload locally (the worker may be on another machine);
+    #    the copy is removed once the run is archived
+    job_dir = os.path.join(JOB_DIR, job["id"])
+    os.makedirs(job_dir, exist_ok=True)
+    try:
+        file_path = os.path.join(job_dir, os.path.basename(filename))
+        with open(file_path, "wb") as f: f.write(file_bytes)
+
+        # 2. Run Analysis
+        results = run_graph(file_path, on_progress=on_progress,
+                            profile=payload.get("profile") or None, run_id=job["id"], username=job["username"],
+                            revision_of=payload.get("revision_of", "auto"), config=payload.get("config"))
+        doc_len = results.get("pipeline", {}).get("pages", 0)
+
+        # 3. Save to Pinecone
+        on_progress(0.99, "archiving")
+        archived = save_analysis_state(filename, results, doc_len, payload.get("config"), job["username"])
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    return {"results": results, "doc_len": doc_len, "filename": filename, "archived": bool(archived)}
+
+def run_compaction_job(job, file_bytes, on_progress):
+    """Merges duplicate vault archives (see utils.pinecone_client.compact_archives)."""
+    from utils.pinecone_client import compact_archives
+    return compact_archives(on_progress=on_progress)
+
+HANDLERS = {"analysis": run_analysis_job, "compact_archives": run_compaction_job}
+
+
+# --- 2. WORKER LOOP ---
+def process_job(worker_id, job, file_bytes):
+    cancelled = threading.Event()
+    stop = threading.Event()
+    state = {"progress": None, "stage": None}
+
+    # Long LLM calls can outlive the lease, so keep it alive from a side thread
+    def keep_alive():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                jobs.heartbeat(job["id"], worker_id, state["progress"], state["stage"])
+                jobs.worker_heartbeat(worker_id, job["id"])
+            except jobs.JobCancelled:
+                cancelled.set()
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed: {e}")
+
+    def on_progress(fraction, stage):
+        state["progress"], state["stage"] = fraction, stage
+        if cancelled.is_set(): raise jobs.JobCancelled(job["id"])
+        jobs.heartbeat(job["id"], worker_id, fraction, stage)
+
+    beat = threading.Thread(target=keep_alive, daemon=True)
+    beat.start()
+    try:
+        handler = HANDLERS[job["kind"]]
+        result = handler(job, file_bytes, on_progress)
+        jobs.complete_job(job["id"], worker_id, result)
+        print(f"✅ Job {job['id']} done")
+    except jobs.JobCancelled:
+        jobs.mark_cancelled(job["id"], worker_id)
+        print(f"🛑 Job {job['id']} cancelled")
+    except Exception as e:
+        traceback.print_exc()
+        jobs.fail_job(job["id"], worker_id, f"{type(e).__name__}: {e}")
+        print(f"⚠️ Job {job['id']} failed (attempt {job['attempts']}/{job['max_attempts']}): {e}")
+    finally:
+        stop.set()
+
+def prune_clause_cache():
+    """Drops cached clause findings from old prompts or a different primary model."""
+    from graph.doc_graph import CLAUSE_CACHE_VERSIONS
+    from utils.universal_llm import universal_llm
+    removed = clause_cache.prune_stale(CLAUSE_CACHE_VERSIONS.values(), universal_llm.primary_model())
+    if removed: print(f"🧹 Pruned {removed} stale clause-cache entries")
+
+def sync_archive_index():
+    """Adds archives saved elsewhere to this machine's vault search index."""
+    from utils.pinecone_client import sync_archive_index as sync
+    added = sync()
+    if added: print(f"🔎 Indexed {added} archives for vault search")
+
+def worker_loop(kinds=None):
+    jobs.init_jobs_db()
+    revisions.init_revisions_db()
+    clause_cache.init_clause_cache_db()
+    contract_index.init_contract_index_db()
+    oracle_cache.init_oracle_cache_db()
+    archive_index.init_archive_index_db()
+    prune_clause_cache()
+    worker_id = jobs.new_worker_id()
+    print(f"🔧 Worker {worker_id} polling {jobs.JOBS_DB}...")
+    synced_at = 0.0
+    try:
+        while True:
+            jobs.worker_heartbeat(worker_id)
+            job, file_bytes = jobs.claim_next_job(worker_id, kinds=kinds)
+            if job is None:
+                # Idle: keep the local vault index in step with the shared vector store
+                if time.time() - synced_at > ARCHIVE_SYNC_SECONDS:
+                    synced_at = time.time()
+                    sync_archive_index()
+                time.sleep(POLL_SECONDS)
+                continue
+            print(f"🔄 Claimed {job['kind']} job {job['id']} ({job['file_name']})")
+            jobs.worker_heartbeat(worker_id, job["id"])
+            process_job(worker_id, job, file_bytes)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        jobs.remove_worker(worker_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ClauseAI analysis worker")
+    parser.add_argument("--processes", type=int, default=1, help="Number of worker processes to start")
+    parser.add_argument("--kind", action="append", help="Only handle these job kinds (default: all)")
+    parser.add_argument("--compact", action="store_true", help="Merge duplicate vault archives once and exit")
+    args = parser.parse_args()
+
+    if args.compact:
+        archive_index.init_archive_index_db()
+        print(f"🧹 Archive compaction: {run_compaction_job(None, None, None)}")
+        raise SystemExit(0)
+
+    if args.processes <= 1:
+        worker_loop(args.kind)
+    else:
+        fleet = [multiprocessing.Process(target=worker_loop, args=(args.kind,)) for _ in range(args.processes)]
+        for p in fleet: p.start()
+        try:
+            for p in fleet: p.join()
+        except KeyboardInterrupt:
+            for p in fleet: p.terminate()